@@ -1,18 +1,41 @@
-from fastapi import FastAPI
+import asyncio
+import json
+from typing import Optional, Tuple
+from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 from reporter.core.config import get_settings
 from reporter.services.data_loader import load_data
 from reporter.core.indexes import Indexes
-from reporter.core.cache import AnswerCache
-from reporter.services.llm_client import LLMClient
-from reporter.services.analyzer import TrafficAnalyzer
+from reporter.core.aggregates import Aggregates
+from reporter.core.spatial import load_spatial_index
+from reporter.core.cache import AnswerCache, SemanticCache
+from reporter.core.coalescer import QueueFullError, RequestCoalescer
+from reporter.services.llm_client import AsyncLLMClient, LLMError
+from reporter.services.analyzer import Resolution, TrafficAnalyzer
+from reporter.services.telemetry import TelemetryIngestor
 
 settings = get_settings()
 DATA = load_data(settings.data_path)
 INDEXES = Indexes(DATA)
+AGGREGATES = Aggregates(DATA)
+SPATIAL = load_spatial_index(settings.geo_path) if settings.geo_path else None
+if SPATIAL is not None:
+    SPATIAL.link(DATA)
+INGESTOR = TelemetryIngestor(DATA, INDEXES, AGGREGATES, settings.telemetry_edge_data, settings.telemetry_csv)
 CACHE = AnswerCache(settings.cache_size)
-LLM = LLMClient(settings.ollama_model)
-ANALYZER = TrafficAnalyzer(INDEXES, DATA)
+SEMANTIC_CACHE = SemanticCache(DATA.digest, settings.cache_size, settings.cache_ttl, settings.cache_db_path)
+LLM = AsyncLLMClient(
+    settings.ollama_model,
+    base_url=settings.ollama_base_url,
+    timeout=settings.suggestion_timeout,
+    max_concurrency=settings.llm_max_concurrency,
+    retries=settings.llm_retries,
+)
+ANALYZER = TrafficAnalyzer(INDEXES, DATA, AGGREGATES, live_status=INGESTOR.system_status, spatial=SPATIAL)
+COALESCER = RequestCoalescer(settings.max_pending_requests)
+ACTIVE_STREAMS = 0
 
 app = FastAPI(title="Traffic Reporter API", version="1.0")
 app.add_middleware(
@@ -23,18 +46,133 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-@app.get("/ask")
-def ask(question: str):
+def _ingest() -> None:
+    if INGESTOR.poll():
+        # Respuestas calculadas con datos anteriores ya no son válidas.
+        CACHE.clear()
+        SEMANTIC_CACHE.invalidate(INGESTOR.data_version)
+
+async def _follow_telemetry():
+    while True:
+        try:
+            _ingest()
+        except Exception as exc:  # noqa: BLE001 - un archivo a medio escribir no debe tumbar la API
+            print(f"[telemetry] error: {exc}")
+        await asyncio.sleep(settings.telemetry_interval)
+
+@app.on_event("startup")
+async def start_telemetry():
+    if INGESTOR.enabled:
+        app.state.telemetry_task = asyncio.create_task(_follow_telemetry())
+
+@app.on_event("shutdown")
+async def close_llm():
+    task = getattr(app.state, "telemetry_task", None)
+    if task is not None:
+        task.cancel()
+    await LLM.aclose()
+    SEMANTIC_CACHE.close()
+
+async def _generate(question: str, intent: str, resolved: Optional[Resolution]) -> str:
+    answer = await ANALYZER.analyze_async(question, LLM, resolved)
+    CACHE.set(question, answer)
+    SEMANTIC_CACHE.set(intent, answer)
+    return answer
+
+def _lookup(question: str) -> Tuple[Optional[str], Optional[str], str, Optional[Resolution]]:
+    """Return ``(answer, tier, intent, resolved)`` from the exact then the semantic cache.
+
+    The question is resolved at most once; ``resolved`` is reused to build the prompt on a miss.
+    """
     cached = CACHE.get(question)
     if cached is not None:
-        return {"question": question, "answer": cached, "cached": True}
-    answer = ANALYZER.analyze(question, LLM)
-    CACHE.set(question, answer)
-    return {"question": question, "answer": answer, "cached": False}
+        return cached, "exact", "", None
+    resolved = ANALYZER.resolve(question)
+    intent = ANALYZER.intent_key(question, resolved)
+    cached = SEMANTIC_CACHE.get(intent)
+    if cached is not None:
+        CACHE.set(question, cached)
+        return cached, "semantic", intent, resolved
+    return None, None, intent, resolved
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.get("/ask")
+async def ask(question: str):
+    cached, tier, intent, resolved = _lookup(question)
+    if cached is not None:
+        return {"question": question, "answer": cached, "cached": True, "cache_tier": tier}
+    try:
+        # Las paráfrasis en vuelo comparten la misma generación.
+        answer, shared = await COALESCER.run(intent, lambda: _generate(question, intent, resolved))
+    except QueueFullError as exc:
+        raise HTTPException(status_code=429, detail=f"Servidor saturado: {exc}", headers={"Retry-After": "1"}) from exc
+    except LLMError as exc:
+        raise HTTPException(status_code=502, detail=str(exc)) from exc
+    return {"question": question, "answer": answer, "cached": False, "coalesced": shared}
+
+class _StreamSlot:
+    """One of the ``max_pending_requests`` stream slots; ``release`` is idempotent."""
+
+    def __init__(self) -> None:
+        global ACTIVE_STREAMS
+        ACTIVE_STREAMS += 1
+        self._held = True
+
+    def release(self) -> None:
+        global ACTIVE_STREAMS
+        if self._held:
+            self._held = False
+            ACTIVE_STREAMS -= 1
+
+@app.get("/ask/stream")
+async def ask_stream(question: str):
+    """Server-sent events: ``token`` per fragment, then ``done`` (or ``error``)."""
+    cached, tier, intent, resolved = _lookup(question)
+    slot = None
+    if cached is None:
+        if ACTIVE_STREAMS >= settings.max_pending_requests:
+            raise HTTPException(status_code=429, detail="Servidor saturado: demasiadas respuestas en curso", headers={"Retry-After": "1"})
+        # El cupo se toma antes de responder para que una ráfaga no pase entera el chequeo.
+        slot = _StreamSlot()
+
+    async def events():
+        if cached is not None:
+            yield _sse("token", {"text": cached})
+            yield _sse("done", {"question": question, "answer": cached, "cached": True, "cache_tier": tier})
+            return
+        parts = []
+        try:
+            async for text in ANALYZER.analyze_stream(question, LLM, resolved):
+                parts.append(text)
+                yield _sse("token", {"text": text})
+        except LLMError as exc:
+            yield _sse("error", {"detail": str(exc)})
+            return
+        finally:
+            slot.release()
+        answer = "".join(parts)
+        CACHE.set(question, answer)
+        SEMANTIC_CACHE.set(intent, answer)
+        yield _sse("done", {"question": question, "answer": answer, "cached": False})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        # Libera el cupo aunque el generador nunca llegue a iterarse.
+        background=BackgroundTask(slot.release) if slot is not None else None,
+    )
 
 @app.get("/cache-stats")
 def cache_stats():
-    return CACHE.stats()
+    return {
+        "exact": CACHE.stats(),
+        "semantic": SEMANTIC_CACHE.stats(),
+        "inflight": {**COALESCER.stats(), "streams": ACTIVE_STREAMS},
+        "telemetry": INGESTOR.stats(),
+    }
 
 @app.get("/health")
 def health():
@@ -0,0 +1,143 @@
+"""Vistas agregadas precalculadas al cargar los datos.
+
+Permiten responder preguntas generales o comparativas seleccionando registros
+en O(k) (top-k más/menos congestionados, global y por tipo de vía) en vez de
+pasar todo ``full_data`` al prompt.
+"""
+from __future__ import annotations
+
+import heapq
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .models import SimulationRecord, current_congestion, current_traveltime
+from .store import EdgeStore
+
+TOP_K = 6
+
+
+@dataclass(frozen=True)
+class StreetRollup:
+    name: str
+    segments: int
+    avg_traveltime_s: float
+    avg_congestion_pct: float
+
+
+def _congestion(rec: SimulationRecord) -> float:
+    return current_congestion(rec)
+
+
+def _measured(rec: SimulationRecord) -> bool:
+    # Tramos sin vehículos quedan con tiempo 0 y congestión 0: no aportan a rankings.
+    return current_congestion(rec) is not None and bool(current_traveltime(rec))
+
+
+class Aggregates:
+    def __init__(self, data: List[SimulationRecord], k: int = TOP_K):
+        self.k = k
+        self.most_congested: List[SimulationRecord] = []
+        self.least_congested: List[SimulationRecord] = []
+        self.most_by_highway: Dict[str, List[SimulationRecord]] = {}
+        self.least_by_highway: Dict[str, List[SimulationRecord]] = {}
+        self.streets: List[StreetRollup] = []  # ordenadas de mayor a menor congestión
+        self._street_by_name: Dict[str, StreetRollup] = {}
+        self.rebuild(data)
+
+    def rebuild(self, data: List[SimulationRecord]) -> None:
+        if isinstance(data, EdgeStore):
+            self._rebuild_columnar(data)
+            return
+        rated = [r for r in data if _measured(r)]
+        self.most_congested = heapq.nlargest(self.k, rated, key=_congestion)
+        self.least_congested = heapq.nsmallest(self.k, rated, key=_congestion)
+
+        by_highway: Dict[str, List[SimulationRecord]] = defaultdict(list)
+        sums: Dict[str, List[float]] = defaultdict(lambda: [0, 0.0, 0.0])  # tramos, congestión, tiempo
+        for r in rated:
+            if r.highway:
+                by_highway[r.highway].append(r)
+            if r.name:
+                acc = sums[r.name]
+                acc[0] += 1
+                acc[1] += current_congestion(r)
+                acc[2] += current_traveltime(r)
+        self.most_by_highway = {hw: heapq.nlargest(self.k, recs, key=_congestion) for hw, recs in by_highway.items()}
+        self.least_by_highway = {hw: heapq.nsmallest(self.k, recs, key=_congestion) for hw, recs in by_highway.items()}
+
+        self.streets = sorted(
+            (
+                StreetRollup(
+                    name=name,
+                    segments=acc[0],
+                    avg_traveltime_s=acc[2] / acc[0],
+                    avg_congestion_pct=acc[1] / acc[0],
+                )
+                for name, acc in sums.items()
+            ),
+            key=lambda s: (-s.avg_congestion_pct, s.name),
+        )
+        self._street_by_name = {s.name.lower(): s for s in self.streets}
+
+    def _rebuild_columnar(self, store: EdgeStore) -> None:
+        """Same views as ``rebuild`` computed on the store columns (stable sorts keep heapq's tie order).
+
+        Uses the ``current_*`` columns: fresh live values take precedence over the historical ones.
+        """
+        congestion, traveltime = store.current_congestion, store.current_traveltime
+        rated = np.flatnonzero(~np.isnan(congestion) & (np.nan_to_num(traveltime) != 0))
+
+        def top(idx: np.ndarray, largest: bool) -> List[SimulationRecord]:
+            keys = -congestion[idx] if largest else congestion[idx]
+            return [store[int(i)] for i in idx[np.argsort(keys, kind="stable")[: self.k]]]
+
+        self.most_congested = top(rated, True)
+        self.least_congested = top(rated, False)
+        hw_codes = store.highway_codes[rated]
+        self.most_by_highway, self.least_by_highway = {}, {}
+        for code in np.unique(hw_codes[hw_codes >= 0]):
+            idx = rated[hw_codes == code]
+            hw = store.highways[int(code)]
+            self.most_by_highway[hw] = top(idx, True)
+            self.least_by_highway[hw] = top(idx, False)
+
+        named = rated[store.name_codes[rated] >= 0]
+        codes = store.name_codes[named]
+        n_names = len(store.names)
+        segments = np.bincount(codes, minlength=n_names)
+        cong_sum = np.bincount(codes, weights=congestion[named], minlength=n_names)
+        time_sum = np.bincount(codes, weights=traveltime[named], minlength=n_names)
+        self.streets = sorted(
+            (
+                StreetRollup(
+                    name=store.names[code],
+                    segments=int(segments[code]),
+                    avg_traveltime_s=float(time_sum[code] / segments[code]),
+                    avg_congestion_pct=float(cong_sum[code] / segments[code]),
+                )
+                for code in np.flatnonzero(segments)
+            ),
+            key=lambda s: (-s.avg_congestion_pct, s.name),
+        )
+        self._street_by_name = {s.name.lower(): s for s in self.streets}
+
+    def overview(self, k: Optional[int] = None) -> List[SimulationRecord]:
+        """Most and least congested edges overall (k of each)."""
+        k = k or self.k
+        return self.most_congested[:k] + self.least_congested[:k]
+
+    def for_highway(self, highway: str, k: Optional[int] = None) -> List[SimulationRecord]:
+        k = k or self.k
+        return self.most_by_highway.get(highway, [])[:k] + self.least_by_highway.get(highway, [])[:k]
+
+    def top_streets(self, k: Optional[int] = None) -> List[StreetRollup]:
+        return self.streets[: k or self.k]
+
+    def bottom_streets(self, k: Optional[int] = None) -> List[StreetRollup]:
+        return self.streets[-(k or self.k):][::-1]
+
+    def street(self, name: str) -> Optional[StreetRollup]:
+        return self._street_by_name.get(name.lower())
@@ -1,20 +1,35 @@
+import sqlite3
+import time
 from collections import OrderedDict
-from typing import Optional
+from pathlib import Path
+from typing import Optional, Tuple, Union
+
+def normalize_question(text: str) -> str:
+    return " ".join(text.lower().strip().split())
+
+def _hit_rate(hits: int, misses: int) -> float:
+    total = hits + misses
+    return round(hits / total, 4) if total else 0.0
 
 class AnswerCache:
     def __init__(self, max_size: int = 512):
         self.max_size = max_size
         self._store: OrderedDict[str, str] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
 
     @staticmethod
     def _normalize(key: str) -> str:
-        return " ".join(key.lower().strip().split())
+        return normalize_question(key)
 
     def get(self, key: str) -> Optional[str]:
         nk = self._normalize(key)
         val = self._store.get(nk)
         if val is not None:
             self._store.move_to_end(nk)
+            self.hits += 1
+        else:
+            self.misses += 1
         return val
 
     def set(self, key: str, value: str):
@@ -25,5 +40,127 @@ class AnswerCache:
         if len(self._store) > self.max_size:
             self._store.popitem(last=False)
 
+    def clear(self) -> None:
+        self._store.clear()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._store),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": _hit_rate(self.hits, self.misses),
+        }
+
+
+class SemanticCache:
+    """Second-tier cache keyed on the resolved intent instead of the wording.
+
+    Keys come from ``TrafficAnalyzer.intent_key`` (question type, the
+    streets/edges the question resolves to and its leftover modifiers such as
+    "más"/"menos" or numbers), so paraphrases share an entry.
+    Entries expire after ``ttl`` seconds (``0`` disables expiry) and belong to
+    one ``data_version`` (the data file hash): answers computed from another
+    version of the data are never returned. With ``db_path`` the entries are
+    also written to SQLite and reloaded on start.
+    """
+
+    def __init__(
+        self,
+        data_version: str,
+        max_size: int = 512,
+        ttl: float = 0,
+        db_path: Optional[Union[str, Path]] = None,
+    ):
+        self.data_version = data_version
+        self.max_size = max_size
+        self.ttl = ttl
+        self._store: OrderedDict[str, Tuple[str, float]] = OrderedDict()  # key -> (answer, created_at)
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self._db: Optional[sqlite3.Connection] = None
+        if db_path:
+            self._open(Path(db_path))
+
+    def _open(self, path: Path) -> None:
+        self._db = sqlite3.connect(str(path), check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS answers ("
+            "key TEXT PRIMARY KEY, answer TEXT NOT NULL, created_at REAL NOT NULL, data_version TEXT NOT NULL)"
+        )
+        self._db.execute("DELETE FROM answers WHERE data_version != ?", (self.data_version,))
+        if self.ttl:
+            self._db.execute("DELETE FROM answers WHERE created_at < ?", (time.time() - self.ttl,))
+        self._db.commit()
+        rows = self._db.execute(
+            "SELECT key, answer, created_at FROM answers ORDER BY created_at DESC LIMIT ?", (self.max_size,)
+        ).fetchall()
+        for key, answer, created_at in reversed(rows):
+            self._store[key] = (answer, created_at)
+
+    def _is_expired(self, created_at: float) -> bool:
+        return bool(self.ttl) and time.time() - created_at > self.ttl
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self._store.get(key)
+        if entry is not None and self._is_expired(entry[1]):
+            self._delete(key)
+            self.expired += 1
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self._store.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def set(self, key: str, value: str) -> None:
+        created_at = time.time()
+        if key in self._store:
+            self._store.move_to_end(key)
+        self._store[key] = (value, created_at)
+        if self._db is not None:
+            self._db.execute(
+                "INSERT OR REPLACE INTO answers (key, answer, created_at, data_version) VALUES (?, ?, ?, ?)",
+                (key, value, created_at, self.data_version),
+            )
+            self._db.commit()
+        if len(self._store) > self.max_size:
+            oldest, _ = self._store.popitem(last=False)
+            if self._db is not None:
+                self._delete(oldest)
+
+    def _delete(self, key: str) -> None:
+        self._store.pop(key, None)
+        if self._db is not None:
+            self._db.execute("DELETE FROM answers WHERE key = ?", (key,))
+            self._db.commit()
+
+    def invalidate(self, data_version: str) -> None:
+        """Drop every entry if the data changed (e.g. the data file was replaced)."""
+        if data_version == self.data_version:
+            return
+        self.data_version = data_version
+        self._store.clear()
+        if self._db is not None:
+            self._db.execute("DELETE FROM answers")
+            self._db.commit()
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
     def stats(self) -> dict:
-        return {"size": len(self._store), "max_size": self.max_size}
+        return {
+            "size": len(self._store),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "persistent": self._db is not None,
+            "data_version": self.data_version[:12],
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "hit_rate": _hit_rate(self.hits, self.misses),
+        }
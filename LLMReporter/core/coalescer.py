@@ -0,0 +1,48 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Tuple
+
+
+class QueueFullError(RuntimeError):
+    """Too many distinct generations are already pending."""
+
+
+class RequestCoalescer:
+    """Share one pending LLM generation between identical in-flight questions.
+
+    At most ``max_pending`` distinct keys can be generating at once; beyond
+    that ``run`` raises ``QueueFullError`` so the caller can answer 429.
+    """
+
+    def __init__(self, max_pending: int = 32):
+        self.max_pending = max_pending
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.started = 0
+        self.coalesced = 0
+        self.rejected = 0
+
+    async def run(self, key: str, factory: Callable[[], Awaitable[str]]) -> Tuple[str, bool]:
+        """Return ``(result, shared)``; ``shared`` is True if another request started it."""
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.coalesced += 1
+            return await asyncio.shield(pending), True
+
+        if len(self._inflight) >= self.max_pending:
+            self.rejected += 1
+            raise QueueFullError(f"{len(self._inflight)} generaciones pendientes")
+
+        task = asyncio.ensure_future(factory())
+        self._inflight[key] = task
+        task.add_done_callback(lambda _t: self._inflight.pop(key, None))
+        self.started += 1
+        # shield: si el cliente que la inició se desconecta, los demás siguen esperando.
+        return await asyncio.shield(task), False
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self._inflight),
+            "max_pending": self.max_pending,
+            "started": self.started,
+            "coalesced": self.coalesced,
+            "rejected": self.rejected,
+        }
@@ -10,15 +10,40 @@ class Settings:
     ollama_model: str
     ollama_base_url: str
     cache_size: int
+    cache_ttl: float
+    cache_db_path: Optional[Path]
     port: int
     suggestion_timeout: float
+    llm_max_concurrency: int
+    llm_retries: int
+    max_pending_requests: int
+    telemetry_edge_data: Optional[str]
+    telemetry_csv: Optional[str]
+    telemetry_interval: float
+    geo_path: Optional[Path]
     ngrok_authtoken: Optional[str]
 
 DEFAULT_OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", os.getenv("REPORTER_MODEL", "llama3:8b"))
 DEFAULT_OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://127.0.0.1:11434")
 DEFAULT_CACHE_SIZE = int(os.getenv("REPORTER_CACHE_SIZE", "512"))
+DEFAULT_CACHE_TTL = float(os.getenv("REPORTER_CACHE_TTL", "3600"))
+DEFAULT_CACHE_DB = os.getenv("REPORTER_CACHE_DB")
 DEFAULT_PORT = int(os.getenv("REPORTER_PORT", "9000"))
 DEFAULT_TIMEOUT = float(os.getenv("SUGGESTION_TIMEOUT", "30"))
+DEFAULT_LLM_CONCURRENCY = int(os.getenv("REPORTER_LLM_CONCURRENCY", "4"))
+DEFAULT_LLM_RETRIES = int(os.getenv("REPORTER_LLM_RETRIES", "2"))
+DEFAULT_MAX_PENDING = int(os.getenv("REPORTER_MAX_PENDING", "32"))
+DEFAULT_TELEMETRY_INTERVAL = float(os.getenv("REPORTER_TELEMETRY_INTERVAL", "5"))
+
+def _find_geo_path() -> Optional[Path]:
+    """GeoJSON de calles (opcional): REPORTER_GEO_PATH o ``street_data.geojson``."""
+    env_path = os.getenv("REPORTER_GEO_PATH")
+    if env_path:
+        return Path(env_path)
+    for c in (Path("street_data.geojson"), Path("reporter/street_data.geojson")):
+        if c.exists():
+            return c
+    return None
 
 @lru_cache(maxsize=1)
 def get_settings() -> Settings:
@@ -53,7 +78,16 @@ def get_settings() -> Settings:
         ollama_model=DEFAULT_OLLAMA_MODEL,
         ollama_base_url=DEFAULT_OLLAMA_BASE_URL,
         cache_size=DEFAULT_CACHE_SIZE,
+        cache_ttl=DEFAULT_CACHE_TTL,
+        cache_db_path=Path(DEFAULT_CACHE_DB) if DEFAULT_CACHE_DB else None,
         port=DEFAULT_PORT,
         suggestion_timeout=DEFAULT_TIMEOUT,
+        llm_max_concurrency=DEFAULT_LLM_CONCURRENCY,
+        llm_retries=DEFAULT_LLM_RETRIES,
+        max_pending_requests=DEFAULT_MAX_PENDING,
+        telemetry_edge_data=os.getenv("REPORTER_EDGEDATA"),
+        telemetry_csv=os.getenv("REPORTER_METRICS_CSV"),
+        telemetry_interval=DEFAULT_TELEMETRY_INTERVAL,
+        geo_path=_find_geo_path(),
         ngrok_authtoken=os.getenv("NGROK_AUTHTOKEN"),
     )
@@ -1,9 +1,66 @@
 from collections import defaultdict
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import math
 import re
+import unicodedata
 from .models import SimulationRecord
 
-_STREET_PATTERN = re.compile(r"(calle|carrera|avenida|kra|kr|cl)\s*\d+", re.IGNORECASE)
+# Abreviaturas de nomenclatura vial colombiana -> forma canónica.
+_ABBREVIATIONS = {
+    "kra": "carrera", "kr": "carrera", "cra": "carrera", "cr": "carrera", "carr": "carrera",
+    "cl": "calle", "cll": "calle", "clle": "calle",
+    "av": "avenida", "avda": "avenida", "ave": "avenida",
+    "dg": "diagonal", "diag": "diagonal",
+    "tv": "transversal", "tr": "transversal", "trans": "transversal", "transv": "transversal",
+}
+_STOPWORDS = {
+    "a", "actual", "ahora", "al", "como", "con", "cual", "cuales", "de", "del", "dime", "donde", "el", "en",
+    "es", "esta", "estado", "estan", "hay", "hoy", "la", "las", "lo", "los", "me", "muy", "para", "por",
+    "que", "se", "son", "sobre", "trafico", "un", "una", "y",
+}
+# Sustantivos genéricos de vía: solo identifican una calle seguidos de un número
+# ("carrera 14"); solos ("las calles más congestionadas") no deben puntuar.
+_GENERIC_STREET_WORDS = {
+    "avenida", "avenidas", "calle", "calles", "carrera", "carreras", "diagonal", "diagonales",
+    "transversal", "transversales", "via", "vias",
+}
+_STREET_PATTERN = re.compile(r"\b(calle|carrera|avenida|diagonal|transversal)\s*(\d+[a-z]?)\b")
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+_LETTER_DIGIT = re.compile(r"([a-z])(\d)")
+
+MIN_SCORE = 0.6       # fracción mínima del peso (idf) de la consulta que debe cubrir un nombre
+RELATIVE_SCORE = 0.9  # y además estar cerca del mejor resultado
+FUZZY_SIMILARITY = 0.4
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase, strip accents/ordinals and expand street abbreviations ("kra11" -> "carrera 11")."""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    plain = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    plain = _LETTER_DIGIT.sub(r"\1 \2", _NON_ALNUM.sub(" ", plain))
+    return " ".join(_ABBREVIATIONS.get(tok, tok) for tok in plain.split())
+
+
+def query_terms(query: str, ignore: Iterable[str] = ()) -> List[str]:
+    """Normalized content tokens: no stopwords, and generic street nouns only before a number."""
+    tokens = normalize_text(query).split()
+    skip = _STOPWORDS.union(ignore)
+    kept = []
+    for i, tok in enumerate(tokens):
+        if tok in _GENERIC_STREET_WORDS:
+            following = tokens[i + 1] if i + 1 < len(tokens) else ""
+            if not any(ch.isdigit() for ch in following):
+                continue
+        elif tok in skip:
+            continue
+        kept.append(tok)
+    return list(dict.fromkeys(kept))
+
+
+def _trigrams(token: str) -> Set[str]:
+    padded = f"#{token}#"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
 
 class Indexes:
     def __init__(self, data: List[SimulationRecord]):
@@ -13,15 +70,113 @@ class Indexes:
             if rec.name:
                 self.by_name[rec.name.lower()] += [rec]
             self.by_edge[rec.edge_id.lower()] = rec
+        self._build_search_index()
+
+    def add(self, records: List[SimulationRecord]) -> None:
+        """Index new records; the search index is rebuilt only if a new street name appears."""
+        new_name = False
+        for rec in records:
+            if rec.name:
+                key = rec.name.lower()
+                new_name = new_name or key not in self.by_name
+                self.by_name[key].append(rec)
+            self.by_edge[rec.edge_id.lower()] = rec
+        if new_name:
+            self._build_search_index()
+
+    def _build_search_index(self) -> None:
+        """Token postings (name ids) plus a trigram index over the token vocabulary."""
+        self._names: List[str] = list(self.by_name)
+        self._name_lengths: List[int] = []
+        self._postings: Dict[str, List[int]] = defaultdict(list)
+        for name_id, name in enumerate(self._names):
+            tokens = normalize_text(name).split()
+            self._name_lengths.append(len(tokens))
+            for tok in dict.fromkeys(tokens):
+                self._postings[tok].append(name_id)
+
+        n_names = max(len(self._names), 1)
+        self._idf: Dict[str, float] = {tok: math.log(1 + n_names / len(ids)) for tok, ids in self._postings.items()}
+        self._trigram_index: Dict[str, Set[str]] = defaultdict(set)
+        for tok in self._postings:
+            if not any(ch.isdigit() for ch in tok):
+                for tri in _trigrams(tok):
+                    self._trigram_index[tri].add(tok)
+
+    def _fuzzy_tokens(self, token: str) -> List[Tuple[str, float]]:
+        grams = _trigrams(token)
+        counts: Dict[str, int] = defaultdict(int)
+        for tri in grams:
+            for candidate in self._trigram_index.get(tri, ()):
+                counts[candidate] += 1
+        out = []
+        for candidate, shared in counts.items():
+            similarity = shared / len(grams | _trigrams(candidate))
+            if similarity >= FUZZY_SIMILARITY:
+                out.append((candidate, similarity))
+        return out
 
     def detect_street(self, text: str) -> Optional[str]:
-        m = _STREET_PATTERN.search(text.lower())
+        m = _STREET_PATTERN.search(normalize_text(text))
         return m.group(0) if m else None
 
+    def detect_streets(self, text: str) -> List[str]:
+        """Every street mention, in order ("carrera 14 vs carrera 17" -> both)."""
+        return list(dict.fromkeys(m.group(0) for m in _STREET_PATTERN.finditer(normalize_text(text))))
+
+    def search(self, query: str, limit: Optional[int] = None, ignore: Iterable[str] = ()) -> List[Tuple[float, str]]:
+        """Ranked ``(score, name)`` hits; score is the idf-weighted share of the query matched.
+
+        Query tokens that match no name still count in the total weight (with
+        the idf of a token seen once), so a question only scores high on a
+        name that covers its informative words. ``ignore`` adds normalized
+        words to skip (e.g. the caller's own keywords).
+        """
+        scores: Dict[int, float] = defaultdict(float)
+        numeric_hits: Dict[int, bool] = defaultdict(bool)
+        query_weight = 0.0
+        has_numeric = False
+        unmatched_weight = math.log(1 + max(len(self._names), 1))
+        for tok in query_terms(query, ignore):
+            is_numeric = any(ch.isdigit() for ch in tok)
+            if tok in self._postings:
+                matches = [(tok, 1.0)]
+            elif not is_numeric and len(tok) >= 3:
+                matches = self._fuzzy_tokens(tok)
+            else:
+                matches = []
+            if not matches:
+                query_weight += unmatched_weight
+                continue
+            weight = max(self._idf[m] for m, _ in matches)
+            query_weight += weight
+            has_numeric = has_numeric or is_numeric
+            for matched, similarity in matches:
+                contribution = weight * similarity
+                for name_id in self._postings[matched]:
+                    scores[name_id] += contribution
+                    if is_numeric:
+                        numeric_hits[name_id] = True
+
+        if not scores or query_weight == 0:
+            return []
+        ranked = []
+        for name_id, score in scores.items():
+            if has_numeric and not numeric_hits[name_id]:
+                continue  # "calle 11" no debe devolver "calle 13"
+            ranked.append((min(score / query_weight, 1.0), name_id))
+        if not ranked:
+            return []
+        best = max(score for score, _ in ranked)
+        cutoff = max(MIN_SCORE, best * RELATIVE_SCORE)
+        hits = [(score, name_id) for score, name_id in ranked if score >= cutoff]
+        hits.sort(key=lambda hit: (-hit[0], self._name_lengths[hit[1]], self._names[hit[1]]))
+        if limit is not None:
+            hits = hits[:limit]
+        return [(score, self._names[name_id]) for score, name_id in hits]
+
     def approximate(self, query: str) -> List[SimulationRecord]:
-        q = query.lower()
         out: List[SimulationRecord] = []
-        for name, items in self.by_name.items():
-            if q in name:
-                out.extend(items)
+        for _score, name in self.search(query):
+            out.extend(self.by_name[name])
         return out
@@ -10,6 +10,8 @@ class SimulationRecord:
     avg_traveltime_s: Optional[float] = None
     avg_congestion_pct: Optional[float] = None
     raw: Optional[Dict[str, Any]] = None
+    live_traveltime_s: Optional[float] = None  # telemetría en vivo (ver EdgeStore)
+    live_congestion_pct: Optional[float] = None
 
     @staticmethod
     def from_dict(d: Dict[str, Any]) -> "SimulationRecord":
@@ -22,3 +24,12 @@ class SimulationRecord:
             avg_congestion_pct=d.get("avg_congestion_pct"),
             raw=d,
         )
+
+
+def current_traveltime(r: SimulationRecord) -> Optional[float]:
+    """Live travel time when the simulation in progress reported one, historical average otherwise."""
+    return r.live_traveltime_s if r.live_traveltime_s is not None else r.avg_traveltime_s
+
+
+def current_congestion(r: SimulationRecord) -> Optional[float]:
+    return r.live_congestion_pct if r.live_congestion_pct is not None else r.avg_congestion_pct
@@ -0,0 +1,342 @@
+"""Índice espacial sobre ``street_data.geojson``.
+
+Las geometrías (LineString en lon/lat) se proyectan a metros alrededor del
+centro de la red y se guardan en arreglos planos: vértices, segmentos y cajas
+envolventes por tramo. Una grilla uniforme, almacenada como claves de celda
+ordenadas, resuelve consultas por caja y por radio con ``searchsorted``
+(búsqueda binaria) en vez de recorrer todos los tramos.
+
+Cada feature de OSM se enlaza con los registros de ``edge_summary.json`` por
+el id de vía: los edges de SUMO se llaman como la vía OSM, con ``-`` para el
+sentido contrario y ``#n`` si está partida (los ``osmids`` del resumen vienen
+vacíos). No se enlaza por nombre porque arrastraría la calle completa.
+
+Como el almacén de datos, la forma compacta se guarda en ``<geojson>.npz`` y
+solo se regenera si cambia el GeoJSON.
+"""
+from __future__ import annotations
+
+import json
+import math
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .models import SimulationRecord
+from .store import atomic_savez, cache_path_for, json_digest
+
+CACHE_VERSION = 1
+CELL_SIZE_M = 150.0
+EARTH_RADIUS_M = 6_371_000.0
+
+
+def _ranges(starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """Concatenation of ``arange(s, e)`` for every pair, without a Python loop."""
+    lengths = ends - starts
+    keep = lengths > 0
+    starts, lengths = starts[keep], lengths[keep]
+    if not len(starts):
+        return np.empty(0, dtype=np.int64)
+    offsets = np.repeat(starts - np.concatenate(([0], np.cumsum(lengths)[:-1])), lengths)
+    return np.arange(lengths.sum(), dtype=np.int64) + offsets
+
+
+def _project(lon, lat, origin: Tuple[float, float]) -> np.ndarray:
+    """Equirectangular projection to metres around ``origin`` (fine at city scale)."""
+    lon = np.asarray(lon, dtype=np.float64)
+    lat = np.asarray(lat, dtype=np.float64)
+    x = np.radians(lon - origin[0]) * EARTH_RADIUS_M * math.cos(math.radians(origin[1]))
+    y = np.radians(lat - origin[1]) * EARTH_RADIUS_M
+    return np.stack([x, y], axis=-1)
+
+
+def _point_segment_distance(points: np.ndarray, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Distance matrix ``(len(points), len(a))`` from points to segments ``a-b``."""
+    ab = b - a
+    length2 = np.einsum("ij,ij->i", ab, ab)
+    length2[length2 == 0] = 1.0
+    ap = points[:, None, :] - a[None, :, :]
+    t = np.clip(np.einsum("pij,ij->pi", ap, ab) / length2, 0.0, 1.0)
+    closest = a[None, :, :] + t[..., None] * ab[None, :, :]
+    return np.linalg.norm(points[:, None, :] - closest, axis=2)
+
+
+class SpatialIndex:
+    def __init__(
+        self,
+        origin: Tuple[float, float],
+        osmids: np.ndarray,
+        names: List[str],
+        name_codes: np.ndarray,
+        name_offsets: np.ndarray,
+        coords: np.ndarray,
+        coord_offsets: np.ndarray,
+        cell_size: float = CELL_SIZE_M,
+        digest: str = "",
+    ):
+        self.origin = origin  # (lon0, lat0) de la proyección local
+        self.osmids = osmids
+        self.names = names
+        self.name_codes = name_codes
+        self.name_offsets = name_offsets
+        self.coords = coords  # vértices en metros (x, y)
+        self.coord_offsets = coord_offsets
+        self.cell_size = cell_size
+        self.digest = digest
+
+        n = len(osmids)
+        self.seg_offsets = coord_offsets - np.arange(n + 1)  # un tramo de k vértices tiene k-1 segmentos
+        is_seg = np.ones(len(coords), dtype=bool)
+        is_seg[coord_offsets[1:] - 1] = False
+        self.seg_a = coords[is_seg]
+        self.seg_b = coords[np.flatnonzero(is_seg) + 1]
+        self.seg_feature = np.repeat(np.arange(n), np.diff(self.seg_offsets))
+
+        starts = coord_offsets[:-1]
+        self.bbox = np.column_stack([
+            np.minimum.reduceat(coords[:, 0], starts),
+            np.minimum.reduceat(coords[:, 1], starts),
+            np.maximum.reduceat(coords[:, 0], starts),
+            np.maximum.reduceat(coords[:, 1], starts),
+        ])
+        self._build_grid()
+        self._build_name_lookup()
+        self._feature_rows: Optional[List[List[int]]] = None
+        self._records: Sequence[SimulationRecord] = []
+
+    # ------------------------------------------------------------------ carga
+    @classmethod
+    def from_geojson(cls, geo: dict, digest: str = "", cell_size: float = CELL_SIZE_M) -> "SpatialIndex":
+        features = [f for f in geo.get("features", []) if (f.get("geometry") or {}).get("type") == "LineString"]
+        names: List[str] = []
+        name_ids: Dict[str, int] = {}
+        name_codes: List[int] = []
+        name_offsets = [0]
+        lonlat: List[Sequence[float]] = []
+        coord_offsets = [0]
+        osmids = []
+        for f in features:
+            props = f.get("properties") or {}
+            raw_names = props.get("name")
+            for name in raw_names if isinstance(raw_names, list) else [raw_names]:
+                if name and name != "Sin nombre":
+                    if name not in name_ids:
+                        name_ids[name] = len(names)
+                        names.append(name)
+                    name_codes.append(name_ids[name])
+            name_offsets.append(len(name_codes))
+            osmid = props.get("osmid")
+            osmids.append(int(osmid[0] if isinstance(osmid, list) else osmid or -1))
+            lonlat.extend(c[:2] for c in f["geometry"]["coordinates"])
+            coord_offsets.append(len(lonlat))
+
+        ll = np.asarray(lonlat, dtype=np.float64).reshape(-1, 2)
+        origin = (float(ll[:, 0].mean()), float(ll[:, 1].mean())) if len(ll) else (0.0, 0.0)
+        return cls(
+            origin,
+            np.asarray(osmids, dtype=np.int64),
+            names,
+            np.asarray(name_codes, dtype=np.int32),
+            np.asarray(name_offsets, dtype=np.int64),
+            _project(ll[:, 0], ll[:, 1], origin),
+            np.asarray(coord_offsets, dtype=np.int64),
+            cell_size,
+            digest,
+        )
+
+    def save(self, path: Path) -> None:
+        atomic_savez(
+            path,
+            version=np.int32(CACHE_VERSION),
+            digest=np.str_(self.digest),
+            origin=np.asarray(self.origin),
+            osmids=self.osmids,
+            names=np.asarray(self.names, dtype=np.str_),
+            name_codes=self.name_codes,
+            name_offsets=self.name_offsets,
+            coords=self.coords,
+            coord_offsets=self.coord_offsets,
+            cell_size=np.float64(self.cell_size),
+        )
+
+    @classmethod
+    def load(cls, path: Path, digest: Optional[str] = None) -> Optional["SpatialIndex"]:
+        try:
+            with np.load(path, allow_pickle=False) as z:
+                if int(z["version"]) != CACHE_VERSION:
+                    return None
+                if digest is not None and str(z["digest"]) != digest:
+                    return None
+                return cls(
+                    tuple(z["origin"].tolist()),
+                    z["osmids"],
+                    z["names"].tolist(),
+                    z["name_codes"],
+                    z["name_offsets"],
+                    z["coords"],
+                    z["coord_offsets"],
+                    float(z["cell_size"]),
+                    str(z["digest"]),
+                )
+        except (OSError, KeyError, ValueError):
+            return None
+
+    # ------------------------------------------------------------ estructuras
+    def project(self, lon, lat) -> np.ndarray:
+        return _project(lon, lat, self.origin)
+
+    def _cell(self, xy: np.ndarray) -> np.ndarray:
+        return np.floor((xy - self._grid_min) / self.cell_size).astype(np.int64)
+
+    def _build_grid(self) -> None:
+        """Sorted ``(cell key, feature)`` pairs covering every feature's bounding box."""
+        self._grid_min = self.coords.min(axis=0) if len(self.coords) else np.zeros(2)
+        lo = self._cell(self.bbox[:, :2])
+        hi = self._cell(self.bbox[:, 2:])
+        self._grid_rows = int(hi[:, 1].max()) + 1 if len(hi) else 1
+        width = hi[:, 0] - lo[:, 0] + 1
+        height = hi[:, 1] - lo[:, 1] + 1
+        counts = width * height
+        features = np.repeat(np.arange(len(counts)), counts)
+        local = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        ix = lo[features, 0] + local // height[features]
+        iy = lo[features, 1] + local % height[features]
+        keys = ix * self._grid_rows + iy
+        order = np.argsort(keys, kind="stable")
+        self._cell_keys = keys[order]
+        self._cell_features = features[order].astype(np.int32)
+
+    def _build_name_lookup(self) -> None:
+        feature_of = np.repeat(np.arange(len(self.osmids)), np.diff(self.name_offsets))
+        self._features_by_name: Dict[str, np.ndarray] = {}
+        order = np.argsort(self.name_codes, kind="stable")
+        codes, starts = np.unique(self.name_codes[order], return_index=True)
+        bounds = np.append(starts, len(order))
+        for k, code in enumerate(codes):
+            self._features_by_name[self.names[code].lower()] = np.unique(feature_of[order[bounds[k]:bounds[k + 1]]])
+
+    def _candidates(self, x0: float, y0: float, x1: float, y1: float) -> np.ndarray:
+        """Features registered in any grid cell overlapping the box (metres)."""
+        (cx0, cy0), (cx1, cy1) = self._cell(np.array([[x0, y0], [x1, y1]]))
+        cy0, cy1 = max(cy0, 0), min(cy1, self._grid_rows - 1)
+        if cy1 < cy0:
+            return np.empty(0, dtype=np.int64)
+        columns = np.arange(max(cx0, 0), max(cx1, -1) + 1)
+        lo = np.searchsorted(self._cell_keys, columns * self._grid_rows + cy0, side="left")
+        hi = np.searchsorted(self._cell_keys, columns * self._grid_rows + cy1, side="right")
+        return np.unique(self._cell_features[_ranges(lo, hi)])
+
+    def _candidates_around(self, points: np.ndarray, radius_m: float) -> np.ndarray:
+        """Features in the grid cells within ``radius_m`` of any of ``points`` (metres)."""
+        reach = int(math.ceil(radius_m / self.cell_size))
+        cells = np.unique(self._cell(points), axis=0)
+        dx, dy = np.meshgrid(np.arange(-reach, reach + 1), np.arange(-reach, reach + 1), indexing="ij")
+        around = (cells[:, None, :] + np.stack([dx.ravel(), dy.ravel()], axis=1)[None, :, :]).reshape(-1, 2)
+        around = around[(around[:, 1] >= 0) & (around[:, 1] < self._grid_rows) & (around[:, 0] >= 0)]
+        keys = np.unique(around[:, 0] * self._grid_rows + around[:, 1])
+        lo = np.searchsorted(self._cell_keys, keys, side="left")
+        hi = np.searchsorted(self._cell_keys, keys, side="right")
+        return np.unique(self._cell_features[_ranges(lo, hi)])
+
+    # --------------------------------------------------------------- consultas
+    def __len__(self) -> int:
+        return len(self.osmids)
+
+    def in_bbox(self, min_lon: float, min_lat: float, max_lon: float, max_lat: float) -> np.ndarray:
+        """Features whose bounding box intersects the lon/lat box."""
+        (x0, y0), (x1, y1) = self.project([min_lon, max_lon], [min_lat, max_lat])
+        cand = self._candidates(x0, y0, x1, y1)
+        b = self.bbox[cand]
+        return cand[(b[:, 0] <= x1) & (b[:, 2] >= x0) & (b[:, 1] <= y1) & (b[:, 3] >= y0)]
+
+    def _distance_to(self, points: np.ndarray, features: np.ndarray, chunk: int = 256) -> np.ndarray:
+        """Minimum distance from any of ``points`` to each feature's polyline."""
+        segs = _ranges(self.seg_offsets[features], self.seg_offsets[features + 1])
+        if not len(segs):
+            return np.full(len(features), np.inf)
+        best = np.full(len(segs), np.inf)
+        for start in range(0, len(points), chunk):
+            d = _point_segment_distance(points[start:start + chunk], self.seg_a[segs], self.seg_b[segs])
+            best = np.minimum(best, d.min(axis=0))
+        per_feature = np.full(len(self.osmids), np.inf)
+        np.minimum.at(per_feature, self.seg_feature[segs], best)
+        return per_feature[features]
+
+    def within(self, lon: float, lat: float, radius_m: float) -> List[Tuple[int, float]]:
+        """``(feature, distance_m)`` for features within ``radius_m`` of the point, nearest first."""
+        point = self.project([lon], [lat])
+        x, y = point[0]
+        cand = self._candidates(x - radius_m, y - radius_m, x + radius_m, y + radius_m)
+        dist = self._distance_to(point, cand)
+        keep = dist <= radius_m
+        order = np.argsort(dist[keep], kind="stable")
+        return [(int(f), float(d)) for f, d in zip(cand[keep][order], dist[keep][order])]
+
+    def nearest(self, lon: float, lat: float, k: int = 5, max_radius_m: float = 5000.0) -> List[Tuple[int, float]]:
+        radius = self.cell_size
+        while True:
+            hits = self.within(lon, lat, radius)
+            if len(hits) >= k or radius >= max_radius_m:
+                return hits[:k]
+            radius *= 2
+
+    def named(self, name: str) -> np.ndarray:
+        return self._features_by_name.get(name.lower(), np.empty(0, dtype=np.int64))
+
+    def near_features(self, features: np.ndarray, radius_m: float) -> List[Tuple[int, float]]:
+        """Other features within ``radius_m`` of any vertex of ``features``, nearest first."""
+        features = np.asarray(features, dtype=np.int64)
+        if not len(features):
+            return []
+        points = self.coords[_ranges(self.coord_offsets[features], self.coord_offsets[features + 1])]
+        cand = np.setdiff1d(self._candidates_around(points, radius_m), features)
+        dist = self._distance_to(points, cand)
+        keep = dist <= radius_m
+        order = np.argsort(dist[keep], kind="stable")
+        return [(int(f), float(d)) for f, d in zip(cand[keep][order], dist[keep][order])]
+
+    def feature_names(self, feature: int) -> List[str]:
+        return [self.names[c] for c in self.name_codes[self.name_offsets[feature]:self.name_offsets[feature + 1]]]
+
+    # ------------------------------------------------------------ enlace datos
+    def link(self, records: Sequence[SimulationRecord]) -> None:
+        """Map each feature to the records of its OSM way (all ``#n`` pieces, both directions)."""
+        rows_by_way: Dict[int, List[int]] = defaultdict(list)
+        for i, rec in enumerate(records):
+            way = rec.edge_id.lstrip("-").split("#", 1)[0]
+            if way.isdigit():
+                rows_by_way[int(way)].append(i)
+        self._feature_rows = [rows_by_way.get(way, []) for way in self.osmids.tolist()]
+        self._records = records
+
+    def records_for(self, features: Iterable[int]) -> List[SimulationRecord]:
+        if self._feature_rows is None:
+            raise RuntimeError("SpatialIndex.link() must be called before records_for()")
+        seen = set()
+        out: List[SimulationRecord] = []
+        for f in features:
+            for row in self._feature_rows[f]:
+                if row not in seen:
+                    seen.add(row)
+                    out.append(self._records[row])
+        return out
+
+
+def load_spatial_index(path: Path, use_cache: bool = True) -> SpatialIndex:
+    """Load the GeoJSON through its ``.npz`` cache, rebuilding it when the file changed."""
+    digest = json_digest(path)
+    cache = cache_path_for(path)
+    if use_cache:
+        index = SpatialIndex.load(cache, digest)
+        if index is not None:
+            return index
+    with path.open("r", encoding="utf-8") as f:
+        index = SpatialIndex.from_geojson(json.load(f), digest)
+    if use_cache:
+        try:
+            index.save(cache)
+        except OSError:
+            pass
+    return index
@@ -0,0 +1,380 @@
+"""Almacén columnar compacto para ``edge_summary.json``.
+
+Las columnas numéricas viven en arreglos NumPy y los textos repetidos
+(nombres, tipos de vía) en tablas internadas referenciadas por código entero.
+Cada fila se expone como ``EdgeRow``, una vista con ``__slots__`` que ofrece
+los mismos atributos que ``SimulationRecord`` sin copiar datos.
+
+La primera carga convierte el JSON y guarda ``<datos>.npz`` al lado; las
+siguientes leen ese archivo mientras el hash del JSON no cambie.
+
+La telemetría en vivo no toca las columnas históricas: va a columnas aparte
+(``live_*``), un promedio móvil exponencial que caduca tras ``LIVE_MAX_AGE``
+intervalos sin muestras y se borra al empezar otra simulación. Las columnas
+``current_*`` dan el valor en vivo cuando existe y el histórico si no.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import math
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Union, overload
+
+import numpy as np
+
+CACHE_VERSION = 1
+_MISSING = -1  # código para nombre/tipo de vía ausente
+LIVE_ALPHA = 0.5  # peso de la muestra nueva en el promedio móvil en vivo
+LIVE_MAX_AGE = 3  # intervalos sin muestra tras los cuales el valor en vivo caduca
+
+
+def json_digest(path: Path) -> str:
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def cache_path_for(path: Path) -> Path:
+    return path.with_name(path.name + ".npz")
+
+
+def atomic_savez(path: Path, **arrays: np.ndarray) -> None:
+    """``np.savez`` through a temporary file so readers never see a partial cache."""
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+class _Interner:
+    def __init__(self) -> None:
+        self.table: List[str] = []
+        self._codes: Dict[str, int] = {}
+
+    def code(self, value: Optional[str]) -> int:
+        if value is None:
+            return _MISSING
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.table)
+            self.table.append(value)
+        return code
+
+
+def _optional_float(value: Any) -> float:
+    return float("nan") if value is None else float(value)
+
+
+class EdgeRow:
+    """Read-only view of one edge; attribute-compatible with ``SimulationRecord``."""
+
+    __slots__ = ("_store", "_i")
+
+    def __init__(self, store: "EdgeStore", i: int):
+        self._store = store
+        self._i = i
+
+    @property
+    def edge_id(self) -> str:
+        return self._store.edge_ids[self._i]
+
+    @property
+    def name(self) -> Optional[str]:
+        return self._store._lookup(self._store.names, self._store.name_codes[self._i])
+
+    @property
+    def highway(self) -> Optional[str]:
+        return self._store._lookup(self._store.highways, self._store.highway_codes[self._i])
+
+    @property
+    def avg_traveltime_s(self) -> Optional[float]:
+        return self._store._value(self._store.traveltime, self._i)
+
+    @property
+    def avg_congestion_pct(self) -> Optional[float]:
+        return self._store._value(self._store.congestion, self._i)
+
+    @property
+    def live_traveltime_s(self) -> Optional[float]:
+        return self._store._live_value(self._store.live_traveltime, self._i)
+
+    @property
+    def live_congestion_pct(self) -> Optional[float]:
+        return self._store._live_value(self._store.live_congestion, self._i)
+
+    @property
+    def intervals_with_data(self) -> int:
+        return int(self._store.intervals[self._i])
+
+    @property
+    def osmids(self) -> List[str]:
+        start, end = self._store.osmid_offsets[self._i], self._store.osmid_offsets[self._i + 1]
+        return self._store.osmids[start:end]
+
+    @property
+    def raw(self) -> Dict[str, Any]:
+        """The original JSON object, rebuilt on demand."""
+        return {
+            "edge_id": self.edge_id,
+            "osmids": self.osmids,
+            "highway": self.highway,
+            "name": self.name,
+            "avg_traveltime_s": self.avg_traveltime_s,
+            "avg_congestion_pct": self.avg_congestion_pct,
+            "intervals_with_data": self.intervals_with_data,
+        }
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, EdgeRow) and other._store is self._store and other._i == self._i
+
+    def __hash__(self) -> int:
+        return hash((id(self._store), self._i))
+
+    def __repr__(self) -> str:
+        return f"EdgeRow(edge_id={self.edge_id!r}, name={self.name!r}, congestion={self.avg_congestion_pct})"
+
+
+class EdgeStore(Sequence[EdgeRow]):
+    """Columnar edge data. Iterating yields ``EdgeRow`` views in file order."""
+
+    def __init__(
+        self,
+        edge_ids: List[str],
+        names: List[str],
+        name_codes: np.ndarray,
+        highways: List[str],
+        highway_codes: np.ndarray,
+        traveltime: np.ndarray,
+        congestion: np.ndarray,
+        intervals: np.ndarray,
+        osmids: List[str],
+        osmid_offsets: np.ndarray,
+        digest: str = "",
+    ):
+        n = len(edge_ids)
+        self.edge_ids = edge_ids
+        self.names = names
+        self.name_codes = name_codes
+        self.highways = highways
+        self.highway_codes = highway_codes
+        self.traveltime = traveltime
+        self.congestion = congestion
+        self.intervals = intervals
+        self.osmids = osmids
+        self.osmid_offsets = osmid_offsets
+        self.digest = digest
+        self.revision = 0  # actualizaciones en vivo aplicadas desde la carga
+        # Solo en memoria: no se guardan en el caché .npz.
+        self.live_traveltime = np.full(n, np.nan)
+        self.live_congestion = np.full(n, np.nan)
+        self.live_interval = np.full(n, -1, dtype=np.int64)  # último intervalo con muestra
+        self.live_clock = -1  # último intervalo recibido
+        self._positions: Optional[Dict[str, int]] = None
+
+    @property
+    def data_version(self) -> str:
+        """File hash, plus the live revision once telemetry has been applied."""
+        return self.digest if not self.revision else f"{self.digest}+{self.revision}"
+
+    def position(self, edge_id: str) -> Optional[int]:
+        if self._positions is None:
+            self._positions = {e: i for i, e in enumerate(self.edge_ids)}
+        return self._positions.get(edge_id)
+
+    def append_edges(self, edge_ids: List[str]) -> List[int]:
+        """Add unnamed rows with no data yet for edges missing from the file."""
+        start = len(self.edge_ids)
+        n = len(edge_ids)
+        self.edge_ids.extend(edge_ids)
+        self.name_codes = np.concatenate([self.name_codes, np.full(n, _MISSING, dtype=np.int32)])
+        self.highway_codes = np.concatenate([self.highway_codes, np.full(n, _MISSING, dtype=np.int32)])
+        self.traveltime = np.concatenate([self.traveltime, np.full(n, np.nan)])
+        self.congestion = np.concatenate([self.congestion, np.full(n, np.nan)])
+        self.intervals = np.concatenate([self.intervals, np.zeros(n, dtype=np.int32)])
+        self.live_traveltime = np.concatenate([self.live_traveltime, np.full(n, np.nan)])
+        self.live_congestion = np.concatenate([self.live_congestion, np.full(n, np.nan)])
+        self.live_interval = np.concatenate([self.live_interval, np.full(n, -1, dtype=np.int64)])
+        self.osmid_offsets = np.concatenate([self.osmid_offsets, np.full(n, self.osmid_offsets[-1])])
+        if self._positions is not None:
+            self._positions.update((e, start + k) for k, e in enumerate(edge_ids))
+        return list(range(start, start + n))
+
+    def apply_samples(
+        self,
+        rows: np.ndarray,
+        traveltime: np.ndarray,
+        congestion: np.ndarray,
+        intervals: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        """Update the live columns with one measurement per entry; return the touched rows.
+
+        ``intervals`` numbers the edgeData interval of each sample (default: one
+        new interval for the whole batch). Each touched row takes one EMA step
+        (``LIVE_ALPHA``) with its newest sample; the historical averages are
+        left as loaded. Only the touched rows are read or written.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        if intervals is None:
+            intervals = np.full(len(rows), self.live_clock + 1, dtype=np.int64)
+        intervals = np.asarray(intervals, dtype=np.int64)
+        # Muestra más reciente de cada fila: primera aparición en el lote invertido.
+        touched, first = np.unique(rows[::-1], return_index=True)
+        newest = len(rows) - 1 - first
+        for live, values in ((self.live_traveltime, traveltime), (self.live_congestion, congestion)):
+            sample = np.asarray(values, dtype=np.float64)[newest]
+            previous = live[touched]
+            fresh = np.isnan(previous) | ~self.live_mask(touched)
+            live[touched] = np.where(fresh, sample, LIVE_ALPHA * sample + (1.0 - LIVE_ALPHA) * previous)
+        self.live_interval[touched] = intervals[newest]
+        if len(intervals):
+            self.live_clock = max(self.live_clock, int(intervals.max()))
+        self.revision += 1
+        return touched
+
+    def clear_live(self) -> None:
+        """Drop every live value (a new simulation started)."""
+        self.live_traveltime[:] = np.nan
+        self.live_congestion[:] = np.nan
+        self.live_interval[:] = -1
+        self.live_clock = -1
+        self.revision += 1
+
+    def live_mask(self, rows: Union[np.ndarray, slice] = slice(None)) -> np.ndarray:
+        interval = self.live_interval[rows]
+        return (interval >= 0) & (self.live_clock - interval < LIVE_MAX_AGE)
+
+    @property
+    def current_traveltime(self) -> np.ndarray:
+        """Fresh live travel time where available, historical average elsewhere."""
+        return np.where(self.live_mask(), self.live_traveltime, self.traveltime)
+
+    @property
+    def current_congestion(self) -> np.ndarray:
+        return np.where(self.live_mask(), self.live_congestion, self.congestion)
+
+    def _live_value(self, column: np.ndarray, i: int) -> Optional[float]:
+        return self._value(column, i) if self.live_mask(slice(i, i + 1))[0] else None
+
+    @staticmethod
+    def _lookup(table: List[str], code: int) -> Optional[str]:
+        return None if code == _MISSING else table[code]
+
+    @staticmethod
+    def _value(column: np.ndarray, i: int) -> Optional[float]:
+        value = float(column[i])
+        return None if math.isnan(value) else value
+
+    @classmethod
+    def from_records(cls, raw: List[Dict[str, Any]], digest: str = "") -> "EdgeStore":
+        names, highways = _Interner(), _Interner()
+        osmids: List[str] = []
+        offsets = [0]
+        for r in raw:
+            osmids.extend(str(o) for o in (r.get("osmids") or []))
+            offsets.append(len(osmids))
+        return cls(
+            edge_ids=[r.get("edge_id", "") for r in raw],
+            names=names.table,
+            name_codes=np.fromiter((names.code(r.get("name")) for r in raw), dtype=np.int32, count=len(raw)),
+            highways=highways.table,
+            highway_codes=np.fromiter((highways.code(r.get("highway")) for r in raw), dtype=np.int32, count=len(raw)),
+            traveltime=np.fromiter((_optional_float(r.get("avg_traveltime_s")) for r in raw), dtype=np.float64, count=len(raw)),
+            congestion=np.fromiter((_optional_float(r.get("avg_congestion_pct")) for r in raw), dtype=np.float64, count=len(raw)),
+            intervals=np.fromiter((int(r.get("intervals_with_data") or 0) for r in raw), dtype=np.int32, count=len(raw)),
+            osmids=osmids,
+            osmid_offsets=np.asarray(offsets, dtype=np.int64),
+            digest=digest,
+        )
+
+    def save(self, path: Path) -> None:
+        """Write the columns as an uncompressed ``.npz`` (atomic replace)."""
+        atomic_savez(
+            path,
+            version=np.int32(CACHE_VERSION),
+            digest=np.str_(self.digest),
+            edge_ids=np.asarray(self.edge_ids, dtype=np.str_),
+            names=np.asarray(self.names, dtype=np.str_),
+            name_codes=self.name_codes,
+            highways=np.asarray(self.highways, dtype=np.str_),
+            highway_codes=self.highway_codes,
+            traveltime=self.traveltime,
+            congestion=self.congestion,
+            intervals=self.intervals,
+            osmids=np.asarray(self.osmids, dtype=np.str_),
+            osmid_offsets=self.osmid_offsets,
+        )
+
+    @classmethod
+    def load(cls, path: Path, digest: Optional[str] = None) -> Optional["EdgeStore"]:
+        """Load a cache written by ``save``; ``None`` if missing, stale or from another version."""
+        try:
+            with np.load(path, allow_pickle=False) as z:
+                if int(z["version"]) != CACHE_VERSION:
+                    return None
+                if digest is not None and str(z["digest"]) != digest:
+                    return None
+                return cls(
+                    edge_ids=z["edge_ids"].tolist(),
+                    names=z["names"].tolist(),
+                    name_codes=z["name_codes"],
+                    highways=z["highways"].tolist(),
+                    highway_codes=z["highway_codes"],
+                    traveltime=z["traveltime"],
+                    congestion=z["congestion"],
+                    intervals=z["intervals"],
+                    osmids=z["osmids"].tolist(),
+                    osmid_offsets=z["osmid_offsets"],
+                    digest=str(z["digest"]),
+                )
+        except (OSError, KeyError, ValueError):
+            return None
+
+    def __len__(self) -> int:
+        return len(self.edge_ids)
+
+    @overload
+    def __getitem__(self, i: int) -> EdgeRow: ...
+
+    @overload
+    def __getitem__(self, i: slice) -> List[EdgeRow]: ...
+
+    def __getitem__(self, i: Union[int, slice]) -> Union[EdgeRow, List[EdgeRow]]:
+        if isinstance(i, slice):
+            return [EdgeRow(self, j) for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return EdgeRow(self, i)
+
+    def __iter__(self) -> Iterator[EdgeRow]:
+        for i in range(len(self)):
+            yield EdgeRow(self, i)
+
+
+def load_store(path: Path, use_cache: bool = True) -> EdgeStore:
+    """Load ``path`` through its ``.npz`` cache, rebuilding it when the JSON changed."""
+    digest = json_digest(path)
+    cache = cache_path_for(path)
+    if use_cache:
+        store = EdgeStore.load(cache, digest)
+        if store is not None:
+            return store
+    with path.open("r", encoding="utf-8") as f:
+        store = EdgeStore.from_records(json.load(f), digest)
+    if use_cache:
+        try:
+            store.save(cache)
+        except OSError:
+            pass  # directorio de solo lectura: se usa el JSON en cada arranque
+    return store
@@ -12,12 +12,13 @@ Con warmup (ejecuta una petición mínima al modelo):
 
 Variables opcionales:
     REPORTER_MODEL (default: llama3)
+    OLLAMA_BASE_URL (default: http://127.0.0.1:11434)
     REPORTER_DATA_PATH
     REPORTER_CACHE_SIZE
     NGROK_AUTHTOKEN
 
 Requisitos:
-    pip install fastapi uvicorn pyngrok
+    pip install fastapi uvicorn httpx pyngrok
     Instalar ngrok y agregarlo al PATH.
 """
 from __future__ import annotations
@@ -91,24 +92,22 @@ def warmup_model(question: str):
     try:
         settings = get_settings()
         model = settings.ollama_model if hasattr(settings, "ollama_model") else settings.model  # retrocompatibilidad
+        base_url = settings.ollama_base_url
     except Exception:
-        from reporter.core.config import DEFAULT_OLLAMA_MODEL  # type: ignore
+        from reporter.core.config import DEFAULT_OLLAMA_MODEL, DEFAULT_OLLAMA_BASE_URL  # type: ignore
         model = DEFAULT_OLLAMA_MODEL
-    print(f"[warmup] Ejecutando prompt inicial contra modelo {model}")
+        base_url = DEFAULT_OLLAMA_BASE_URL
+    print(f"[warmup] Ejecutando prompt inicial contra modelo {model} en {base_url}")
+    from reporter.services.llm_client import LLMClient, LLMError
+
+    client = LLMClient(model, base_url=base_url, timeout=60, retries=0)
     try:
-        proc = subprocess.Popen([
-            "ollama", "run", model
-        ], stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        out_b, err_b = proc.communicate(question.encode("utf-8"), timeout=60)
-        out = out_b.decode("utf-8", errors="replace") if out_b else ""
-        err = err_b.decode("utf-8", errors="replace") if err_b else ""
-        if err:
-            print("[warmup] stderr:", err.strip())
+        out = client.ask(question)
         print("[warmup] respuesta parcial:", out.strip()[:200], "...")
-    except FileNotFoundError:
-        print("[warmup] Ollama no encontrado en PATH, omitiendo warmup")
-    except Exception as exc:  # noqa: BLE001
+    except LLMError as exc:
         print("[warmup] Error warmup:", exc)
+    finally:
+        client.close()
 
 
 def parse_args():
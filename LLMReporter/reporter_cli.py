@@ -9,7 +9,15 @@ Modo interactivo:
 Variables de entorno útiles:
     REPORTER_DATA_PATH   Ruta al JSON de datos (si no usa nombres por defecto)
     OLLAMA_MODEL / REPORTER_MODEL  Modelo Ollama (default: llama3:8b)
+    OLLAMA_BASE_URL      URL de la API HTTP de Ollama (default: http://127.0.0.1:11434)
     REPORTER_CACHE_SIZE  Tamaño del caché LRU (default 512)
+    REPORTER_CACHE_TTL   Vigencia (s) de las respuestas por intención (default 3600, 0 = sin límite)
+    REPORTER_CACHE_DB    Archivo SQLite para conservar ese caché entre ejecuciones
+    REPORTER_GEO_PATH    GeoJSON de calles para preguntas "cerca de ..." (default street_data.geojson)
+    REPORTER_EDGEDATA    edgeData de una simulación en curso (se lee antes de cada pregunta),
+                         p. ej. sumoData/edgeData_live.xml (intervalos de 60 s; lo escribe
+                         una corrida con --live_edge_data o sumo -c SumoConfigSim.sumocfg)
+    REPORTER_METRICS_CSV Patrón glob de los CSV por paso de sumo-rl (p. ej. "outputs/run*.csv")
 
 Si no se encuentra un archivo de datos compatible se mostrará un error claro.
 """
@@ -18,14 +26,17 @@ from __future__ import annotations
 import sys
 import json
 from pathlib import Path
-from typing import Optional
+from typing import Iterator, Optional
 
 from reporter.core.config import get_settings, DEFAULT_OLLAMA_MODEL
 from reporter.services.data_loader import load_data
 from reporter.core.indexes import Indexes
-from reporter.core.cache import AnswerCache
-from reporter.services.llm_client import LLMClient
+from reporter.core.cache import AnswerCache, SemanticCache
+from reporter.services.llm_client import LLMClient, LLMError
 from reporter.services.analyzer import TrafficAnalyzer
+from reporter.services.telemetry import TelemetryIngestor
+from reporter.core.aggregates import Aggregates
+from reporter.core.spatial import load_spatial_index
 
 
 def init_components():
@@ -36,21 +47,90 @@ def init_components():
     data = load_data(settings.data_path)
     indexes = Indexes(data)
     cache = AnswerCache(settings.cache_size)
-    llm = LLMClient(settings.ollama_model)
-    analyzer = TrafficAnalyzer(indexes, data)
-    return settings, data, indexes, cache, llm, analyzer
+    semantic = SemanticCache(data.digest, settings.cache_size, settings.cache_ttl, settings.cache_db_path)
+    llm = LLMClient(
+        settings.ollama_model,
+        base_url=settings.ollama_base_url,
+        timeout=settings.suggestion_timeout,
+        retries=settings.llm_retries,
+    )
+    aggregates = Aggregates(data)
+    spatial = load_spatial_index(settings.geo_path) if settings.geo_path else None
+    if spatial is not None:
+        spatial.link(data)
+    ingestor = TelemetryIngestor(data, indexes, aggregates, settings.telemetry_edge_data, settings.telemetry_csv)
+    analyzer = TrafficAnalyzer(indexes, data, aggregates, live_status=ingestor.system_status, spatial=spatial)
+    return settings, data, indexes, cache, semantic, llm, analyzer, ingestor
 
 
-def ask_once(question: str, cache: AnswerCache, analyzer: TrafficAnalyzer, llm: LLMClient):
+def refresh_telemetry(ingestor: TelemetryIngestor, cache: AnswerCache, semantic: Optional[SemanticCache] = None):
+    if ingestor.enabled and ingestor.poll():
+        cache.clear()
+        if semantic is not None:
+            semantic.invalidate(ingestor.data_version)
+
+
+def ask_once(
+    question: str,
+    cache: AnswerCache,
+    analyzer: TrafficAnalyzer,
+    llm: LLMClient,
+    semantic: Optional[SemanticCache] = None,
+):
     cached = cache.get(question)
     if cached is not None:
         return {"question": question, "answer": cached, "cached": True}
-    answer = analyzer.analyze(question, llm)
+    resolved = analyzer.resolve(question)
+    intent = analyzer.intent_key(question, resolved) if semantic is not None else None
+    if intent is not None:
+        cached = semantic.get(intent)
+        if cached is not None:
+            cache.set(question, cached)
+            return {"question": question, "answer": cached, "cached": True}
+    answer = analyzer.analyze(question, llm, resolved)
     cache.set(question, answer)
+    if intent is not None:
+        semantic.set(intent, answer)
     return {"question": question, "answer": answer, "cached": False}
 
 
-def interactive(cache: AnswerCache, analyzer: TrafficAnalyzer, llm: LLMClient):
+def stream_once(
+    question: str,
+    cache: AnswerCache,
+    analyzer: TrafficAnalyzer,
+    llm: LLMClient,
+    semantic: Optional[SemanticCache] = None,
+) -> Iterator[str]:
+    """Like ``ask_once`` but yields the answer fragment by fragment; caches it once complete."""
+    cached = cache.get(question)
+    intent = resolved = None
+    if cached is None:
+        resolved = analyzer.resolve(question)
+    if cached is None and semantic is not None:
+        intent = analyzer.intent_key(question, resolved)
+        cached = semantic.get(intent)
+        if cached is not None:
+            cache.set(question, cached)
+    if cached is not None:
+        yield cached
+        return
+    parts = []
+    for text in analyzer.analyze_stream(question, llm, resolved):
+        parts.append(text)
+        yield text
+    answer = "".join(parts)
+    cache.set(question, answer)
+    if intent is not None:
+        semantic.set(intent, answer)
+
+
+def interactive(
+    cache: AnswerCache,
+    analyzer: TrafficAnalyzer,
+    llm: LLMClient,
+    semantic: Optional[SemanticCache] = None,
+    ingestor: Optional[TelemetryIngestor] = None,
+):
     print("[cli] Modo interactivo. Ctrl+C para salir.")
     while True:
         try:
@@ -60,18 +140,30 @@ def interactive(cache: AnswerCache, analyzer: TrafficAnalyzer, llm: LLMClient):
             break
         if not q:
             continue
-        result = ask_once(q, cache, analyzer, llm)
-        print("[respuesta]", result["answer"])
+        if ingestor is not None:
+            refresh_telemetry(ingestor, cache, semantic)
+        print("[respuesta] ", end="", flush=True)
+        try:
+            for text in stream_once(q, cache, analyzer, llm, semantic):
+                print(text, end="", flush=True)
+        except LLMError as exc:
+            print("\n[error]", exc)
+            continue
+        print()
 
 
 def main(argv: list[str]):
-    settings, _data, _indexes, cache, llm, analyzer = init_components()
-    if len(argv) > 1:
-        question = " ".join(argv[1:]).strip()
-        out = ask_once(question, cache, analyzer, llm)
-        print(json.dumps(out, ensure_ascii=False, indent=2))
-    else:
-        interactive(cache, analyzer, llm)
+    settings, _data, _indexes, cache, semantic, llm, analyzer, ingestor = init_components()
+    refresh_telemetry(ingestor, cache, semantic)
+    try:
+        if len(argv) > 1:
+            question = " ".join(argv[1:]).strip()
+            out = ask_once(question, cache, analyzer, llm, semantic)
+            print(json.dumps(out, ensure_ascii=False, indent=2))
+        else:
+            interactive(cache, analyzer, llm, semantic, ingestor)
+    finally:
+        semantic.close()
 
 
 if __name__ == "__main__":  # pragma: no cover
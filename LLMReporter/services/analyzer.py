@@ -1,25 +1,184 @@
-from typing import List
-from reporter.core.indexes import Indexes
-from reporter.core.models import SimulationRecord
-from reporter.utils.prompt import build_prompt
+import hashlib
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+from reporter.core.aggregates import Aggregates, StreetRollup
+from reporter.core.indexes import Indexes, normalize_text, query_terms
+from reporter.core.models import SimulationRecord, current_congestion
+from reporter.core.spatial import SpatialIndex
+from reporter.utils.prompt import MAX_RECORDS, build_prompt
+
+# Palabras (ya normalizadas) que identifican el tipo de vía de OSM.
+_HIGHWAY_WORDS = {
+    "residencial": "highway.residential",
+    "residenciales": "highway.residential",
+    "primaria": "highway.primary",
+    "primarias": "highway.primary",
+    "principal": "highway.primary",
+    "principales": "highway.primary",
+    "secundaria": "highway.secondary",
+    "secundarias": "highway.secondary",
+    "terciaria": "highway.tertiary",
+    "terciarias": "highway.tertiary",
+    "servicio": "highway.service",
+}
+# Tipo de pregunta por palabras clave (en orden de prioridad); por defecto "estado".
+_QUESTION_TYPES = (
+    ("comparacion", {"compara", "comparar", "comparacion", "versus", "vs", "mas", "menos", "mayor", "menor", "peor", "peores", "mejor", "mejores", "ranking"}),
+    ("tiempo", {"tiempo", "tiempos", "tarda", "demora", "duracion", "minutos", "segundos", "viaje"}),
+    ("congestion", {"congestion", "congestionada", "congestionadas", "congestionado", "trancon", "trancones", "atasco", "atascos", "embotellamiento"}),
+)
+# "cerca de la carrera 14": tramos alrededor de la calle en vez de la calle misma.
+_NEAR_WORDS = {
+    "cerca", "cercana", "cercanas", "cercano", "cercanos", "cercania", "cercanias",
+    "alrededor", "alrededores", "junto", "proximidades", "aledana", "aledanas", "aledanos", "near",
+}
+# Palabras de la pregunta que no son parte del nombre de una calle.
+_KEYWORDS = frozenset(_HIGHWAY_WORDS).union(_NEAR_WORDS, *(words for _qtype, words in _QUESTION_TYPES))
+# Palabras que ya quedan recogidas en el tipo, el alcance o los destinos de la clave.
+# Las de dirección (más/menos, mayor/menor, mejor/peor) y los números no están
+# aquí: distinguen "la más congestionada" de "la menos congestionada".
+_INTENT_COVERED = frozenset(_HIGHWAY_WORDS).union(
+    _NEAR_WORDS, _QUESTION_TYPES[1][1], _QUESTION_TYPES[2][1],
+    {"compara", "comparar", "comparacion", "versus", "vs", "tiene", "tienen"},
+)
+NEAR_RADIUS_M = 300.0
+STREET_SUMMARY_K = 3
+
+
+class Resolution(NamedTuple):
+    """What a question is about: scope, resolved targets and the records to use."""
+    scope: str
+    targets: Tuple[str, ...]
+    records: List[SimulationRecord]
+
+
+def format_rollup(s: StreetRollup) -> str:
+    return f"via={s.name} tramos={s.segments} tmedio={s.avg_traveltime_s:.2f}s congestion={s.avg_congestion_pct:.2f}%"
+
 
 class TrafficAnalyzer:
-    def __init__(self, indexes: Indexes, full_data: List[SimulationRecord]):
+    def __init__(
+        self,
+        indexes: Indexes,
+        full_data: List[SimulationRecord],
+        aggregates: Optional[Aggregates] = None,
+        live_status: Optional[Callable[[], Optional[Dict[str, float]]]] = None,
+        spatial: Optional[SpatialIndex] = None,
+    ):
         self.indexes = indexes
         self.full_data = full_data
+        self.aggregates = aggregates or Aggregates(full_data)
+        self.live_status = live_status  # métricas del sistema de la simulación en curso (telemetría)
+        self.spatial = spatial  # geometría de las calles; ya enlazada con ``full_data``
 
-    def select_records(self, question: str) -> List[SimulationRecord]:
-        street = self.indexes.detect_street(question)
-        if street:
-            hits = self.indexes.approximate(street)
+    @staticmethod
+    def detect_highway(question: str) -> Optional[str]:
+        for tok in normalize_text(question).split():
+            if tok in _HIGHWAY_WORDS:
+                return _HIGHWAY_WORDS[tok]
+        return None
+
+    @staticmethod
+    def question_type(question: str) -> str:
+        tokens = set(normalize_text(question).split())
+        for qtype, words in _QUESTION_TYPES:
+            if tokens & words:
+                return qtype
+        return "estado"
+
+    def resolve(self, question: str) -> Resolution:
+        """Resolve the question once (index and spatial lookups); reuse it for the key and the prompt."""
+        names = [name for street in self.indexes.detect_streets(question) for _score, name in self.indexes.search(street)]
+        names = list(dict.fromkeys(names))
+        if not names:
+            names = [name for _score, name in self.indexes.search(question, ignore=_KEYWORDS)]
+        if names and self.spatial is not None and set(normalize_text(question).split()) & _NEAR_WORDS:
+            nearby = self.records_near(names)
+            if nearby:
+                return Resolution("cerca", tuple(names), nearby)
+        if names:
+            return Resolution("calle", tuple(names), self.street_records(names))
+        highway = self.detect_highway(question)
+        if highway:
+            hits = self.aggregates.for_highway(highway)
             if hits:
-                return hits
-        approx = self.indexes.approximate(question)
-        if approx:
-            return approx
-        return self.full_data
-
-    def analyze(self, question: str, llm_client) -> str:
-        records = self.select_records(question)
-        prompt = build_prompt(question, records)
-        return llm_client.ask(prompt)
+                return Resolution("via", (highway,), hits)
+        return Resolution("general", (), self.aggregates.overview())
+
+    def street_records(self, names: List[str]) -> List[SimulationRecord]:
+        """Records of the named streets; with several, the most congested of each so all fit in the prompt."""
+        if len(names) == 1:
+            return list(self.indexes.by_name[names[0]])
+        per_street = max(MAX_RECORDS // len(names), 1)
+        records: List[SimulationRecord] = []
+        for name in names:
+            ranked = sorted(self.indexes.by_name[name], key=lambda r: -(current_congestion(r) or 0.0))
+            records.extend(ranked[:per_street])
+        return records
+
+    def street_rollups(self, names: Tuple[str, ...]) -> List[str]:
+        """Precomputed per-street averages, so comparisons cover every street named."""
+        rollups = [self.aggregates.street(name) for name in names]
+        return ["Promedio por vía:"] + [format_rollup(r) for r in rollups if r is not None]
+
+    def records_near(self, names: List[str], radius_m: float = NEAR_RADIUS_M) -> List[SimulationRecord]:
+        """Records of other streets within ``radius_m`` of the named streets, most congested first."""
+        features = [f for name in names for f in self.spatial.named(name).tolist()]
+        hits = self.spatial.near_features(features, radius_m)
+        own = set(names)
+        records = [r for r in self.spatial.records_for(f for f, _d in hits) if not r.name or r.name.lower() not in own]
+        return sorted(records, key=lambda r: -(current_congestion(r) or 0.0))
+
+    @staticmethod
+    def modifiers(question: str, targets: Tuple[str, ...] = ()) -> List[str]:
+        """Leftover content words (direction, numbers, adjectives), without plural endings and sorted."""
+        covered = set(_INTENT_COVERED)
+        for name in targets:
+            covered.update(normalize_text(name).split())
+        words = set()
+        for tok in query_terms(question, covered):
+            if tok in covered:  # "carrera 14": query_terms conserva el sustantivo antes de un número
+                continue
+            if len(tok) > 3 and tok.endswith("s") and tok not in _QUESTION_TYPES[0][1] and not tok[0].isdigit():
+                tok = tok[:-1]
+            words.add(tok)
+        return sorted(words)
+
+    def intent_key(self, question: str, resolved: Optional[Resolution] = None) -> str:
+        """Cache key shared by paraphrases: question type, scope, resolved targets and leftover modifiers."""
+        scope, targets, _records = resolved or self.resolve(question)
+        digest = hashlib.sha256(";".join(sorted(targets)).encode("utf-8")).hexdigest()[:16] if targets else ""
+        return "|".join((self.question_type(question), scope, digest, " ".join(self.modifiers(question, targets))))
+
+    def select_records(self, question: str) -> List[SimulationRecord]:
+        return self.resolve(question).records
+
+    def street_summary(self) -> List[str]:
+        """Most/least congested streets, used as context for general questions."""
+        top = self.aggregates.top_streets(STREET_SUMMARY_K)
+        bottom = self.aggregates.bottom_streets(STREET_SUMMARY_K)
+        lines = (
+            ["Vías más congestionadas (promedio por calle):"] + [format_rollup(s) for s in top]
+            + ["Vías menos congestionadas (promedio por calle):"] + [format_rollup(s) for s in bottom]
+        )
+        status = self.live_status() if self.live_status else None
+        if status:
+            lines.append("Simulación en curso: " + " ".join(f"{k}={v:g}" for k, v in status.items()))
+        return lines
+
+    def prompt_for(self, question: str, resolved: Optional[Resolution] = None) -> str:
+        scope, targets, records = resolved or self.resolve(question)
+        context = None
+        if scope in ("via", "general"):
+            context = self.street_summary()
+        elif scope == "calle" and len(targets) > 1:
+            context = self.street_rollups(targets)
+        return build_prompt(question, records, context)
+
+    def analyze(self, question: str, llm_client, resolved: Optional[Resolution] = None) -> str:
+        return llm_client.ask(self.prompt_for(question, resolved))
+
+    async def analyze_async(self, question: str, llm_client, resolved: Optional[Resolution] = None) -> str:
+        return await llm_client.ask(self.prompt_for(question, resolved))
+
+    def analyze_stream(self, question: str, llm_client, resolved: Optional[Resolution] = None):
+        return llm_client.stream(self.prompt_for(question, resolved))
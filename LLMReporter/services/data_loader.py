@@ -1,9 +1,6 @@
-import json
 from pathlib import Path
-from typing import List
-from reporter.core.models import SimulationRecord
+from reporter.core.store import EdgeStore, load_store
 
-def load_data(path: Path) -> List[SimulationRecord]:
-    with path.open("r", encoding="utf-8") as f:
-        raw = json.load(f)
-    return [SimulationRecord.from_dict(r) for r in raw]
+def load_data(path: Path, use_cache: bool = True) -> EdgeStore:
+    """Edge records as a columnar store; rows behave like ``SimulationRecord``."""
+    return load_store(path, use_cache=use_cache)
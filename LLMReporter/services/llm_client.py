@@ -1,19 +1,157 @@
-import subprocess
-from typing import Optional
+"""Clientes de la API HTTP de Ollama (``/api/generate``).
+
+Ambos clientes reutilizan una conexión keep-alive en lugar de lanzar un
+proceso ``ollama run`` por pregunta. ``LLMClient`` es síncrono (CLI, warmup) y
+``AsyncLLMClient`` es el que usa la API, con concurrencia acotada.
+
+``stream`` pide la respuesta con ``"stream": true`` y entrega los fragmentos
+de texto a medida que Ollama los produce (NDJSON, un objeto por línea). Solo
+se reintenta si el fallo ocurre antes del primer fragmento.
+"""
+import asyncio
+import json
+import time
+from typing import AsyncIterator, Iterator, Optional
+
+import httpx
+
+from reporter.core.config import DEFAULT_OLLAMA_BASE_URL, DEFAULT_TIMEOUT
+
+GENERATE_PATH = "/api/generate"
+_RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class LLMError(RuntimeError):
+    """The model could not produce an answer after all retries."""
+
+
+def _payload(model: str, prompt: str, stream: bool = False) -> dict:
+    return {"model": model, "prompt": prompt, "stream": stream}
+
+
+def _chunk_text(line: str) -> Optional[str]:
+    """Text of one NDJSON stream line; ``None`` once Ollama reports ``done``."""
+    chunk = json.loads(line)
+    if chunk.get("error"):
+        raise LLMError(f"Ollama stream failed: {chunk['error']}")
+    if chunk.get("done"):
+        return None
+    return chunk.get("response", "")
+
+
+def _backoff(attempt: int) -> float:
+    return 0.5 * (2 ** attempt)
+
+
+def _is_retryable(exc: Exception) -> bool:
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code in _RETRYABLE_STATUS
+    return isinstance(exc, httpx.TransportError)
+
+
+def _limits(max_connections: int) -> httpx.Limits:
+    return httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+
 
 class LLMClient:
-    def __init__(self, model: str):
+    def __init__(
+        self,
+        model: str,
+        base_url: str = DEFAULT_OLLAMA_BASE_URL,
+        timeout: float = DEFAULT_TIMEOUT,
+        retries: int = 2,
+    ):
         self.model = model
+        self.retries = retries
+        self._client = httpx.Client(base_url=base_url, timeout=timeout, limits=_limits(1))
 
     def ask(self, prompt: str, model: Optional[str] = None) -> str:
-        m = model or self.model
-        # Usamos binario y decodificamos manualmente para evitar UnicodeDecodeError en cp1252
-        proc = subprocess.Popen([
-            "ollama", "run", m
-        ], stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        out_bytes, _err_bytes = proc.communicate(prompt.encode("utf-8"))
-        try:
-            out = out_bytes.decode("utf-8", errors="replace")
-        except Exception:  # noqa: BLE001
-            out = out_bytes.decode(errors="ignore")
-        return out
+        payload = _payload(model or self.model, prompt)
+        for attempt in range(self.retries + 1):
+            try:
+                resp = self._client.post(GENERATE_PATH, json=payload)
+                resp.raise_for_status()
+                return resp.json().get("response", "")
+            except httpx.HTTPError as exc:
+                if attempt == self.retries or not _is_retryable(exc):
+                    raise LLMError(f"Ollama request failed: {exc}") from exc
+                time.sleep(_backoff(attempt))
+        raise LLMError("Ollama request failed")  # pragma: no cover
+
+    def stream(self, prompt: str, model: Optional[str] = None) -> Iterator[str]:
+        payload = _payload(model or self.model, prompt, stream=True)
+        for attempt in range(self.retries + 1):
+            started = False
+            try:
+                with self._client.stream("POST", GENERATE_PATH, json=payload) as resp:
+                    resp.raise_for_status()
+                    for line in resp.iter_lines():
+                        if not line:
+                            continue
+                        text = _chunk_text(line)
+                        if text is None:
+                            return
+                        started = True
+                        yield text
+                return
+            except httpx.HTTPError as exc:
+                if started or attempt == self.retries or not _is_retryable(exc):
+                    raise LLMError(f"Ollama request failed: {exc}") from exc
+                time.sleep(_backoff(attempt))
+
+    def close(self) -> None:
+        self._client.close()
+
+
+class AsyncLLMClient:
+    def __init__(
+        self,
+        model: str,
+        base_url: str = DEFAULT_OLLAMA_BASE_URL,
+        timeout: float = DEFAULT_TIMEOUT,
+        max_concurrency: int = 4,
+        retries: int = 2,
+    ):
+        self.model = model
+        self.retries = retries
+        self._client = httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=_limits(max_concurrency))
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def ask(self, prompt: str, model: Optional[str] = None) -> str:
+        payload = _payload(model or self.model, prompt)
+        for attempt in range(self.retries + 1):
+            try:
+                async with self._semaphore:
+                    resp = await self._client.post(GENERATE_PATH, json=payload)
+                resp.raise_for_status()
+                return resp.json().get("response", "")
+            except httpx.HTTPError as exc:
+                if attempt == self.retries or not _is_retryable(exc):
+                    raise LLMError(f"Ollama request failed: {exc}") from exc
+                await asyncio.sleep(_backoff(attempt))
+        raise LLMError("Ollama request failed")  # pragma: no cover
+
+    async def stream(self, prompt: str, model: Optional[str] = None) -> AsyncIterator[str]:
+        payload = _payload(model or self.model, prompt, stream=True)
+        for attempt in range(self.retries + 1):
+            started = False
+            try:
+                async with self._semaphore:
+                    async with self._client.stream("POST", GENERATE_PATH, json=payload) as resp:
+                        resp.raise_for_status()
+                        async for line in resp.aiter_lines():
+                            if not line:
+                                continue
+                            text = _chunk_text(line)
+                            if text is None:
+                                return
+                            started = True
+                            yield text
+                return
+            except httpx.HTTPError as exc:
+                if started or attempt == self.retries or not _is_retryable(exc):
+                    raise LLMError(f"Ollama request failed: {exc}") from exc
+                await asyncio.sleep(_backoff(attempt))
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
@@ -0,0 +1,255 @@
+"""Ingesta en vivo de la telemetría de simulaciones en curso.
+
+Dos fuentes, ambas leídas de forma incremental (solo los bytes nuevos):
+
+* ``EdgeDataTail``: la salida ``edgeData`` de SUMO. Cada ``<interval>``
+  cerrado aporta una muestra por tramo a las columnas en vivo del
+  ``EdgeStore`` (separadas del histórico; ver ``store.py``). Los datos solo
+  llegan al cerrar cada intervalo, así que para seguir una simulación se usa
+  el edgeData ``live`` de ``sumoData/live.add.xml`` (``period="60"``,
+  ``REPORTER_EDGEDATA=sumoData/edgeData_live.xml``), no el horario. Lo escriben
+  ``sumo -c sumoData/SumoConfigSim.sumocfg`` y las corridas con
+  ``--live_edge_data`` (``train.py``, ``Agents_orchestator.py``).
+* ``CsvTail``: los CSV por paso de sumo-rl (``build_vec_env(output_csv=...)``,
+  un archivo por episodio). Solo dan métricas del sistema, que se muestran
+  como contexto en las preguntas generales.
+
+``TelemetryIngestor.poll`` aplica los cambios sobre el almacén, los índices y
+las vistas agregadas sin recargar el archivo de datos.
+"""
+from __future__ import annotations
+
+import csv
+import glob
+import io
+import os
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from reporter.core.aggregates import Aggregates
+from reporter.core.indexes import Indexes
+from reporter.core.store import EdgeStore
+
+# Métricas del sistema que se muestran al modelo (columnas de sumo-rl).
+SYSTEM_COLUMNS = (
+    "step",
+    "system_total_running",
+    "system_total_stopped",
+    "system_total_waiting_time",
+    "system_mean_waiting_time",
+    "system_mean_speed",
+)
+
+
+def edge_congestion_pct(attrs: Dict[str, str]) -> Optional[float]:
+    """Extra travel time over free flow, in percent, from one edgeData ``<edge>``.
+
+    ``speedRelative`` is the mean speed over the allowed speed, so
+    ``1 / speedRelative - 1`` is the delay relative to free flow. Falls back
+    to ``occupancy`` when the relative speed is not written.
+    """
+    relative = attrs.get("speedRelative")
+    if relative is not None and float(relative) > 0:
+        return max(1.0 / float(relative) - 1.0, 0.0) * 100.0
+    occupancy = attrs.get("occupancy")
+    return float(occupancy) if occupancy is not None else None
+
+
+class _FileTail:
+    """Remember the read offset of a growing file; start over if it is truncated or replaced."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.offset = 0
+        self._inode: Optional[int] = None
+
+    def read_new(self) -> Tuple[bytes, bool]:
+        """Return ``(new_bytes, restarted)``."""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return b"", False
+        restarted = False
+        if st.st_ino != self._inode or st.st_size < self.offset:
+            restarted = self._inode is not None
+            self._inode = st.st_ino
+            self.offset = 0
+        if st.st_size == self.offset:
+            return b"", restarted
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            data = f.read(st.st_size - self.offset)
+        self.offset += len(data)
+        return data, restarted
+
+
+@dataclass
+class EdgeSamples:
+    edge_ids: List[str]
+    traveltime: List[float]
+    congestion: List[float]
+    intervals: List[int]  # número de intervalo de cada muestra
+    restarted: bool = False  # el archivo fue reemplazado: empezó otra simulación
+
+
+class EdgeDataTail:
+    """Incremental parser for a SUMO edgeData (meandata) file that is still being written."""
+
+    def __init__(self, path: str):
+        self._file = _FileTail(path)
+        self._parser = ET.XMLPullParser(events=("end",))
+        self.intervals = 0
+
+    def poll(self) -> EdgeSamples:
+        data, restarted = self._file.read_new()
+        if restarted:
+            self._parser = ET.XMLPullParser(events=("end",))
+        samples = EdgeSamples([], [], [], [], restarted)
+        if not data:
+            return samples
+        self._parser.feed(data)
+        for _event, elem in self._parser.read_events():
+            if elem.tag != "interval":
+                continue
+            self.intervals += 1
+            for edge in elem.iter("edge"):
+                traveltime = edge.get("traveltime")
+                congestion = edge_congestion_pct(edge.attrib)
+                if traveltime is None or congestion is None:
+                    continue  # tramo sin vehículos en el intervalo
+                samples.edge_ids.append(edge.get("id"))
+                samples.traveltime.append(float(traveltime))
+                samples.congestion.append(congestion)
+                samples.intervals.append(self.intervals)
+            elem.clear()
+        return samples
+
+
+class CsvTail:
+    """Follow the per-step CSVs matched by ``pattern`` and keep the latest row of each file."""
+
+    def __init__(self, pattern: str):
+        self.pattern = pattern
+        self._files: Dict[str, _FileTail] = {}
+        self._headers: Dict[str, List[str]] = {}
+        self._partial: Dict[str, bytes] = {}
+        self.latest: Dict[str, Dict[str, str]] = {}
+        self.last_source: Optional[str] = None
+        self.rows = 0
+
+    def poll(self) -> int:
+        """Read new complete lines from every matching file; return how many rows arrived."""
+        before = self.rows
+        for path in sorted(glob.glob(self.pattern)):
+            tail = self._files.setdefault(path, _FileTail(path))
+            data, restarted = tail.read_new()
+            if restarted:
+                self._headers.pop(path, None)
+                self._partial.pop(path, None)
+            if not data:
+                continue
+            buffered = self._partial.pop(path, b"") + data
+            complete, _, rest = buffered.rpartition(b"\n")
+            if rest:
+                self._partial[path] = rest
+            if not complete:
+                continue
+            reader = csv.reader(io.StringIO(complete.decode("utf-8")))
+            for values in reader:
+                if not values:
+                    continue
+                header = self._headers.get(path)
+                if header is None:
+                    self._headers[path] = values
+                    continue
+                self.latest[path] = dict(zip(header, values))
+                self.last_source = path
+                self.rows += 1
+        return self.rows - before
+
+    def system_status(self) -> Optional[Dict[str, float]]:
+        """Metrics of the most recently updated run, or ``None`` before any row arrives."""
+        if self.last_source is None:
+            return None
+        row = self.latest[self.last_source]
+        return {col: float(row[col]) for col in SYSTEM_COLUMNS if row.get(col) not in (None, "")}
+
+
+class TelemetryIngestor:
+    """Apply live telemetry deltas to the in-memory store, indexes and aggregates."""
+
+    def __init__(
+        self,
+        store: EdgeStore,
+        indexes: Indexes,
+        aggregates: Aggregates,
+        edge_data_path: Optional[str] = None,
+        csv_pattern: Optional[str] = None,
+    ):
+        self.store = store
+        self.indexes = indexes
+        self.aggregates = aggregates
+        self.edge_data = EdgeDataTail(edge_data_path) if edge_data_path else None
+        self.metrics = CsvTail(csv_pattern) if csv_pattern else None
+        self.samples = 0
+        self.polls = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.edge_data is not None or self.metrics is not None
+
+    def poll(self) -> bool:
+        """Ingest whatever is new; return True if the answers may have changed."""
+        self.polls += 1
+        changed = False
+        if self.edge_data is not None:
+            batch = self.edge_data.poll()
+            if batch.restarted:
+                self.store.clear_live()
+                changed = True
+            if batch.edge_ids:
+                self._apply(batch)
+                changed = True
+        if self.metrics is not None and self.metrics.poll():
+            changed = True
+        return changed
+
+    def _apply(self, batch: EdgeSamples) -> None:
+        rows = [self.store.position(edge_id) for edge_id in batch.edge_ids]
+        unknown = list(dict.fromkeys(e for e, r in zip(batch.edge_ids, rows) if r is None))
+        if unknown:
+            added = self.store.append_edges(unknown)
+            self.indexes.add([self.store[i] for i in added])
+            rows = [self.store.position(edge_id) for edge_id in batch.edge_ids]
+        self.store.apply_samples(
+            np.asarray(rows, dtype=np.int64),
+            np.asarray(batch.traveltime, dtype=np.float64),
+            np.asarray(batch.congestion, dtype=np.float64),
+            np.asarray(batch.intervals, dtype=np.int64),
+        )
+        # Las vistas top-k se recalculan sobre las columnas en memoria (vectorizado, ~ms).
+        self.aggregates.rebuild(self.store)
+        self.samples += len(rows)
+
+    def system_status(self) -> Optional[Dict[str, float]]:
+        return self.metrics.system_status() if self.metrics is not None else None
+
+    @property
+    def data_version(self) -> str:
+        """Changes whenever an answer could change: edge revisions and new metric rows."""
+        rows = self.metrics.rows if self.metrics is not None else 0
+        return f"{self.store.data_version}/{rows}" if rows else self.store.data_version
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "polls": self.polls,
+            "edge_samples": self.samples,
+            "intervals": self.edge_data.intervals if self.edge_data is not None else 0,
+            "metric_rows": self.metrics.rows if self.metrics is not None else 0,
+            "revision": self.store.revision,
+            "live_edges": int(self.store.live_mask().sum()),
+        }
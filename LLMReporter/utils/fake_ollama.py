@@ -0,0 +1,143 @@
+"""Servidor local que imita ``/api/generate`` de Ollama para pruebas.
+
+Responde sin cargar ningún modelo, con una latencia configurable, para
+probar la API y el CLI sin GPU ni Ollama instalado. Con ``"stream": true``
+devuelve la respuesta palabra a palabra en NDJSON (``--token-delay`` entre
+fragmentos), igual que Ollama.
+
+Uso:
+    python -m reporter.utils.fake_ollama --port 11435 --delay 0.2
+    OLLAMA_BASE_URL=http://127.0.0.1:11435 python reporter_cli.py "¿Estado general?"
+
+Desde código de pruebas:
+    server, base_url = serve_in_thread()
+    ...
+    server.shutdown()
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Tuple
+
+
+def fake_answer(prompt: str) -> str:
+    first_line = prompt.strip().splitlines()[0] if prompt.strip() else ""
+    return f"[fake-ollama] {first_line[:120]}"
+
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, como Ollama
+    delay: float = 0.0
+    token_delay: float = 0.0
+    fail_first: int = 0  # número de peticiones que devuelven 503 (para probar reintentos)
+    _served = 0
+    _lock = threading.Lock()
+
+    def log_message(self, format, *args):  # noqa: A002 - silencioso en pruebas
+        return
+
+    def _send_json(self, status: int, body: dict) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):  # noqa: N802
+        if self.path == "/api/tags":
+            self._send_json(200, {"models": [{"name": "fake"}]})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):  # noqa: N802
+        length = int(self.headers.get("Content-Length", "0"))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        if self.path != "/api/generate":
+            self._send_json(404, {"error": "not found"})
+            return
+
+        cls = type(self)
+        with cls._lock:
+            cls._served += 1
+            served = cls._served
+        if served <= cls.fail_first:
+            self._send_json(503, {"error": "model loading"})
+            return
+
+        time.sleep(cls.delay)
+        model = body.get("model", "fake")
+        answer = fake_answer(body.get("prompt", ""))
+        if body.get("stream", True):  # Ollama transmite por defecto
+            self._send_stream(model, answer)
+        else:
+            self._send_json(200, {"model": model, "response": answer, "done": True})
+
+    def _send_stream(self, model: str, answer: str) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        tokens = [tok + " " for tok in answer.split(" ")]
+        tokens[-1] = tokens[-1].rstrip(" ")
+        for i, tok in enumerate(tokens):
+            if i:
+                time.sleep(type(self).token_delay)
+            self._write_chunk({"model": model, "response": tok, "done": False})
+        self._write_chunk({"model": model, "response": "", "done": True})
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _write_chunk(self, obj: dict) -> None:
+        line = json.dumps(obj).encode("utf-8") + b"\n"
+        self.wfile.write(f"{len(line):x}\r\n".encode("ascii") + line + b"\r\n")
+        self.wfile.flush()
+
+
+def make_server(
+    host: str = "127.0.0.1",
+    port: int = 0,
+    delay: float = 0.0,
+    fail_first: int = 0,
+    token_delay: float = 0.0,
+) -> ThreadingHTTPServer:
+    handler = type("ConfiguredFakeOllamaHandler", (FakeOllamaHandler,), {
+        "delay": delay,
+        "token_delay": token_delay,
+        "fail_first": fail_first,
+        "_served": 0,
+        "_lock": threading.Lock(),
+    })
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def serve_in_thread(delay: float = 0.0, fail_first: int = 0, token_delay: float = 0.0) -> Tuple[ThreadingHTTPServer, str]:
+    """Start the fake server on a free port in a daemon thread; return (server, base_url)."""
+    server = make_server(delay=delay, fail_first=fail_first, token_delay=token_delay)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address[:2]
+    return server, f"http://{host}:{port}"
+
+
+def main():
+    p = argparse.ArgumentParser(description="Servidor falso de Ollama para pruebas")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=11435)
+    p.add_argument("--delay", type=float, default=0.0, help="Latencia simulada por respuesta (s)")
+    p.add_argument("--token-delay", type=float, default=0.0, help="Pausa entre fragmentos en modo stream (s)")
+    args = p.parse_args()
+    server = make_server(args.host, args.port, args.delay, token_delay=args.token_delay)
+    print(f"[fake-ollama] escuchando en http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
@@ -5,25 +5,32 @@ con un formato estable y fácil de extender.
 """
 from __future__ import annotations
 
-from typing import List
-from reporter.core.models import SimulationRecord
+from typing import List, Optional
+from reporter.core.models import SimulationRecord, current_congestion, current_traveltime
 
 MAX_RECORDS = 12  # límite para no generar prompts enormes
 
 
 def format_record(r: SimulationRecord) -> str:
     name = r.name or r.edge_id
-    t = r.avg_traveltime_s if r.avg_traveltime_s is not None else 0.0
-    c = r.avg_congestion_pct if r.avg_congestion_pct is not None else 0.0
-    return f"via={name} tmedio={t:.2f}s congestion={c:.2f}%"
+    t = current_traveltime(r)
+    c = current_congestion(r)
+    line = f"via={name} tmedio={t or 0.0:.2f}s congestion={c or 0.0:.2f}%"
+    if r.live_congestion_pct is not None:
+        # Valor de la simulación en curso; el histórico queda como referencia.
+        hist = r.avg_congestion_pct if r.avg_congestion_pct is not None else 0.0
+        line += f" (en vivo; historico={hist:.2f}%)"
+    return line
 
 
-def build_prompt(question: str, records: List[SimulationRecord]) -> str:
+def build_prompt(question: str, records: List[SimulationRecord], context: Optional[List[str]] = None) -> str:
     subset = records[:MAX_RECORDS]
     lines = "\n".join(format_record(r) for r in subset)
+    extra = "\n".join(context) + "\n" if context else ""  # resúmenes agregados opcionales
     return (
         "Analiza los siguientes datos de tráfico y responde a la pregunta en español.\n"  # instrucción breve
         f"Pregunta: {question}\n"  # pregunta del usuario
         f"Registros ({len(subset)}/{len(records)}):\n{lines}\n"  # lista formateada
+        f"{extra}"
         "Si la pregunta implica comparación, menciona las vías con mayor y menor congestión."
     )
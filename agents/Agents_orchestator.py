@@ -1,6 +1,7 @@
+import argparse
 import os
 import sys
-from typing import Dict, List
+from typing import Dict, List, Optional, Sequence
 
 import numpy as np
 from stable_baselines3 import DQN
@@ -10,10 +11,14 @@ if PROJECT_ROOT not in sys.path:
     sys.path.insert(0, PROJECT_ROOT)
 
 from env_factory import build_vec_env
-from regional_agent import RegionalAgent
+from grouped import GroupedPolicy
+from region_partitioner import DEFAULT_MAX_REGION_SIZE, partition_traffic_lights
+from regional_agent import RegionalAgent, RegionalCoordinator
+from sumo_backend import BACKENDS
 
 SIM_DIR = "./sumoData"
 MODEL_PATH = "./models/sumo_rl_final_model_v6"
+GROUPED_MODEL_PATH = "./models/sumo_rl_final_model_v6_grouped"
 MAX_STEPS = 3600
 
 
@@ -21,6 +26,20 @@ def _ensure_model_path(path: str) -> str:
     return path if path.endswith(".zip") else f"{path}.zip"
 
 
+def _build_auto_regions(max_region_size: int, queue_threshold: int = 20) -> List[RegionalAgent]:
+    """Regions derived from the network graph and measured flow (see region_partitioner)."""
+
+    clusters = partition_traffic_lights(
+        os.path.join(SIM_DIR, "TestLightsSogamosoNet.net.xml"),
+        os.path.join(SIM_DIR, "edgeData.xml"),
+        max_region_size=max_region_size,
+    )
+    return [
+        RegionalAgent(f"Region_{idx + 1}", intersections, queue_threshold=queue_threshold)
+        for idx, intersections in enumerate(clusters)
+    ]
+
+
 def _build_regions() -> List[RegionalAgent]:
     return [
         RegionalAgent(
@@ -70,57 +89,107 @@ def _build_regions() -> List[RegionalAgent]:
     ]
 
 
-def _apply_phase_limits(actions: np.ndarray, action_sizes: Dict[str, int], tl_index_map: Dict[str, int]) -> None:
-    """Clamp each TL action to the valid number of phases learned during training."""
+def _phase_limit_vector(action_sizes: Dict[str, int], tl_index_map: Dict[str, int], n_cols: int) -> np.ndarray:
+    """Per-column number of valid phases (0 = no limit known)."""
 
-    def clamp(action_row: np.ndarray) -> None:
-        for tl_id, idx in tl_index_map.items():
-            limit = action_sizes.get(tl_id)
-            if not limit or limit <= 0 or idx >= action_row.shape[-1]:
-                continue
-            action_row[idx] = int(action_row[idx]) % limit
+    limits = np.zeros(n_cols, dtype=np.int64)
+    for tl_id, idx in tl_index_map.items():
+        limit = action_sizes.get(tl_id)
+        if not limit or limit <= 0 or idx >= n_cols:
+            continue
+        limits[idx] = limit
+    return limits
 
-    if actions.ndim == 1:
-        clamp(actions)
-    else:
-        for row in actions:
-            clamp(row)
 
+def _apply_phase_limits(actions: np.ndarray, limits: np.ndarray) -> None:
+    """Clamp each TL action to the valid number of phases learned during training.
+
+    Works on a single action row or on the whole (K, n_tls) matrix at once.
+    """
+
+    valid = limits > 0
+    actions[..., valid] = actions[..., valid].astype(np.int64) % limits[valid]
+
+
+def _build_coordinator(traffic_lights: Sequence[str], auto_regions: bool, max_region_size: int) -> RegionalCoordinator:
+    tl_index_map = {tl: idx for idx, tl in enumerate(traffic_lights)}
+    regions = _build_auto_regions(max_region_size) if auto_regions else _build_regions()
+    return RegionalCoordinator(regions, traffic_lights, tl_index_map)
+
+
+def _split_infos(infos, num_envs: int, n_tls: int) -> List[dict]:
+    """Pick the info dict of each scenario from the flattened per-agent list."""
+
+    if not isinstance(infos, list):
+        return [{} for _ in range(num_envs)]
+    return [infos[k * n_tls] if len(infos) > k * n_tls else {} for k in range(num_envs)]
+
+
+def run(
+    num_envs: int = 1,
+    num_cpus: Optional[int] = None,
+    use_gui: bool = True,
+    backend: str = "auto",
+    warmup_seconds: int = 0,
+    route_files: Optional[Sequence[str]] = None,
+    seeds: Optional[Sequence[int]] = None,
+    auto_regions: bool = False,
+    max_region_size: int = DEFAULT_MAX_REGION_SIZE,
+    live_edge_data: bool = False,
+):
+    """Evaluate the policy with regional coordination on K scenarios at once.
+
+    ``route_files``/``seeds`` define one demand scenario each; all scenarios
+    share one batched policy forward pass per step.
+    """
+
+    if route_files is not None:
+        num_envs = len(route_files)
+    elif seeds is not None:
+        num_envs = len(seeds)
 
-def run():
     env, traffic_lights, action_sizes = build_vec_env(
         sim_dir=SIM_DIR,
         output_csv="./metrics/orchestrator_eval",
-        use_gui=True,
+        use_gui=use_gui,
         num_seconds=MAX_STEPS,
         fixed_ts=True,
         sumo_warnings=False,
         return_parallel_env=True,
+        num_envs=num_envs,
+        num_cpus=num_cpus,
+        backend=backend,
+        warmup_seconds=warmup_seconds,
+        seeds=seeds,
+        route_files=route_files,
+        live_edge_data=live_edge_data,
     )
 
     tl_index_map = {tl: idx for idx, tl in enumerate(traffic_lights)}
-    regions = _build_regions()
+    n_tls = len(traffic_lights)
+    limits = _phase_limit_vector(action_sizes, tl_index_map, n_tls)
+    coordinator = _build_coordinator(traffic_lights, auto_regions, max_region_size)
     model = DQN.load(_ensure_model_path(MODEL_PATH))
 
     obs = env.reset()
     step = 0
-    last_info: List[dict] = [{}]
+    env_infos: List[dict] = [{} for _ in range(num_envs)]
 
     while step < MAX_STEPS:
+        # obs ya viene apilado (K * n_tls, obs_dim): una sola pasada de la política.
         actions, _ = model.predict(obs, deterministic=True)
         actions = np.array(actions, copy=True)
-        _apply_phase_limits(actions, action_sizes, tl_index_map)
+        env_actions = actions.reshape(num_envs, n_tls)
+        _apply_phase_limits(env_actions, limits)
         if step < 5:
-            print("raw actions normalized:", actions)
+            print("raw actions normalized:", env_actions)
 
-        info_dict = last_info[0] if isinstance(last_info, list) and last_info else {}
-        for region in regions:
-            region.step(info_dict, actions, tl_index_map)
-        _apply_phase_limits(actions, action_sizes, tl_index_map)
+        coordinator.step(env_infos, env_actions)
+        _apply_phase_limits(env_actions, limits)
 
 
         obs, reward, dones, infos = env.step(actions)
-        last_info = infos
+        env_infos = _split_infos(infos, num_envs, n_tls)
         
         step += 1
 
@@ -130,5 +199,91 @@ def run():
     env.close()
 
 
+def run_grouped(
+    use_gui: bool = True,
+    backend: str = "auto",
+    warmup_seconds: int = 0,
+    route_file: Optional[str] = None,
+    seed: Optional[int] = None,
+    auto_regions: bool = False,
+    max_region_size: int = DEFAULT_MAX_REGION_SIZE,
+    live_edge_data: bool = False,
+):
+    """Evaluate a ``train.py --grouped`` policy (one head per TL shape) with regional coordination.
+
+    No padding: every group predicts only valid phases, so the phase limits
+    are only needed for the coordinator overrides (``GroupedEnv.gather``).
+    """
+
+    env = build_vec_env(
+        sim_dir=SIM_DIR,
+        output_csv="./metrics/orchestrator_eval",
+        use_gui=use_gui,
+        num_seconds=MAX_STEPS,
+        fixed_ts=True,
+        sumo_warnings=False,
+        backend=backend,
+        warmup_seconds=warmup_seconds,
+        seeds=None if seed is None else [seed],
+        route_files=None if route_file is None else [route_file],
+        grouped=True,
+        live_edge_data=live_edge_data,
+    )
+    coordinator = _build_coordinator(env.agent_ids, auto_regions, max_region_size)
+    policy = GroupedPolicy.load(GROUPED_MODEL_PATH, env.groups)
+
+    obs = env.reset()
+    info: dict = {}
+    for _ in range(MAX_STEPS):
+        actions = env.scatter(policy.predict(obs, deterministic=True)).reshape(1, -1)
+        coordinator.step([info], actions)
+        obs, _rewards, done, info = env.step(env.gather(actions[0]))
+        if done:
+            break
+
+    env.close()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Orchestrator evaluation over one or more demand scenarios.")
+    parser.add_argument("--scenarios", nargs="+", default=None, help="Route files, one SUMO instance each")
+    parser.add_argument("--seeds", nargs="+", type=int, default=None, help="One seed per scenario")
+    parser.add_argument("--num_cpus", type=int, default=None)
+    parser.add_argument("--no_gui", action="store_true")
+    parser.add_argument("--backend", choices=BACKENDS, default="auto")
+    parser.add_argument("--warmup", type=int, default=0)
+    parser.add_argument("--auto_regions", action="store_true", help="Partition TLs from the net instead of the fixed regions")
+    parser.add_argument("--region_size", type=int, default=DEFAULT_MAX_REGION_SIZE)
+    parser.add_argument("--grouped", action="store_true", help="Policy trained with train.py --grouped (single scenario)")
+    parser.add_argument("--live_edge_data", action="store_true",
+                        help="Write sumoData/edgeData_live.xml every 60 simulated seconds for the LLMReporter")
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
-    run()
+    args = parse_args()
+    if args.grouped:
+        if (args.scenarios and len(args.scenarios) > 1) or (args.seeds and len(args.seeds) > 1):
+            sys.exit("--grouped evaluates a single scenario")
+        run_grouped(
+            use_gui=not args.no_gui,
+            backend=args.backend,
+            warmup_seconds=args.warmup,
+            route_file=args.scenarios[0] if args.scenarios else None,
+            seed=args.seeds[0] if args.seeds else None,
+            auto_regions=args.auto_regions,
+            max_region_size=args.region_size,
+            live_edge_data=args.live_edge_data,
+        )
+    else:
+        run(
+            num_cpus=args.num_cpus,
+            use_gui=not args.no_gui,
+            backend=args.backend,
+            warmup_seconds=args.warmup,
+            route_files=args.scenarios,
+            seeds=args.seeds,
+            auto_regions=args.auto_regions,
+            max_region_size=args.region_size,
+            live_edge_data=args.live_edge_data,
+        )
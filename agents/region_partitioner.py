@@ -0,0 +1,161 @@
+"""Partición automática de semáforos en regiones a partir del grafo de la red.
+
+Las regiones se forman uniendo semáforos cercanos (distancia por la red vial)
+que comparten mucho flujo medido, con un tamaño máximo por región y un tope de
+flujo para que queden balanceadas. El resultado se guarda junto al archivo de
+red (``<net>.regions.json``) y solo se recalcula si cambian la red, los datos de
+flujo o los parámetros.
+"""
+import hashlib
+import heapq
+import json
+import os
+import xml.etree.ElementTree as ET
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+import sumolib
+
+from snapshot_cache import file_digest
+
+DEFAULT_MAX_REGION_SIZE = 3
+DEFAULT_BALANCE = 1.5
+DEFAULT_MAX_DISTANCE = 1500.0
+
+
+def _load_edge_flows(edge_data_file: Optional[str]) -> Dict[str, float]:
+    """Vehicles entering each edge summed over all edgeData intervals."""
+
+    flows: Dict[str, float] = defaultdict(float)
+    if not edge_data_file or not os.path.exists(edge_data_file):
+        return flows
+    for _event, elem in ET.iterparse(edge_data_file, events=("end",)):
+        if elem.tag == "edge":
+            flows[elem.get("id")] += float(elem.get("entered", elem.get("left", 0)) or 0)
+        elif elem.tag == "interval":
+            elem.clear()
+    return flows
+
+
+def _tls_nodes_and_flow(net, flows: Dict[str, float]) -> Tuple[Dict[str, set], Dict[str, float]]:
+    tls_nodes: Dict[str, set] = {}
+    tls_flow: Dict[str, float] = {}
+    for tls in net.getTrafficLights():
+        edges = tls.getEdges()
+        tls_nodes[tls.getID()] = {edge.getToNode().getID() for edge in edges}
+        tls_flow[tls.getID()] = sum(flows.get(edge.getID(), 0.0) for edge in edges)
+    if not any(tls_flow.values()):
+        # Sin datos de flujo medidos todos los semáforos pesan lo mismo.
+        tls_flow = {tls_id: 1.0 for tls_id in tls_flow}
+    return tls_nodes, tls_flow
+
+
+def _tls_distances(net, tls_nodes: Dict[str, set], max_distance: float) -> Dict[Tuple[str, str], float]:
+    """Shortest road distance between traffic lights, ignoring direction, up to ``max_distance``."""
+
+    adjacency: Dict[str, List[Tuple[str, float]]] = defaultdict(list)
+    for edge in net.getEdges():
+        a, b = edge.getFromNode().getID(), edge.getToNode().getID()
+        adjacency[a].append((b, edge.getLength()))
+        adjacency[b].append((a, edge.getLength()))
+
+    node_to_tls: Dict[str, str] = {}
+    for tls_id, nodes in tls_nodes.items():
+        for node in nodes:
+            node_to_tls[node] = tls_id
+
+    distances: Dict[Tuple[str, str], float] = {}
+    for tls_id, sources in tls_nodes.items():
+        best: Dict[str, float] = {node: 0.0 for node in sources}
+        heap = [(0.0, node) for node in sources]
+        while heap:
+            dist, node = heapq.heappop(heap)
+            if dist > best.get(node, float("inf")):
+                continue
+            other = node_to_tls.get(node)
+            if other is not None and other != tls_id:
+                pair = tuple(sorted((tls_id, other)))
+                distances[pair] = min(distances.get(pair, float("inf")), dist)
+            for neighbour, length in adjacency[node]:
+                candidate = dist + length
+                if candidate <= max_distance and candidate < best.get(neighbour, float("inf")):
+                    best[neighbour] = candidate
+                    heapq.heappush(heap, (candidate, neighbour))
+    return distances
+
+
+def _cluster(
+    tls_flow: Dict[str, float],
+    distances: Dict[Tuple[str, str], float],
+    max_region_size: int,
+    balance: float,
+) -> List[List[str]]:
+    """Greedy agglomeration: merge the most flow-coupled nearby pairs under size/flow caps."""
+
+    tls_ids = sorted(tls_flow)
+    parent = {tls_id: tls_id for tls_id in tls_ids}
+    size = {tls_id: 1 for tls_id in tls_ids}
+    flow = dict(tls_flow)
+    total_flow = sum(tls_flow.values())
+    flow_cap = balance * total_flow * max_region_size / max(len(tls_ids), 1)
+
+    def find(x: str) -> str:
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    affinity = sorted(
+        ((tls_flow[a] + tls_flow[b]) / (dist + 1.0), a, b) for (a, b), dist in distances.items()
+    )
+    for _score, a, b in reversed(affinity):
+        ra, rb = find(a), find(b)
+        if ra == rb:
+            continue
+        if size[ra] + size[rb] > max_region_size or flow[ra] + flow[rb] > flow_cap:
+            continue
+        parent[rb] = ra
+        size[ra] += size[rb]
+        flow[ra] += flow[rb]
+
+    regions: Dict[str, List[str]] = defaultdict(list)
+    for tls_id in tls_ids:
+        regions[find(tls_id)].append(tls_id)
+    return sorted(regions.values(), key=lambda members: (-flow[find(members[0])], members[0]))
+
+
+def partition_traffic_lights(
+    net_file: str,
+    edge_data_file: Optional[str] = None,
+    max_region_size: int = DEFAULT_MAX_REGION_SIZE,
+    balance: float = DEFAULT_BALANCE,
+    max_distance: float = DEFAULT_MAX_DISTANCE,
+    use_cache: bool = True,
+) -> List[List[str]]:
+    """Return the traffic light IDs grouped into regions, cached next to ``net_file``."""
+
+    params = {
+        "net": file_digest(net_file),
+        "edge_data": file_digest(edge_data_file) if edge_data_file and os.path.exists(edge_data_file) else None,
+        "max_region_size": max_region_size,
+        "balance": balance,
+        "max_distance": max_distance,
+    }
+    key = hashlib.sha256(json.dumps(params, sort_keys=True).encode("utf-8")).hexdigest()
+    cache_path = f"{net_file}.regions.json"
+
+    if use_cache and os.path.exists(cache_path):
+        with open(cache_path, "r", encoding="utf-8") as f:
+            cached = json.load(f)
+        if cached.get("key") == key:
+            return cached["regions"]
+
+    net = sumolib.net.readNet(net_file)
+    tls_nodes, tls_flow = _tls_nodes_and_flow(net, _load_edge_flows(edge_data_file))
+    distances = _tls_distances(net, tls_nodes, max_distance)
+    regions = _cluster(tls_flow, distances, max_region_size, balance)
+
+    if use_cache:
+        with open(cache_path, "w", encoding="utf-8") as f:
+            json.dump({"key": key, "params": params, "regions": regions}, f, indent=2)
+    return regions
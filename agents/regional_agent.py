@@ -1,4 +1,4 @@
-from typing import Dict, List
+from typing import Dict, List, Optional, Sequence
 
 import numpy as np
 
@@ -50,6 +50,16 @@ class RegionalAgent:
             else:
                 actions[idx] = self.override_phase
 
+    def mask(self, tl_index_map: Dict[str, int], n_cols: int) -> np.ndarray:
+        """Boolean column mask of the intersections this region controls."""
+
+        mask = np.zeros(n_cols, dtype=bool)
+        for tl in self.intersections:
+            idx = tl_index_map.get(tl)
+            if idx is not None and idx < n_cols:
+                mask[idx] = True
+        return mask
+
     def step(self, info: Dict[str, float], actions: np.ndarray, tl_index_map: Dict[str, int]) -> bool:
         """Update intervention state and mutate the action vector when needed."""
 
@@ -70,3 +80,74 @@ class RegionalAgent:
             return True
 
         return False
+
+
+class RegionalCoordinator:
+    """Vectorized version of ``RegionalAgent.step`` for every region and scenario at once.
+
+    The region-by-TL membership matrix is built once; each step the regional
+    queues of all K scenarios come from one matrix product and the
+    intervention countdowns live in (K, R) arrays.
+    """
+
+    def __init__(
+        self,
+        regions: Sequence[RegionalAgent],
+        traffic_lights: Sequence[str],
+        tl_index_map: Optional[Dict[str, int]] = None,
+    ) -> None:
+        self.regions = list(regions)
+        self.traffic_lights = list(traffic_lights)
+        n_tls = len(self.traffic_lights)
+        if tl_index_map is None:
+            tl_index_map = {tl: idx for idx, tl in enumerate(self.traffic_lights)}
+
+        self.membership = np.stack([region.mask(tl_index_map, n_tls) for region in self.regions]).astype(np.float64)
+        self.thresholds = np.array([region.queue_threshold for region in self.regions], dtype=np.float64)
+        self.min_steps = np.array([region.min_intervention_steps for region in self.regions], dtype=np.int64)
+        self.override_phases = np.array([region.override_phase for region in self.regions], dtype=np.int64)
+        # Si un TL está en varias regiones gana la última, como en el bucle original.
+        self._rank = (np.arange(1, len(self.regions) + 1)[:, None] * self.membership).astype(np.int64)
+
+        columns = sorted(tl_index_map.items(), key=lambda item: item[1])
+        self._stopped_keys = [f"{tl}_stopped" for tl, idx in columns if idx < n_tls]
+
+        self.intervening: Optional[np.ndarray] = None
+        self.remaining: Optional[np.ndarray] = None
+
+    def stopped_matrix(self, infos: Sequence[Dict[str, float]]) -> np.ndarray:
+        """(K, n_tls) matrix of stopped vehicles per TL read from the sumo-rl infos."""
+
+        n_tls = self.membership.shape[1]
+        stopped = np.zeros((len(infos), n_tls), dtype=np.float64)
+        for k, info in enumerate(infos):
+            if info:
+                stopped[k] = np.fromiter((info.get(key, 0) for key in self._stopped_keys), dtype=np.float64, count=n_tls)
+        return stopped
+
+    def step(self, infos: Sequence[Dict[str, float]], actions: np.ndarray) -> np.ndarray:
+        """Update all countdowns and override ``actions`` (K, n_tls) in place.
+
+        Returns the (K, R) boolean matrix of active interventions.
+        """
+
+        queues = self.stopped_matrix(infos) @ self.membership.T
+        n_envs, n_regions = queues.shape
+        if self.intervening is None or self.intervening.shape[0] != n_envs:
+            self.intervening = np.zeros((n_envs, n_regions), dtype=bool)
+            self.remaining = np.zeros((n_envs, n_regions), dtype=np.int64)
+
+        remaining = np.where(self.intervening, self.remaining - 1, self.remaining)
+        continuing = self.intervening & (remaining > 0)
+        triggered = ~continuing & (queues >= self.thresholds)
+        remaining = np.where(triggered, self.min_steps, remaining)
+
+        active = continuing | triggered
+        self.intervening = active
+        self.remaining = remaining
+
+        if active.any():
+            winner = (active[:, :, None] * self._rank[None, :, :]).max(axis=1)
+            overridden = winner > 0
+            actions[overridden] = self.override_phases[winner[overridden] - 1]
+        return active
@@ -0,0 +1,105 @@
+"""Compara pasos/segundo de libsumo vs TraCI sobre la red de Sogamoso.
+
+Cada backend se mide en un subproceso nuevo porque sumo-rl fija el backend al
+importarse.
+
+Uso:
+    python benchmarks/backend_speed.py --steps 300
+    python benchmarks/backend_speed.py --backends traci --route ./sumoData/osm.passenger.trips.xml
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from sumo_backend import libsumo_available
+
+
+def measure(sim_dir: str, backend: str, steps: int, delta_time: int, route_file: str, seed: int) -> dict:
+    """Run ``steps`` env steps with random actions and return the timing summary."""
+
+    from env_factory import build_vec_env
+
+    setup_start = time.perf_counter()
+    env = build_vec_env(
+        sim_dir=sim_dir,
+        num_seconds=(steps + 1) * delta_time,
+        delta_time=delta_time,
+        sumo_warnings=False,
+        route_file=route_file,
+        num_cpus=0,
+        seeds=[seed],
+        backend=backend,
+    )
+    env.reset()
+    setup_s = time.perf_counter() - setup_start
+
+    rng = np.random.default_rng(seed)
+    n_actions = env.action_space.n
+    start = time.perf_counter()
+    for _ in range(steps):
+        env.step(rng.integers(0, n_actions, size=env.num_envs))
+    elapsed = time.perf_counter() - start
+    env.close()
+
+    return {
+        "backend": backend,
+        "steps": steps,
+        "setup_s": round(setup_s, 3),
+        "elapsed_s": round(elapsed, 3),
+        "env_steps_per_s": round(steps / elapsed, 2),
+        "sim_seconds_per_s": round(steps * delta_time / elapsed, 2),
+    }
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark libsumo vs TraCI steps/sec.")
+    parser.add_argument("--sim_dir", type=str, default="./sumoData")
+    parser.add_argument("--route", type=str, default=None, help="Archivo de rutas (default: lite si existe)")
+    parser.add_argument("--steps", type=int, default=300)
+    parser.add_argument("--delta_time", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--backends", nargs="+", default=["traci", "libsumo"], choices=["traci", "libsumo"])
+    parser.add_argument("--child", type=str, default=None, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+
+    if args.child:
+        result = measure(args.sim_dir, args.child, args.steps, args.delta_time, args.route, args.seed)
+        print(json.dumps(result))
+        return
+
+    results = []
+    for backend in args.backends:
+        if backend == "libsumo" and not libsumo_available():
+            print("[bench] libsumo no está instalado; omitiendo")
+            continue
+        cmd = [sys.executable, os.path.abspath(__file__), "--child", backend,
+               "--sim_dir", args.sim_dir, "--steps", str(args.steps),
+               "--delta_time", str(args.delta_time), "--seed", str(args.seed)]
+        if args.route:
+            cmd += ["--route", args.route]
+        proc = subprocess.run(cmd, capture_output=True, text=True, check=True)
+        results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+    print(f"{'backend':<10}{'setup (s)':>12}{'env steps/s':>14}{'sim s/s':>12}")
+    for r in results:
+        print(f"{r['backend']:<10}{r['setup_s']:>12.2f}{r['env_steps_per_s']:>14.2f}{r['sim_seconds_per_s']:>12.2f}")
+    if len(results) == 2 and results[0]["env_steps_per_s"] > 0:
+        print(f"speedup {results[1]['backend']}/{results[0]['backend']}: "
+              f"{results[1]['env_steps_per_s'] / results[0]['env_steps_per_s']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
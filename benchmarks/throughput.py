@@ -0,0 +1,277 @@
+"""Suite de rendimiento de la simulación sobre la red de Sogamoso.
+
+Corre una matriz fija de escenarios sin GUI, con semilla fija y un número fijo
+de pasos: demanda lite/full x recompensa propia on/off x orquestador on/off.
+Cada escenario se mide en un subproceso nuevo (sumo-rl fija el backend al
+importarse y así el pico de memoria es solo de ese escenario) y reporta:
+
+* pasos de entorno por segundo,
+* llamadas TraCI por paso (comandos enviados por ``traci.connection.Connection``;
+  solo con backend traci, con libsumo no hay socket que contar),
+* pico de RSS del proceso Python y del proceso SUMO.
+
+Las acciones salen de un generador con semilla, no de un modelo, para medir
+solo la simulación. "reward off" usa la recompensa por defecto de sumo-rl;
+"orchestrator on" pasa las acciones por ``RegionalCoordinator`` como en
+``agents/Agents_orchestator.py``.
+
+Uso:
+    python benchmarks/throughput.py --steps 300
+    python benchmarks/throughput.py --save_baseline            # fija la referencia
+    python benchmarks/throughput.py --scenarios full-reward-orch --tolerance 0.05
+"""
+import argparse
+import itertools
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+import numpy as np
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from sumo_backend import libsumo_available
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "throughput_baseline.json")
+DEMANDS = {"lite": "osm.passenger.trips_lite.xml", "full": "osm.passenger.trips.xml"}
+DEFAULT_REWARD = "diff-waiting-time"  # recompensa por defecto de sumo-rl
+# Métrica -> True si más alto es mejor.
+COMPARED = {"env_steps_per_s": True, "traci_calls_per_step": False, "peak_rss_mb": False, "sumo_peak_rss_mb": False}
+
+
+def scenario_name(demand: str, reward: bool, orchestrator: bool) -> str:
+    return "-".join([demand, "reward" if reward else "noreward", "orch" if orchestrator else "noorch"])
+
+
+def scenario_matrix() -> Dict[str, Dict]:
+    return {
+        scenario_name(demand, reward, orch): {"demand": demand, "reward": reward, "orchestrator": orch}
+        for demand, reward, orch in itertools.product(DEMANDS, (True, False), (True, False))
+    }
+
+
+class TraciCallCounter:
+    """Count every command sent over TraCI by patching ``Connection._sendCmd``."""
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self._original = None
+
+    def install(self) -> bool:
+        try:
+            from traci.connection import Connection
+        except ImportError:
+            return False
+        original = Connection._sendCmd
+        counter = self
+
+        def counted(self, *args, **kwargs):
+            counter.calls += 1
+            return original(self, *args, **kwargs)
+
+        Connection._sendCmd = counted
+        self._original = original
+        return True
+
+
+def _rss_mb(who: int) -> float:
+    # ru_maxrss viene en KiB en Linux.
+    return resource.getrusage(who).ru_maxrss / 1024.0
+
+
+def measure(scenario: Dict, sim_dir: str, steps: int, seed: int, backend: str, sumo_settings: Dict) -> Dict:
+    """Run one scenario for ``steps`` env steps with seeded random actions."""
+
+    from sumo_backend import configure_backend
+
+    backend = configure_backend(backend, False)
+    counter = TraciCallCounter()
+    counting = backend == "traci" and counter.install()
+
+    from env_factory import build_vec_env
+    from reward import reward_function
+
+    setup_start = time.perf_counter()
+    env, traffic_lights, action_sizes = build_vec_env(
+        sim_dir=sim_dir,
+        num_seconds=(steps + 1) * sumo_settings["delta_time"],
+        sumo_warnings=False,
+        route_file=os.path.join(sim_dir, DEMANDS[scenario["demand"]]),
+        return_parallel_env=True,
+        num_cpus=0,
+        seeds=[seed],
+        backend=backend,
+        reward_fn=reward_function if scenario["reward"] else DEFAULT_REWARD,
+        **sumo_settings,
+    )
+    coordinator = limits = None
+    if scenario["orchestrator"]:
+        sys.path.insert(0, os.path.join(PROJECT_ROOT, "agents"))
+        from Agents_orchestator import _apply_phase_limits, _build_regions, _phase_limit_vector, _split_infos
+        from regional_agent import RegionalCoordinator
+
+        tl_index_map = {tl: idx for idx, tl in enumerate(traffic_lights)}
+        limits = _phase_limit_vector(action_sizes, tl_index_map, len(traffic_lights))
+        coordinator = RegionalCoordinator(_build_regions(), traffic_lights, tl_index_map)
+    env.reset()
+    setup_s = time.perf_counter() - setup_start
+
+    rng = np.random.default_rng(seed)
+    n_actions = env.action_space.n
+    n_tls = len(traffic_lights)
+    env_infos: List[dict] = [{}]
+    calls_before = counter.calls
+    start = time.perf_counter()
+    for _ in range(steps):
+        actions = rng.integers(0, n_actions, size=env.num_envs)
+        if coordinator is not None:
+            env_actions = actions.reshape(1, n_tls)
+            coordinator.step(env_infos, env_actions)
+            _apply_phase_limits(env_actions, limits)
+        _obs, _rewards, _dones, infos = env.step(actions)
+        if coordinator is not None:
+            env_infos = _split_infos(infos, 1, n_tls)
+    elapsed = time.perf_counter() - start
+    calls = counter.calls - calls_before
+    env.close()
+
+    return {
+        **scenario,
+        "backend": backend,
+        "steps": steps,
+        "setup_s": round(setup_s, 3),
+        "elapsed_s": round(elapsed, 3),
+        "env_steps_per_s": round(steps / elapsed, 2),
+        "traci_calls_per_step": round(calls / steps, 2) if counting else None,
+        "peak_rss_mb": round(_rss_mb(resource.RUSAGE_SELF), 1),
+        # Con traci SUMO es un proceso hijo (ya terminado tras env.close()).
+        "sumo_peak_rss_mb": round(_rss_mb(resource.RUSAGE_CHILDREN), 1) if backend == "traci" else None,
+    }
+
+
+def compare(results: Dict[str, Dict], config: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Lines describing every metric that got worse than ``baseline`` by more than ``tolerance``."""
+
+    if baseline.get("config") != config:
+        print("[bench] aviso: la configuración difiere de la del baseline; la comparación es orientativa")
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get("results", {}).get(name)
+        if reference is None:
+            continue
+        for metric, higher_is_better in COMPARED.items():
+            new, old = result.get(metric), reference.get(metric)
+            if new is None or old is None or old == 0:
+                continue
+            change = (new - old) / old
+            if (-change if higher_is_better else change) > tolerance:
+                regressions.append(f"{name}: {metric} {old} -> {new} ({change:+.1%})")
+    return regressions
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Throughput benchmark matrix for the SUMO env stack.")
+    parser.add_argument("--sim_dir", type=str, default="./sumoData")
+    parser.add_argument("--steps", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--backend", choices=["traci", "libsumo"], default="traci",
+                        help="traci permite contar llamadas; libsumo mide el caso de entrenamiento")
+    parser.add_argument("--scenarios", nargs="+", default=None, choices=sorted(scenario_matrix()))
+    parser.add_argument("--delta_time", type=int, default=10)
+    parser.add_argument("--min_green", type=int, default=10)
+    parser.add_argument("--max_green", type=int, default=60)
+    parser.add_argument("--time_to_teleport", type=int, default=300)
+    parser.add_argument("--baseline", type=str, default=DEFAULT_BASELINE)
+    parser.add_argument("--save_baseline", action="store_true", help="Guardar estos resultados como baseline")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Empeoramiento relativo tolerado")
+    parser.add_argument("--output", type=str, default=None, help="JSON con los resultados de esta corrida")
+    parser.add_argument("--child", type=str, default=None, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    sumo_settings = {
+        "delta_time": args.delta_time,
+        "min_green": args.min_green,
+        "max_green": args.max_green,
+        "time_to_teleport": args.time_to_teleport,
+    }
+    matrix = scenario_matrix()
+
+    if args.child:
+        result = measure(matrix[args.child], args.sim_dir, args.steps, args.seed, args.backend, sumo_settings)
+        print(json.dumps(result))
+        return
+
+    if args.backend == "libsumo" and not libsumo_available():
+        sys.exit("[bench] libsumo no está instalado")
+
+    config = {"steps": args.steps, "seed": args.seed, "backend": args.backend, **sumo_settings}
+    results: Dict[str, Dict] = {}
+    failed: List[str] = []
+    for name in args.scenarios or list(matrix):
+        route = os.path.join(args.sim_dir, DEMANDS[matrix[name]["demand"]])
+        if not os.path.exists(route):
+            print(f"[bench] {name}: no existe {route}; omitiendo")
+            continue
+        cmd = [sys.executable, os.path.abspath(__file__), "--child", name,
+               "--sim_dir", args.sim_dir, "--steps", str(args.steps), "--seed", str(args.seed),
+               "--backend", args.backend]
+        for key, value in sumo_settings.items():
+            cmd += [f"--{key}", str(value)]
+        proc = subprocess.run(cmd, capture_output=True, text=True)
+        if proc.returncode != 0:
+            # Un escenario roto no debe impedir medir el resto de la matriz.
+            print(f"[bench] {name}: falló (código {proc.returncode})")
+            print(proc.stderr.rstrip(), file=sys.stderr)
+            failed.append(name)
+            continue
+        results[name] = json.loads(proc.stdout.strip().splitlines()[-1])
+
+    print(f"{'scenario':<24}{'steps/s':>10}{'traci/step':>12}{'rss MB':>10}{'sumo MB':>10}{'setup s':>10}")
+    for name, r in results.items():
+        calls = "-" if r["traci_calls_per_step"] is None else f"{r['traci_calls_per_step']:.1f}"
+        sumo_rss = "-" if r["sumo_peak_rss_mb"] is None else f"{r['sumo_peak_rss_mb']:.0f}"
+        print(f"{name:<24}{r['env_steps_per_s']:>10.2f}{calls:>12}{r['peak_rss_mb']:>10.0f}{sumo_rss:>10}{r['setup_s']:>10.2f}")
+
+    report = {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "config": config, "results": results}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if failed:
+        print(f"[bench] escenarios fallidos: {', '.join(failed)}")
+        if args.save_baseline:
+            sys.exit("[bench] no se guarda un baseline incompleto")
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline guardado en {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"[bench] sin baseline en {args.baseline}; usa --save_baseline para crearlo")
+        sys.exit(1 if failed else 0)
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = compare(results, config, baseline, args.tolerance)
+    if regressions:
+        print(f"Regresiones frente al baseline (tolerancia {args.tolerance:.0%}):")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+    print(f"Sin regresiones frente al baseline ({len(results)} escenarios, tolerancia {args.tolerance:.0%}).")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
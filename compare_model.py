@@ -1,58 +1,88 @@
-import pandas as pd
-import matplotlib.pyplot as plt
-
-file_1 = "./graphics/datos_baseline.csv"          
-file_2 = "./graphics/datos_IA_evaluacion_conn1_ep1_v3.csv"   
-file_3 = "./graphics/datos_IA_evaluacion_conn1_ep1_v6.csv"  
-
-
-label_1 = "Baseline (No AI)"
-label_2 = "AI Model  V1"
-label_3 = "AI Model  V2"
-
-
-
-df1 = pd.read_csv(file_1)
-df2 = pd.read_csv(file_2)
-df3 = pd.read_csv(file_3)
-
-
-plt.figure(figsize=(10, 6)) 
-
-
-plt.plot(df1['step'], df1['system_mean_speed'], label=label_1, color='gray', linestyle='--', alpha=0.7)
-plt.plot(df2['step'], df2['system_mean_speed'], label=label_2, color='green')
-plt.plot(df3['step'], df3['system_mean_speed'], label=label_3, color='blue')
-
-
-plt.title('System Mean Speed Comparison')
-plt.xlabel('Simulation Step')
-plt.ylabel('Speed (m/s)')
-plt.legend()
-plt.grid(True)
-
-
-plt.tight_layout()
-plt.savefig("Comparison_Mean_Speed.png") 
-plt.show() 
-
-
-
-plt.figure(figsize=(10, 6)) 
-
-
-plt.plot(df1['step'], df1['system_total_waiting_time'], label=label_1, color='gray', linestyle='--', alpha=0.7)
-plt.plot(df2['step'], df2['system_total_waiting_time'], label=label_2, color='green')
-plt.plot(df3['step'], df3['system_total_waiting_time'], label=label_3, color='blue')
-
-
-plt.title('System Total Waiting Time Comparison')
-plt.xlabel('Simulation Step')
-plt.ylabel('Total Waiting Time (seconds)')
-plt.legend()
-plt.grid(True)
+"""Compara cualquier número de corridas (baseline, checkpoints, orquestador).
+
+Cada ``--run`` es ``[etiqueta=]ruta``, donde la ruta es un episodio, un glob o
+un directorio de episodios (varias semillas se promedian con su intervalo de
+confianza). Sin ``--run`` se comparan las tres corridas de ``graphics/``.
+
+Ejemplos:
+    python compare_model.py
+    python compare_model.py --run "Baseline=graphics/datos_baseline.csv" --run "eval/checkpoint_*/"
+    python compare_model.py --run "V6=eval/v6_conn1_ep*.npz" --save-aggregates metrics/v6.json
+    python compare_model.py --from-aggregates metrics/v6.json --show
+"""
+import argparse
+import os
+import time
 
+import pandas as pd
 
-plt.tight_layout()
-plt.savefig("Comparison_Waiting_Time.png") 
-plt.show()
\ No newline at end of file
+from plot_metrics import plot_comparison, plot_summary
+from run_compare import (
+    DEFAULT_GRID_STEP,
+    compare_runs,
+    load_aggregates,
+    missing_metrics,
+    resolve_run,
+    save_aggregates,
+    summary_table,
+)
+
+DEFAULT_RUNS = [
+    "Baseline (No AI)=./graphics/datos_baseline.csv",
+    "AI Model  V1=./graphics/datos_IA_evaluacion_conn1_ep1_v3.csv",
+    "AI Model  V2=./graphics/datos_IA_evaluacion_conn1_ep1_v6.csv",
+]
+
+SUMMARY_PLOTS = [
+    ("mean_waiting_time", "Mean Waiting Time (s)"),
+    ("p95_waiting_time", "P95 Waiting Time (s)"),
+    ("mean_stopped", "Mean Stopped Vehicles"),
+    ("throughput_veh_h", "Throughput (veh/h)"),
+]
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Compare SUMO metrics across any number of runs.")
+    parser.add_argument("--run", action="append", default=[], metavar="[LABEL=]PATH",
+                        help="Episode file, glob or directory; repeat for each run.")
+    parser.add_argument("--step", type=float, default=DEFAULT_GRID_STEP,
+                        help="Common step grid (s) the curves are resampled onto.")
+    parser.add_argument("--workers", type=int, default=None, help="Processes used to read episodes.")
+    parser.add_argument("--output_dir", type=str, default=".", help="Where the PNGs are written.")
+    parser.add_argument("--save-aggregates", dest="save_aggregates", type=str, default=None,
+                        help="Write the aggregates to JSON to re-plot later without the episodes.")
+    parser.add_argument("--from-aggregates", dest="from_aggregates", type=str, default=None,
+                        help="Plot from a JSON written by --save-aggregates instead of reading episodes.")
+    parser.add_argument("--show", action="store_true", help="Display the plots instead of saving them.")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    start = time.perf_counter()
+    if args.from_aggregates:
+        aggregates = load_aggregates(args.from_aggregates)
+    else:
+        runs = [resolve_run(spec) for spec in (args.run or DEFAULT_RUNS)]
+        aggregates = compare_runs(runs, args.step, args.workers)
+        episodes = sum(run.seeds for run in aggregates)
+        print(f"{len(aggregates)} runs, {episodes} episodes aggregated in {time.perf_counter() - start:.2f}s")
+        if args.save_aggregates:
+            save_aggregates(args.save_aggregates, aggregates)
+
+    table = summary_table(aggregates)
+    with pd.option_context("display.max_columns", None, "display.width", 160, "display.float_format", "{:.2f}".format):
+        print(table)
+    missing = missing_metrics(table)
+    if missing:
+        # throughput_veh_h necesita system_total_arrived, que sumo-rl 1.4.5 no escribe.
+        print(f"Sin datos en ninguna corrida (NaN): {', '.join(missing)}")
+
+    plot_path = None if args.show else os.path.join(args.output_dir, "Comparison_Metrics.png")
+    summary_path = None if args.show else os.path.join(args.output_dir, "Comparison_Summary.png")
+    plot_comparison({run.label: run.curves() for run in aggregates}, plot_path)
+    plot_summary(table, SUMMARY_PLOTS, summary_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,487 @@
+"""Entrenamiento DQN actor–aprendiz.
+
+En ``train.py`` la simulación (CPU, SUMO) y los pasos de gradiente se alternan
+en un solo proceso. Aquí varios actores, cada uno con su propio SUMO
+(``train.make_env``) y una copia de la política, generan transiciones de forma
+continua y las envían al aprendiz, que es dueño del replay buffer y entrena
+mientras los actores siguen simulando.
+
+* Actores locales: un proceso por actor, conectado al aprendiz por un ``Pipe``.
+* Actores remotos: ``multiprocessing.connection`` sobre TCP con ``authkey``
+  (``--listen`` en el aprendiz, ``python distributed.py --connect`` en la otra
+  máquina). Los mensajes se serializan con pickle: solo para redes de confianza.
+
+El aprendiz usa el mismo ``DQN`` de SB3 sobre un VecEnv que solo declara los
+espacios (``SpaceOnlyVecEnv``) y lo alimenta con ``ExternalTrainer``: las
+transiciones entran con ``replay_buffer.add``, el conteo de pasos, la red
+objetivo y la exploración avanzan con ``_on_step`` y se llama a ``train`` con
+la misma proporción ``train_freq``/``gradient_steps`` que en el entrenamiento
+normal. Los pesos y la tasa de exploración actual se envían a los actores cada
+``sync_every`` pasos de gradiente.
+
+Mensajes (tuplas):
+    actor -> aprendiz: ("hello", actor_id, spaces), ("transitions", actor_id, batch),
+                       ("episode", actor_id, info)
+    aprendiz -> actor: ("weights", version, state, exploration_rate), ("stop",)
+"""
+import argparse
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+from multiprocessing.connection import Client, Connection, Listener, wait
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import torch as th
+from stable_baselines3 import DQN
+from stable_baselines3.common.callbacks import BaseCallback
+from stable_baselines3.common.utils import safe_mean
+from stable_baselines3.common.vec_env import VecEnv
+
+from replay_buffer import CompactReplayBuffer
+
+AUTHKEY_ENV = "DQN_ACTOR_AUTHKEY"
+DEFAULT_SEND_EVERY = 32
+DEFAULT_SYNC_EVERY = 250
+LOG_INTERVAL_S = 30.0
+
+
+class SpaceOnlyVecEnv(VecEnv):
+    """VecEnv that only carries the spaces, for models trained from external transitions.
+
+    ``reset`` returns zeros (SB3 calls it once when learning starts); stepping
+    raises, since the data comes from elsewhere.
+    """
+
+    def __init__(self, num_envs: int, observation_space, action_space):
+        super().__init__(num_envs, observation_space, action_space)
+
+    def reset(self):
+        return np.zeros((self.num_envs, *self.observation_space.shape), dtype=self.observation_space.dtype)
+
+    def step_async(self, actions):
+        raise RuntimeError("SpaceOnlyVecEnv cannot be stepped")
+
+    def step_wait(self):
+        raise RuntimeError("SpaceOnlyVecEnv cannot be stepped")
+
+    def close(self):
+        pass
+
+    def get_attr(self, attr_name, indices=None):
+        return [None for _ in self._get_indices(indices)]
+
+    def set_attr(self, attr_name, value, indices=None):
+        pass
+
+    def env_method(self, method_name, *method_args, indices=None, **method_kwargs):
+        return [None for _ in self._get_indices(indices)]
+
+    def env_is_wrapped(self, wrapper_class, indices=None):
+        return [False for _ in self._get_indices(indices)]
+
+
+class ExternalTrainer:
+    """Drive an SB3 off-policy model with transitions produced outside ``learn``.
+
+    Each ``add`` is one VecEnv step: it goes into the replay buffer, advances
+    ``num_timesteps``, the target network and the exploration schedule
+    (``_on_step``), runs the callback and trains with the model's
+    ``train_freq``/``gradient_steps`` once ``learning_starts`` is reached.
+
+    Each ``train`` is bracketed by ``on_rollout_end``/``on_rollout_start`` as in
+    ``learn``, so callbacks such as ``ProfilingCallback`` see the training time.
+    """
+
+    def __init__(self, model, total_timesteps: int, callback: Optional[BaseCallback] = None):
+        self.model = model
+        self.total_timesteps, self.callback = model._setup_learn(total_timesteps, callback)
+        self.callback.on_training_start(locals(), globals())
+        self.callback.on_rollout_start()
+        self.vec_steps = 0
+        self.gradient_steps = 0
+        self.stopped = False
+
+    @property
+    def done(self) -> bool:
+        return self.stopped or self.model.num_timesteps >= self.total_timesteps
+
+    def add(self, obs, next_obs, actions, rewards, dones, truncated) -> None:
+        model = self.model
+        infos = [{"TimeLimit.truncated": bool(flag)} for flag in truncated]
+        model.replay_buffer.add(obs, next_obs, actions, rewards, dones, infos)
+        model.num_timesteps += model.n_envs
+        self.vec_steps += 1
+        model._update_current_progress_remaining(model.num_timesteps, self.total_timesteps)
+        model._on_step()
+        if not self.callback.on_step():
+            self.stopped = True
+            return
+        train_freq = model.train_freq.frequency
+        if model.num_timesteps > model.learning_starts and self.vec_steps % train_freq == 0:
+            gradient_steps = model.gradient_steps if model.gradient_steps > 0 else train_freq
+            self.callback.on_rollout_end()
+            model.train(gradient_steps=gradient_steps, batch_size=model.batch_size)
+            self.callback.on_rollout_start()
+            self.gradient_steps += gradient_steps
+
+    def close(self) -> None:
+        self.callback.on_training_end()
+
+
+def policy_state(model: DQN) -> Dict[str, np.ndarray]:
+    return {key: value.detach().cpu().numpy() for key, value in model.policy.state_dict().items()}
+
+
+def load_policy_state(model: DQN, state: Dict[str, np.ndarray]) -> None:
+    model.policy.load_state_dict({key: th.as_tensor(value) for key, value in state.items()})
+
+
+class _TransitionBatch:
+    """Per-step arrays of one actor, sent as stacked (T, n_envs, ...) arrays."""
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self) -> None:
+        self.obs: List[np.ndarray] = []
+        self.next_obs: List[np.ndarray] = []
+        self.actions: List[np.ndarray] = []
+        self.rewards: List[np.ndarray] = []
+        self.dones: List[np.ndarray] = []
+        self.truncated: List[np.ndarray] = []
+
+    def __len__(self) -> int:
+        return len(self.rewards)
+
+    def append(self, obs, next_obs, actions, rewards, dones, infos) -> None:
+        self.obs.append(obs)
+        self.next_obs.append(next_obs)
+        self.actions.append(actions)
+        self.rewards.append(rewards)
+        self.dones.append(dones)
+        self.truncated.append(np.array([info.get("TimeLimit.truncated", False) for info in infos], dtype=bool))
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        return {
+            "obs": np.stack(self.obs),
+            "next_obs": np.stack(self.next_obs),
+            "actions": np.stack(self.actions),
+            "rewards": np.stack(self.rewards).astype(np.float32),
+            "dones": np.stack(self.dones),
+            "truncated": np.stack(self.truncated),
+        }
+
+
+def run_actor(
+    conn: Connection,
+    actor_id: int,
+    env_fn: Callable,
+    model_kwargs: Dict,
+    seed: Optional[int] = None,
+    send_every: int = DEFAULT_SEND_EVERY,
+) -> None:
+    """Actor loop: epsilon-greedy steps on its own SUMO, transitions to the learner.
+
+    ``env_fn(seeds, csv_name, return_layout)`` builds the VecEnv (``train.make_env``). The
+    actor waits for the first weights before stepping and applies every newer
+    version between steps.
+    """
+    env, layout = env_fn(seeds=None if seed is None else [seed], csv_name=f"resultados_actor{actor_id}",
+                         return_layout=True)
+    policy_kwargs = model_kwargs.get("policy_kwargs")
+    # Solo se usa la red de la política; el buffer local queda al mínimo.
+    model = DQN("MlpPolicy", env, buffer_size=1, learning_starts=0, policy_kwargs=policy_kwargs, device="cpu")
+    rng = np.random.default_rng(seed)
+    n_actions = env.action_space.n
+    conn.send(("hello", actor_id, {
+        "num_envs": env.num_envs,
+        "observation_space": env.observation_space,
+        "action_space": env.action_space,
+        "obs_sizes": layout.slot_obs_sizes,
+    }))
+
+    epsilon = 1.0
+    batch = _TransitionBatch()
+    have_weights = False
+    obs = env.reset()
+    try:
+        while True:
+            while not have_weights or conn.poll():
+                message = conn.recv()
+                if message[0] == "stop":
+                    return
+                if message[0] == "weights":
+                    _, _version, state, epsilon = message
+                    load_policy_state(model, state)
+                    have_weights = True
+
+            actions, _ = model.predict(obs, deterministic=True)
+            explore = rng.random(env.num_envs) < epsilon
+            if explore.any():
+                actions = np.array(actions, copy=True)
+                actions[explore] = rng.integers(0, n_actions, size=int(explore.sum()))
+            new_obs, rewards, dones, infos = env.step(actions)
+
+            next_obs = np.array(new_obs, copy=True)
+            for i in np.flatnonzero(dones):
+                if infos[i].get("terminal_observation") is not None:
+                    next_obs[i] = infos[i]["terminal_observation"]
+            batch.append(obs, next_obs, actions, rewards, dones, infos)
+            episodes = [info["episode"] for info in infos if "episode" in info]
+            if episodes:
+                # Cada semáforo es un sub-entorno; el episodio se reporta promediado.
+                conn.send(("episode", actor_id, {
+                    "r": float(np.mean([ep["r"] for ep in episodes])),
+                    "l": int(episodes[0]["l"]),
+                }))
+            if len(batch) >= send_every:
+                conn.send(("transitions", actor_id, batch.arrays()))
+                batch.clear()
+            obs = new_obs
+    except (EOFError, BrokenPipeError, ConnectionResetError):
+        pass  # el aprendiz terminó
+    finally:
+        env.close()
+        conn.close()
+
+
+def _accept_loop(listener: Listener, pending: "queue.Queue[Connection]") -> None:
+    while True:
+        try:
+            pending.put(listener.accept())
+        except mp.AuthenticationError:
+            continue
+        except OSError:
+            return  # listener cerrado
+
+
+class Learner:
+    """Owns the DQN and its replay buffer; trains on transitions streamed by the actors."""
+
+    def __init__(
+        self,
+        model_kwargs: Dict,
+        total_timesteps: int,
+        sync_every: int = DEFAULT_SYNC_EVERY,
+        callback: Optional[BaseCallback] = None,
+        listener: Optional[Listener] = None,
+        verbose: int = 1,
+    ):
+        self.model_kwargs = model_kwargs
+        self.total_timesteps = total_timesteps
+        self.sync_every = sync_every
+        self.callback = callback
+        self.verbose = verbose
+        self.model: Optional[DQN] = None
+        self.trainer: Optional[ExternalTrainer] = None
+        self.conns: List[Connection] = []
+        self._pending: "queue.Queue[Connection]" = queue.Queue()
+        self._listener = listener
+        if listener is not None:
+            threading.Thread(target=_accept_loop, args=(listener, self._pending), daemon=True).start()
+        self._last_sync = 0
+        self._version = 0
+
+    def add_connection(self, conn: Connection) -> None:
+        self.conns.append(conn)
+
+    def _create_model(self, spaces: Dict) -> None:
+        env = SpaceOnlyVecEnv(spaces["num_envs"], spaces["observation_space"], spaces["action_space"])
+        model_kwargs = dict(self.model_kwargs)
+        if model_kwargs.get("replay_buffer_class") is CompactReplayBuffer:
+            # Los largos sin padding solo los conocen los actores (EnvLayout).
+            model_kwargs["replay_buffer_kwargs"] = {**model_kwargs.get("replay_buffer_kwargs", {}),
+                                                    "obs_sizes": spaces["obs_sizes"]}
+        self.model = DQN("MlpPolicy", env, verbose=self.verbose, **model_kwargs)
+        self.trainer = ExternalTrainer(self.model, self.total_timesteps, self.callback)
+
+    def _weights_message(self) -> Tuple:
+        return ("weights", self._version, policy_state(self.model), float(self.model.exploration_rate))
+
+    def _broadcast(self) -> None:
+        self._version += 1
+        message = self._weights_message()
+        for conn in list(self.conns):
+            self._send(conn, message)
+        self._last_sync = self.trainer.gradient_steps
+
+    def _send(self, conn: Connection, message) -> None:
+        try:
+            conn.send(message)
+        except (BrokenPipeError, ConnectionResetError, EOFError, OSError):
+            self._drop(conn)
+
+    def _drop(self, conn: Connection) -> None:
+        if conn in self.conns:
+            self.conns.remove(conn)
+            conn.close()
+
+    def _handle(self, conn: Connection, message) -> None:
+        kind = message[0]
+        if kind == "hello":
+            spaces = message[2]
+            if self.model is None:
+                self._create_model(spaces)
+            elif spaces["num_envs"] != self.model.n_envs:
+                # Un actor mal configurado no debe tumbar el entrenamiento.
+                print(f"[learner] actor {message[1]} tiene {spaces['num_envs']} envs, se esperaban "
+                      f"{self.model.n_envs}; desconectado")
+                self._send(conn, ("stop",))
+                self._drop(conn)
+                return
+            self._send(conn, self._weights_message())
+        elif kind == "transitions":
+            self._ingest(message[2])
+        elif kind == "episode":
+            self.model.ep_info_buffer.extend([message[2]])
+
+    def _ingest(self, batch: Dict[str, np.ndarray]) -> None:
+        trainer = self.trainer
+        try:
+            for t in range(batch["rewards"].shape[0]):
+                trainer.add(batch["obs"][t], batch["next_obs"][t], batch["actions"][t], batch["rewards"][t],
+                            batch["dones"][t], batch["truncated"][t])
+                if trainer.gradient_steps - self._last_sync >= self.sync_every:
+                    self._broadcast()
+                if trainer.done:
+                    return
+        finally:
+            # El siguiente lote puede ser de otro actor: su obs no es el next_obs de este.
+            if isinstance(self.model.replay_buffer, CompactReplayBuffer):
+                self.model.replay_buffer.break_stream()
+
+    def _log(self, start: float, last: Tuple[float, int]) -> Tuple[float, int]:
+        now = time.perf_counter()
+        logger = self.model.logger
+        logger.record("time/total_timesteps", self.model.num_timesteps)
+        logger.record("time/fps", int((self.model.num_timesteps - last[1]) / max(now - last[0], 1e-9)))
+        logger.record("time/time_elapsed", int(now - start))
+        logger.record("distributed/actors", len(self.conns))
+        logger.record("distributed/weight_version", self._version)
+        logger.record("distributed/gradient_steps", self.trainer.gradient_steps)
+        if self.model.ep_info_buffer:
+            logger.record("rollout/ep_rew_mean", safe_mean([ep["r"] for ep in self.model.ep_info_buffer]))
+            logger.record("rollout/ep_len_mean", safe_mean([ep["l"] for ep in self.model.ep_info_buffer]))
+        logger.dump(step=self.model.num_timesteps)
+        return now, self.model.num_timesteps
+
+    def run(self) -> DQN:
+        start = time.perf_counter()
+        last = (start, 0)
+        last_log = start
+        while self.trainer is None or not self.trainer.done:
+            while not self._pending.empty():
+                self.add_connection(self._pending.get())
+            if not self.conns:
+                if self._listener is None:
+                    raise RuntimeError("All actors disconnected before training finished")
+                time.sleep(0.1)
+                continue
+            for conn in wait(self.conns, timeout=1.0):
+                try:
+                    message = conn.recv()
+                except (EOFError, ConnectionResetError, OSError):
+                    self._drop(conn)
+                    continue
+                self._handle(conn, message)
+                if self.trainer is not None and self.trainer.done:
+                    break
+            if self.model is not None and time.perf_counter() - last_log >= LOG_INTERVAL_S:
+                last = self._log(start, last)
+                last_log = time.perf_counter()
+
+        for conn in list(self.conns):
+            self._send(conn, ("stop",))
+        # Cerrar el extremo del aprendiz desbloquea a los actores que estén enviando.
+        for conn in list(self.conns):
+            self._drop(conn)
+        if self._listener is not None:
+            self._listener.close()
+        if self.trainer is not None:
+            self.trainer.close()
+        return self.model
+
+
+def parse_address(address: str) -> Tuple[str, int]:
+    host, _, port = address.rpartition(":")
+    return host or "0.0.0.0", int(port)
+
+
+def _authkey(authkey: Optional[str]) -> bytes:
+    authkey = authkey or os.environ.get(AUTHKEY_ENV)
+    if not authkey:
+        raise ValueError(f"Remote actors need an authkey (--authkey or ${AUTHKEY_ENV})")
+    return authkey.encode("utf-8")
+
+
+def train_distributed(
+    env_fn: Callable,
+    model_kwargs: Dict,
+    total_timesteps: int,
+    num_actors: int,
+    seeds: Optional[Sequence[int]] = None,
+    sync_every: int = DEFAULT_SYNC_EVERY,
+    send_every: int = DEFAULT_SEND_EVERY,
+    callback: Optional[BaseCallback] = None,
+    listen: Optional[str] = None,
+    authkey: Optional[str] = None,
+) -> DQN:
+    """Train with ``num_actors`` local actor processes (plus remote ones when ``listen`` is set).
+
+    ``env_fn`` must be picklable (e.g. a ``functools.partial`` of
+    ``train.make_env``); each actor calls it with its own seed.
+    """
+    listener = Listener(parse_address(listen), authkey=_authkey(authkey)) if listen else None
+    learner = Learner(model_kwargs, total_timesteps, sync_every, callback, listener)
+    ctx = mp.get_context("spawn")
+    processes = []
+    for actor_id in range(num_actors):
+        parent_conn, child_conn = ctx.Pipe()
+        seed = seeds[actor_id] if seeds is not None else None
+        process = ctx.Process(
+            target=run_actor,
+            args=(child_conn, actor_id, env_fn, model_kwargs, seed, send_every),
+            daemon=True,
+        )
+        process.start()
+        child_conn.close()
+        learner.add_connection(parent_conn)
+        processes.append(process)
+    try:
+        return learner.run()
+    finally:
+        for process in processes:
+            process.join(timeout=30)
+            if process.is_alive():
+                process.terminate()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Remote DQN actor: simulates locally, learns on the learner host.")
+    parser.add_argument("--connect", type=str, required=True, help="host:port del aprendiz (train.py --listen)")
+    parser.add_argument("--authkey", type=str, default=None, help=f"Clave compartida (default: ${AUTHKEY_ENV})")
+    parser.add_argument("--actor_id", type=int, required=True, help="Identificador único entre actores")
+    parser.add_argument("--sim_dir", type=str, default="./sumoData")
+    parser.add_argument("--output_dir", type=str, default="./metrics")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--backend", type=str, default="auto")
+    parser.add_argument("--send_every", type=int, default=DEFAULT_SEND_EVERY)
+    return parser.parse_args()
+
+
+def main() -> None:
+    import functools
+
+    from train import DQN_KWARGS, make_env
+
+    args = parse_args()
+    conn = Client(parse_address(args.connect), authkey=_authkey(args.authkey))
+    env_fn = functools.partial(make_env, args.sim_dir, args.output_dir, num_cpus=0, backend=args.backend)
+    run_actor(conn, args.actor_id, env_fn, DQN_KWARGS, args.seed, args.send_every)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,38 @@
+import functools
 import os
-from typing import Dict, List, Optional, Tuple, Union
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
 
 import supersuit as ss
 from stable_baselines3.common.vec_env import VecMonitor
-from sumo_rl import parallel_env
+from supersuit.vector import MakeCPUAsyncConstructor
+from supersuit.vector.sb3_vector_wrapper import SB3VecEnvWrapper
 
+from grouped import GroupedEnv
+from metrics_store import FORMATS as METRICS_FORMATS, install_npz_sink, write_manifest
+from profiling import instrument_env
 from reward import reward_function
+from snapshot_cache import DEFAULT_MAX_BYTES, WARMUP_SEED, SnapshotCache
+from sumo_backend import configure_backend
+
+
+# edgeData de intervalos cortos que sigue el LLMReporter (REPORTER_EDGEDATA).
+LIVE_EDGEDATA_ADDITIONAL = "live.add.xml"
+
+
+@dataclass(frozen=True)
+class EnvLayout:
+    """Agents of one SUMO instance and their unpadded sizes, as seen before supersuit padding."""
+
+    agent_ids: List[str]
+    obs_sizes: Dict[str, int]
+    action_sizes: Dict[str, int]
+    num_envs: int
+
+    @property
+    def slot_obs_sizes(self) -> List[int]:
+        """Unpadded observation length of every slot of the VecEnv (instance-major)."""
+        return [self.obs_sizes[agent] for agent in self.agent_ids] * self.num_envs
 
 
 def _resolve_route_file(sim_dir: str, preferred_route: Optional[str] = None) -> str:
@@ -19,6 +46,85 @@ def _resolve_route_file(sim_dir: str, preferred_route: Optional[str] = None) ->
     return os.path.join(sim_dir, "osm.passenger.trips.xml")
 
 
+def _per_instance(values: Optional[Sequence], num_envs: int, name: str) -> List:
+    """Expand an optional per-instance setting to exactly ``num_envs`` entries."""
+
+    if values is None:
+        return [None] * num_envs
+    values = list(values)
+    if len(values) != num_envs:
+        raise ValueError(f"Expected {num_envs} {name}, got {len(values)}")
+    return values
+
+
+def _instance_csv(output_csv: Optional[str], index: int, num_envs: int) -> Optional[str]:
+    # sumo-rl numera las conexiones por proceso, así que con varios workers todas
+    # serían "conn1"; el sufijo _envN evita que se pisen los CSV entre instancias.
+    if output_csv is None or num_envs == 1:
+        return output_csv
+    return f"{output_csv}_env{index}"
+
+
+def _sumo_environment(par_env):
+    """The ``SumoEnvironment`` behind sumo-rl's PettingZoo parallel wrapper."""
+
+    env = getattr(par_env, "unwrapped", par_env)
+    return getattr(env, "env", env)
+
+
+def _make_parallel_env(par_env_kwargs: Dict, backend: str, metrics_format: str = "csv"):
+    """Build one SUMO instance as sumo-rl's PettingZoo parallel env."""
+
+    configure_backend(backend, par_env_kwargs["use_gui"])
+    # sumo_rl fija el backend al importarse, por eso se importa aquí.
+    from sumo_rl import parallel_env
+
+    par_env = parallel_env(**par_env_kwargs)
+    if metrics_format == "npz":
+        install_npz_sink(_sumo_environment(par_env))
+    return par_env
+
+
+def _agent_layout(par_env, num_envs: int) -> EnvLayout:
+    agent_ids = list(par_env.possible_agents)
+    action_sizes: Dict[str, int] = {}
+    obs_sizes: Dict[str, int] = {}
+    for agent in agent_ids:
+        action_space = par_env.action_spaces[agent] if hasattr(par_env, "action_spaces") else par_env.action_spaces(agent)
+        action_sizes[agent] = getattr(action_space, "n", 1)
+        obs_space = par_env.observation_spaces[agent] if hasattr(par_env, "observation_spaces") else par_env.observation_space(agent)
+        obs_sizes[agent] = int(obs_space.shape[0])
+    return EnvLayout(agent_ids, obs_sizes, action_sizes, num_envs)
+
+
+def _make_markov_env(par_env_kwargs: Dict, backend: str, metrics_format: str = "csv",
+                     profile: Optional[Dict] = None):
+    """Build one SUMO instance and wrap it as a padded markov vector env.
+
+    ``profile`` holds the ``instrument_env`` arguments (every, log_path, source).
+    """
+
+    par_env = _make_parallel_env(par_env_kwargs, backend, metrics_format)
+    vec_env = ss.pad_observations_v0(par_env)
+    vec_env = ss.pad_action_space_v0(vec_env)
+    vec_env = ss.pettingzoo_env_to_vec_env_v1(vec_env)
+    if profile is not None:
+        instrument_env(_sumo_environment(par_env), vec_env, **profile)
+    return vec_env, par_env
+
+
+def _markov_vec_env(par_env_kwargs: Dict, backend: str, metrics_format: str = "csv",
+                    profile: Optional[Dict] = None):
+    return _make_markov_env(par_env_kwargs, backend, metrics_format, profile)[0]
+
+
+def _markov_env_fn(par_env_kwargs: Dict, backend: str, metrics_format: str = "csv",
+                   profile: Optional[Dict] = None) -> Callable:
+    """Return a picklable constructor so each worker builds its own SUMO."""
+
+    return functools.partial(_markov_vec_env, par_env_kwargs, backend, metrics_format, profile)
+
+
 def build_vec_env(
     sim_dir: str,
     output_csv: Optional[str] = None,
@@ -33,41 +139,189 @@ def build_vec_env(
     time_to_teleport: int = 300,
     route_file: Optional[str] = None,
     return_parallel_env: bool = False,
-) -> Union[VecMonitor, Tuple[VecMonitor, List[str], Dict[str, int]]]:
-    """Create the same SUMO RL environment stack used during training/eval."""
+    num_envs: int = 1,
+    num_cpus: Optional[int] = None,
+    seeds: Optional[Sequence[int]] = None,
+    route_files: Optional[Sequence[str]] = None,
+    backend: str = "auto",
+    warmup_seconds: int = 0,
+    snapshot_dir: Optional[str] = None,
+    snapshot_max_bytes: int = DEFAULT_MAX_BYTES,
+    metrics_format: str = "csv",
+    run_manifest: Optional[Dict] = None,
+    profile_every: int = 0,
+    profile_log: Optional[str] = None,
+    reward_fn: Union[str, Callable] = reward_function,
+    return_layout: bool = False,
+    grouped: bool = False,
+    live_edge_data: bool = False,
+) -> Union[VecMonitor, Tuple[VecMonitor, List[str], Dict[str, int]], Tuple[VecMonitor, EnvLayout], GroupedEnv]:
+    """Create the same SUMO RL environment stack used during training/eval.
+
+    With ``num_envs > 1`` a pool of independent SUMO instances is created, each
+    with its own seed, route file and CSV suffix. ``num_cpus`` is the number of
+    worker processes that step them (0 = in-process; default: one per instance,
+    or in-process when there is a single instance).
+    ``backend`` selects libsumo or TraCI (see ``sumo_backend``); 'auto' runs
+    SUMO in-process through libsumo whenever the GUI is off.
+
+    ``warmup_seconds > 0`` makes every reset load a cached SUMO state taken
+    after that many seconds of warm-up (stored under ``snapshot_dir``, default
+    ``<sim_dir>/.snapshots``) instead of replaying the warm-up from t=0. The
+    snapshot is keyed by seed, so instances without one get
+    ``snapshot_cache.WARMUP_SEED + i``.
+
+    ``metrics_format="npz"`` stores each episode's metrics as compressed
+    columns instead of CSV (see ``metrics_store``). Whenever ``output_csv`` is
+    set, ``<output_csv>_manifest.json`` records the run: ``run_manifest``
+    (e.g. model version) plus reward constants, seeds and routes.
+
+    ``reward_fn`` defaults to the custom ``reward.reward_function``; any
+    sumo-rl reward name (e.g. ``"diff-waiting-time"``) can be passed instead.
+
+    ``return_layout=True`` returns ``(vec_env, EnvLayout)`` with the unpadded
+    observation size of every agent (e.g. for ``CompactReplayBuffer``).
+
+    ``grouped=True`` skips the supersuit padding and returns a ``GroupedEnv``
+    (see ``grouped``): traffic lights bucketed by observation length and phase
+    count, stepped in-process on a single SUMO instance (``num_envs=1``).
+
+    ``profile_every > 0`` times each phase of the env step (see ``profiling``).
+    Worker processes append their interval records every ``profile_every``
+    env steps to ``<profile_log>_envN.jsonl``; in-process envs (``num_cpus=0``)
+    are reported by ``profiling_callback.ProfilingCallback`` instead.
+
+    ``live_edge_data=True`` loads ``<sim_dir>/live.add.xml`` into the first
+    instance, so SUMO writes ``<sim_dir>/edgeData_live.xml`` every 60 simulated
+    seconds for the LLMReporter (``REPORTER_EDGEDATA``). Only one instance
+    writes it: the reporter follows a single simulation.
+    """
+
+    if num_envs < 1:
+        raise ValueError("num_envs must be >= 1")
+    if num_cpus is None:
+        # Un solo SUMO no gana nada con un worker: solo el arranque y la IPC.
+        num_cpus = num_envs if num_envs > 1 else 0
+    if metrics_format not in METRICS_FORMATS:
+        raise ValueError(f"metrics_format must be one of {METRICS_FORMATS}, got {metrics_format!r}")
+    if grouped:
+        if num_envs != 1:
+            raise ValueError("grouped mode runs a single SUMO instance; use num_envs=1")
+        num_cpus = 0
+
+    backend = configure_backend(backend, use_gui)
+    envs_per_process = num_envs if num_cpus == 0 else -(-num_envs // num_cpus)
+    if backend == "libsumo" and envs_per_process > 1:
+        raise ValueError("libsumo allows a single SUMO instance per process; use num_cpus >= num_envs or backend='traci'")
 
     net_file = os.path.join(sim_dir, "TestLightsSogamosoNet.net.xml")
-    resolved_route = _resolve_route_file(sim_dir, route_file)
-
-    par_env = parallel_env(
-        net_file=net_file,
-        route_file=resolved_route,
-        out_csv_name=output_csv,
-        use_gui=use_gui,
-        num_seconds=num_seconds,
-        delta_time=delta_time,
-        min_green=min_green,
-        max_green=max_green,
-        fixed_ts=fixed_ts,
-        reward_fn=reward_function,
-        sumo_warnings=sumo_warnings,
-        time_to_teleport=time_to_teleport,
-        additional_sumo_cmd=additional_sumo_cmd,
+    instance_seeds = _per_instance(seeds, num_envs, "seeds")
+    instance_routes = _per_instance(route_files, num_envs, "route_files")
+
+    snapshots = None
+    if warmup_seconds > 0:
+        snapshots = SnapshotCache(snapshot_dir or os.path.join(sim_dir, ".snapshots"), snapshot_max_bytes)
+        if any(seed is None for seed in instance_seeds):
+            # Sin semilla el snapshot no se podría reutilizar; la derivada queda en el manifiesto.
+            instance_seeds = [WARMUP_SEED + i if seed is None else seed for i, seed in enumerate(instance_seeds)]
+            print(f"[snapshot] warm-up sin semilla: se usan las semillas {instance_seeds}")
+
+    env_fns = []
+    env_kwargs = []
+    profiles = []
+    for index in range(num_envs):
+        instance_route = _resolve_route_file(sim_dir, instance_routes[index] or route_file)
+        par_env_kwargs = dict(
+            net_file=net_file,
+            route_file=instance_route,
+            out_csv_name=_instance_csv(output_csv, index, num_envs),
+            use_gui=use_gui,
+            num_seconds=num_seconds,
+            delta_time=delta_time,
+            min_green=min_green,
+            max_green=max_green,
+            fixed_ts=fixed_ts,
+            reward_fn=reward_fn,
+            sumo_warnings=sumo_warnings,
+            time_to_teleport=time_to_teleport,
+            additional_sumo_cmd=additional_sumo_cmd,
+        )
+        if instance_seeds[index] is not None:
+            par_env_kwargs["sumo_seed"] = instance_seeds[index]
+        if snapshots is not None:
+            state_file = snapshots.get_or_create(
+                net_file,
+                instance_route,
+                warmup_seconds,
+                seed=instance_seeds[index],
+                time_to_teleport=time_to_teleport,
+                additional_sumo_cmd=additional_sumo_cmd,
+                backend=backend,
+            )
+            par_env_kwargs["begin_time"] = warmup_seconds
+            par_env_kwargs["additional_sumo_cmd"] = " ".join(
+                part for part in (additional_sumo_cmd, f"--load-state {state_file}") if part
+            )
+        if live_edge_data and index == 0:
+            # Fuera del comando del warm-up: el snapshot no depende de esta salida.
+            live_additional = os.path.join(sim_dir, LIVE_EDGEDATA_ADDITIONAL)
+            par_env_kwargs["additional_sumo_cmd"] = " ".join(
+                part for part in (par_env_kwargs["additional_sumo_cmd"], f"-a {live_additional}") if part
+            )
+        env_kwargs.append(par_env_kwargs)
+        profile = None
+        if profile_every > 0:
+            log_path = f"{profile_log}_env{index}.jsonl" if profile_log and num_cpus > 0 else None
+            profile = dict(every=profile_every, log_path=log_path, source=f"env{index}")
+        profiles.append(profile)
+        env_fns.append(_markov_env_fn(par_env_kwargs, backend, metrics_format, profile))
+
+    if output_csv is not None:
+        write_manifest(output_csv, {
+            **(run_manifest or {}),
+            "metrics_format": metrics_format,
+            "reward_fn": reward_fn if isinstance(reward_fn, str) else f"{reward_fn.__module__}.{reward_fn.__name__}",
+            "backend": backend,
+            "num_envs": num_envs,
+            "seeds": instance_seeds,
+            "route_files": [kwargs["route_file"] for kwargs in env_kwargs],
+            "num_seconds": num_seconds,
+            "delta_time": delta_time,
+            "min_green": min_green,
+            "max_green": max_green,
+            "fixed_ts": fixed_ts,
+            "warmup_seconds": warmup_seconds,
+            "live_edge_data": live_edge_data,
+        })
+
+    if grouped:
+        par_env = _make_parallel_env(env_kwargs[0], backend, metrics_format)
+        env = GroupedEnv(par_env, _agent_layout(par_env, num_envs))
+        if profiles[0] is not None:
+            instrument_env(_sumo_environment(par_env), env, **profiles[0])
+        return env
+
+    # La instancia de referencia se usa para leer espacios y agentes; cuando hay
+    # workers se cierra y cada proceso construye su propio SUMO con su env_fn.
+    reference_env, par_env = _make_markov_env(
+        env_kwargs[0], backend, metrics_format, profiles[0] if num_cpus == 0 else None
     )
+    layout = _agent_layout(par_env, num_envs)
+    observation_space = reference_env.observation_space
+    action_space = reference_env.action_space
 
-    agent_ids = list(par_env.possible_agents)
-    action_sizes: Dict[str, int] = {}
-    for agent in agent_ids:
-        action_space = par_env.action_spaces[agent] if hasattr(par_env, "action_spaces") else par_env.action_spaces(agent)
-        action_sizes[agent] = getattr(action_space, "n", 1)
+    if num_cpus == 0:
+        env_fns[0] = lambda: reference_env
+    else:
+        reference_env.close()
 
-    vec_env = ss.pad_observations_v0(par_env)
-    vec_env = ss.pad_action_space_v0(vec_env)
-    vec_env = ss.pettingzoo_env_to_vec_env_v1(vec_env)
-    vec_env = ss.concat_vec_envs_v1(vec_env, 1, num_cpus=1, base_class="stable_baselines3")
+    vec_env = MakeCPUAsyncConstructor(min(num_cpus, num_envs))(env_fns, observation_space, action_space)
+    vec_env = SB3VecEnvWrapper(vec_env)
     vec_env = VecMonitor(vec_env)
 
     if return_parallel_env:
-        return vec_env, agent_ids, action_sizes
+        return vec_env, layout.agent_ids, layout.action_sizes
+    if return_layout:
+        return vec_env, layout
 
     return vec_env
@@ -0,0 +1,261 @@
+"""Ejecución agrupada por forma de semáforo, sin padding.
+
+La pila normal (``build_vec_env``) pasa el entorno paralelo por
+``pad_observations_v0`` y ``pad_action_space_v0``: cada semáforo se infla a la
+observación y al número de fases del más grande, la red procesa ceros y la
+política elige fases que no existen (el orquestador las corrige con módulo).
+
+Aquí los semáforos se agrupan por (largo de observación, número de fases). Cada
+grupo tiene su propia DQN ("cabeza") que ve un arreglo compacto
+``(n_semáforos_del_grupo, obs_dim)`` y solo acciones válidas. Todos los grupos
+comparten un único SUMO (``build_vec_env(grouped=True)``); cada modelo se
+entrena con ``distributed.ExternalTrainer`` sobre un ``SpaceOnlyVecEnv`` con un
+sub-entorno por semáforo del grupo.
+"""
+import json
+import os
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from gymnasium import spaces
+from stable_baselines3 import DQN
+from stable_baselines3.common.callbacks import BaseCallback
+from stable_baselines3.common.utils import safe_mean
+
+from distributed import LOG_INTERVAL_S, ExternalTrainer, SpaceOnlyVecEnv
+
+GROUPS_FILE = "groups.json"
+# Parámetros contados en pasos de semáforo: cada grupo recibe su parte.
+_SCALED_KWARGS = ("buffer_size", "learning_starts", "target_update_interval")
+
+
+@dataclass(frozen=True)
+class AgentGroup:
+    """Traffic lights sharing one observation length and phase count."""
+
+    obs_dim: int
+    n_actions: int
+    agent_ids: Tuple[str, ...]
+    columns: Tuple[int, ...]  # posición de cada semáforo en el orden completo de agentes
+
+    @property
+    def name(self) -> str:
+        return f"obs{self.obs_dim}_act{self.n_actions}"
+
+    @property
+    def size(self) -> int:
+        return len(self.agent_ids)
+
+
+def group_agents(agent_ids: Sequence[str], obs_sizes: Dict[str, int], action_sizes: Dict[str, int]) -> List[AgentGroup]:
+    """Bucket ``agent_ids`` by (observation length, number of phases), keeping their order inside each group."""
+
+    buckets: Dict[Tuple[int, int], List[int]] = {}
+    for column, agent in enumerate(agent_ids):
+        buckets.setdefault((obs_sizes[agent], action_sizes[agent]), []).append(column)
+    return [
+        AgentGroup(obs_dim, n_actions, tuple(agent_ids[c] for c in columns), tuple(columns))
+        for (obs_dim, n_actions), columns in sorted(buckets.items())
+    ]
+
+
+class GroupedEnv:
+    """One SUMO instance exposed as one packed array per ``AgentGroup``.
+
+    ``reset`` and ``step`` return lists aligned with ``groups``: observations
+    ``(size, obs_dim)`` and rewards ``(size,)``; ``step`` takes one action array
+    per group. The episode ends for every traffic light at once; on the last
+    step ``info`` carries ``terminal_observation``, ``truncated`` and
+    ``episode`` (mean return per traffic light, like ``VecMonitor``) and the
+    env is reset automatically.
+    """
+
+    def __init__(self, par_env, layout):
+        self.par_env = par_env
+        self.layout = layout
+        self.agent_ids = list(layout.agent_ids)
+        self.groups = group_agents(self.agent_ids, layout.obs_sizes, layout.action_sizes)
+        self.observation_spaces = [self._observation_space(group) for group in self.groups]
+        self.action_spaces = [spaces.Discrete(group.n_actions) for group in self.groups]
+        self._last_obs: Dict[str, np.ndarray] = {}
+        self._episode_return = 0.0
+        self._episode_length = 0
+
+    def _observation_space(self, group: AgentGroup) -> spaces.Box:
+        agent = group.agent_ids[0]
+        space = self.par_env.observation_spaces[agent] if hasattr(self.par_env, "observation_spaces") else self.par_env.observation_space(agent)
+        return spaces.Box(low=space.low, high=space.high, shape=(group.obs_dim,), dtype=np.float32)
+
+    def _pack(self, obs: Dict[str, np.ndarray]) -> List[np.ndarray]:
+        # Un semáforo sin observación nueva conserva la última.
+        self._last_obs.update(obs)
+        return [np.stack([self._last_obs[agent] for agent in group.agent_ids]).astype(np.float32) for group in self.groups]
+
+    def reset(self, seed: Optional[int] = None) -> List[np.ndarray]:
+        result = self.par_env.reset(seed=seed)
+        obs = result[0] if isinstance(result, tuple) else result
+        self._last_obs = {}
+        self._episode_return = 0.0
+        self._episode_length = 0
+        return self._pack(obs)
+
+    def scatter(self, group_actions: Sequence[np.ndarray]) -> np.ndarray:
+        """Per-group actions -> one ``(n_agents,)`` vector in ``agent_ids`` order."""
+
+        actions = np.zeros(len(self.agent_ids), dtype=np.int64)
+        for group, group_action in zip(self.groups, group_actions):
+            actions[list(group.columns)] = np.asarray(group_action).reshape(group.size)
+        return actions
+
+    def gather(self, actions: np.ndarray) -> List[np.ndarray]:
+        """``(n_agents,)`` vector -> per-group actions, wrapped into each group's phase count.
+
+        Policy actions are always valid; the modulo only matters for phases set
+        from outside (e.g. ``RegionalCoordinator`` overrides).
+        """
+
+        actions = np.asarray(actions, dtype=np.int64)
+        return [actions[list(group.columns)] % group.n_actions for group in self.groups]
+
+    def step(self, group_actions: Sequence[np.ndarray]) -> Tuple[List[np.ndarray], List[np.ndarray], bool, Dict]:
+        full = self.scatter(group_actions)
+        live = set(self.par_env.agents)
+        actions = {agent: int(full[column]) for column, agent in enumerate(self.agent_ids) if agent in live}
+        obs, rewards, terminations, truncations, infos = self.par_env.step(actions)
+
+        packed_rewards = [
+            np.array([rewards.get(agent, 0.0) for agent in group.agent_ids], dtype=np.float32) for group in self.groups
+        ]
+        packed_obs = self._pack(obs)
+        terminated = any(terminations.get(agent, False) for agent in self.agent_ids)
+        truncated = any(truncations.get(agent, False) for agent in self.agent_ids)
+        done = terminated or truncated or not self.par_env.agents
+        # sumo-rl repite el mismo info de sistema en cada agente.
+        info = dict(next((infos[agent] for agent in self.agent_ids if infos.get(agent)), {}))
+
+        self._episode_return += float(sum(float(r.sum()) for r in packed_rewards)) / len(self.agent_ids)
+        self._episode_length += 1
+        if done:
+            info["terminal_observation"] = packed_obs
+            info["truncated"] = truncated and not terminated
+            info["episode"] = {"r": self._episode_return, "l": self._episode_length}
+            packed_obs = self.reset()
+        return packed_obs, packed_rewards, done, info
+
+    def close(self) -> None:
+        self.par_env.close()
+
+
+class GroupedPolicy:
+    """One DQN per ``AgentGroup``; a forward pass per group on its packed observations."""
+
+    def __init__(self, groups: Sequence[AgentGroup], models: Sequence[DQN]):
+        if len(groups) != len(models):
+            raise ValueError(f"Expected one model per group ({len(groups)}), got {len(models)}")
+        self.groups = list(groups)
+        self.models = list(models)
+
+    def predict(self, group_obs: Sequence[np.ndarray], deterministic: bool = True) -> List[np.ndarray]:
+        return [model.predict(obs, deterministic=deterministic)[0] for model, obs in zip(self.models, group_obs)]
+
+    def save(self, path: str) -> None:
+        """Write one ``<group>.zip`` per group plus ``groups.json`` under the directory ``path``."""
+
+        os.makedirs(path, exist_ok=True)
+        for group, model in zip(self.groups, self.models):
+            model.save(os.path.join(path, group.name))
+        with open(os.path.join(path, GROUPS_FILE), "w", encoding="utf-8") as f:
+            json.dump([
+                {"name": group.name, "obs_dim": group.obs_dim, "n_actions": group.n_actions,
+                 "agent_ids": list(group.agent_ids)}
+                for group in self.groups
+            ], f, indent=2)
+
+    @classmethod
+    def load(cls, path: str, groups: Sequence[AgentGroup], device: str = "auto") -> "GroupedPolicy":
+        """Load the models saved in ``path`` for the ``groups`` of the current env (must match)."""
+
+        with open(os.path.join(path, GROUPS_FILE), "r", encoding="utf-8") as f:
+            saved = json.load(f)
+        expected = [{"name": g.name, "obs_dim": g.obs_dim, "n_actions": g.n_actions, "agent_ids": list(g.agent_ids)}
+                    for g in groups]
+        if saved != expected:
+            raise ValueError(f"Groups saved in {path} do not match the current network")
+        models = [DQN.load(os.path.join(path, f"{group.name}.zip"), device=device) for group in groups]
+        return cls(groups, models)
+
+
+def _group_kwargs(model_kwargs: Dict, share: float) -> Dict:
+    kwargs = dict(model_kwargs)
+    if "replay_buffer_kwargs" in kwargs:
+        # Cada modelo con su propio dict: SB3 o el buffer podrían modificarlo.
+        kwargs["replay_buffer_kwargs"] = dict(kwargs["replay_buffer_kwargs"])
+    for key in _SCALED_KWARGS:
+        if key in kwargs:
+            kwargs[key] = max(int(kwargs[key] * share), 1)
+    return kwargs
+
+
+def train_grouped(
+    env: GroupedEnv,
+    model_kwargs: Dict,
+    total_timesteps: int,
+    callback_fn: Optional[Callable[[AgentGroup], Optional[BaseCallback]]] = None,
+    verbose: int = 1,
+) -> GroupedPolicy:
+    """Train one DQN per group on the shared SUMO of ``env``.
+
+    ``total_timesteps`` counts traffic-light steps like ``DQN.learn`` on the
+    padded env. Each group gets its share of it (and of buffer size,
+    ``learning_starts`` and ``target_update_interval``) in proportion to its
+    number of traffic lights, so every model follows the same schedule per
+    simulation step. ``callback_fn(group)`` builds each model's callback.
+    """
+
+    n_agents = len(env.agent_ids)
+    models: List[DQN] = []
+    trainers: List[ExternalTrainer] = []
+    for group, observation_space, action_space in zip(env.groups, env.observation_spaces, env.action_spaces):
+        share = group.size / n_agents
+        model = DQN("MlpPolicy", SpaceOnlyVecEnv(group.size, observation_space, action_space), verbose=verbose,
+                    **_group_kwargs(model_kwargs, share))
+        callback = callback_fn(group) if callback_fn is not None else None
+        trainers.append(ExternalTrainer(model, int(total_timesteps * share), callback))
+        models.append(model)
+        if verbose:
+            print(f"[grouped] {group.name}: {group.size} semáforos")
+
+    obs = env.reset()
+    last_log = time.perf_counter()
+    while not all(trainer.done for trainer in trainers):
+        actions = []
+        for model, group_obs in zip(models, obs):
+            # Mismo epsilon-greedy que DQN.learn (acciones aleatorias antes de learning_starts).
+            model._last_obs = group_obs
+            group_actions, _ = model._sample_action(model.learning_starts, None, group_obs.shape[0])
+            actions.append(group_actions)
+        new_obs, rewards, done, info = env.step(actions)
+
+        next_obs = info["terminal_observation"] if done else new_obs
+        for index, (group, trainer) in enumerate(zip(env.groups, trainers)):
+            if trainer.done:
+                continue
+            dones = np.full(group.size, done)
+            truncated = np.full(group.size, done and info.get("truncated", False))
+            trainer.add(obs[index], next_obs[index], actions[index], rewards[index], dones, truncated)
+        if "episode" in info:
+            for model in models:
+                model.ep_info_buffer.extend([info["episode"]])
+        obs = new_obs
+
+        if verbose and time.perf_counter() - last_log >= LOG_INTERVAL_S:
+            last_log = time.perf_counter()
+            steps = sum(model.num_timesteps for model in models)
+            rewards_mean = safe_mean([ep["r"] for ep in models[0].ep_info_buffer]) if models[0].ep_info_buffer else float("nan")
+            print(f"[grouped] {steps}/{total_timesteps} pasos | ep_rew_mean {rewards_mean:.2f}")
+
+    for trainer in trainers:
+        trainer.close()
+    return GroupedPolicy(env.groups, models)
@@ -0,0 +1,165 @@
+"""Lectura incremental de los CSV de métricas por episodio.
+
+Solo se leen las columnas pedidas, por bloques de filas, y de cada episodio
+se guardan agregados pequeños (suma, conteo, mínimo, máximo por columna) en un
+índice JSON junto a los CSV (``.metrics_index.json``). Una entrada se reutiliza
+mientras el archivo conserve su ``mtime`` y tamaño, así que volver a graficar
+un entrenamiento largo solo procesa los episodios nuevos. Los episodios
+pendientes se procesan en paralelo.
+
+Los episodios ``.npz`` (``metrics_format="npz"``, ver ``metrics_store.py``) se
+leen columna a columna sin pasar por el parser de texto.
+"""
+import json
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence
+
+import pandas as pd
+
+from metrics_store import read_metrics
+
+INDEX_NAME = ".metrics_index.json"
+INDEX_VERSION = 1
+CHUNK_ROWS = 2048
+
+
+def _file_key(path: str) -> Dict[str, int]:
+    st = os.stat(path)
+    return {"mtime_ns": st.st_mtime_ns, "size": st.st_size}
+
+
+def load_columns(path: str, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    """Read only ``columns`` (names are whitespace-stripped) of a metrics CSV or ``.npz``."""
+    return read_metrics(path, columns)
+
+
+def episode_stats(path: str, columns: Sequence[str], chunk_rows: int = CHUNK_ROWS) -> Dict[str, Dict[str, float]]:
+    """Sum/count/min/max of each column present in the file, streaming ``chunk_rows`` CSV rows at a time."""
+    wanted = set(columns)
+    stats: Dict[str, Dict[str, float]] = {}
+    if path.endswith(".npz"):
+        chunks = [read_metrics(path, columns)]
+    else:
+        chunks = pd.read_csv(path, usecols=lambda col: col.strip() in wanted, chunksize=chunk_rows)
+    for chunk in chunks:
+        chunk.rename(columns=lambda col: col.strip(), inplace=True)
+        for col in chunk.columns:
+            values = pd.to_numeric(chunk[col], errors="coerce").dropna()
+            if values.empty:
+                continue
+            acc = stats.setdefault(col, {"sum": 0.0, "count": 0, "min": float("inf"), "max": float("-inf")})
+            acc["sum"] += float(values.sum())
+            acc["count"] += int(values.size)
+            acc["min"] = min(acc["min"], float(values.min()))
+            acc["max"] = max(acc["max"], float(values.max()))
+    return stats
+
+
+def _episode_stats_job(args):
+    path, columns, chunk_rows = args
+    return path, episode_stats(path, columns, chunk_rows)
+
+
+class EpisodeSummary:
+    """Aggregates of one episode CSV, as loaded from the index."""
+
+    def __init__(self, path: str, stats: Dict[str, Dict[str, float]]):
+        self.path = path
+        self.stats = stats
+
+    def sum(self, column: str) -> float:
+        return self.stats[column]["sum"]
+
+    def mean(self, column: str) -> float:
+        acc = self.stats[column]
+        return acc["sum"] / acc["count"] if acc["count"] else float("nan")
+
+    def min(self, column: str) -> float:
+        return self.stats[column]["min"]
+
+    def max(self, column: str) -> float:
+        return self.stats[column]["max"]
+
+    def rows(self, column: str) -> int:
+        return int(self.stats[column]["count"])
+
+
+class MetricsIndex:
+    """Per-episode aggregates cached in a sidecar JSON next to the CSVs."""
+
+    def __init__(self, directory: str, index_name: str = INDEX_NAME):
+        self.directory = directory
+        self.path = os.path.join(directory, index_name)
+        self._entries: Dict[str, dict] = self._read()
+        self.recomputed = 0
+
+    def _read(self) -> Dict[str, dict]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return data.get("episodes", {}) if data.get("version") == INDEX_VERSION else {}
+
+    def _write(self) -> None:
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=".metrics_index.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"version": INDEX_VERSION, "episodes": self._entries}, f)
+            os.replace(tmp, self.path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    def _is_fresh(self, path: str, columns: Sequence[str]) -> bool:
+        entry = self._entries.get(os.path.basename(path))
+        if entry is None or entry["file"] != _file_key(path):
+            return False
+        # Columnas pedidas antes (presentes o no en el CSV) cubren la consulta actual.
+        return set(columns) <= set(entry["columns"])
+
+    def summaries(
+        self,
+        files: Sequence[str],
+        columns: Sequence[str],
+        workers: Optional[int] = None,
+        chunk_rows: int = CHUNK_ROWS,
+    ) -> List[EpisodeSummary]:
+        """Summaries for ``files`` in the given order; only new or modified files are read."""
+        stale = [f for f in files if not self._is_fresh(f, columns)]
+        if stale:
+            # Al recalcular se conservan las columnas ya indexadas para no perderlas.
+            jobs = []
+            for f in stale:
+                previous = self._entries.get(os.path.basename(f), {}).get("columns", [])
+                jobs.append((f, sorted(set(columns) | set(previous)), chunk_rows))
+            workers = workers if workers is not None else min(len(jobs), os.cpu_count() or 1)
+            if workers > 1 and len(jobs) > 1:
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    results = list(pool.map(_episode_stats_job, jobs))
+            else:
+                results = [_episode_stats_job(job) for job in jobs]
+            for (path, stats), (_path, cols, _chunk) in zip(results, jobs):
+                self._entries[os.path.basename(path)] = {"file": _file_key(path), "columns": cols, "stats": stats}
+            self.recomputed += len(stale)
+            self._write()
+        return [EpisodeSummary(f, self._entries[os.path.basename(f)]["stats"]) for f in files]
+
+
+def summarize_episodes(
+    files: Sequence[str],
+    columns: Sequence[str],
+    workers: Optional[int] = None,
+) -> List[EpisodeSummary]:
+    """Summaries for episode CSVs, grouped by directory so each uses its own index."""
+    by_dir: Dict[str, List[str]] = {}
+    for f in files:
+        by_dir.setdefault(os.path.dirname(os.path.abspath(f)), []).append(f)
+    found: Dict[str, EpisodeSummary] = {}
+    for directory, dir_files in by_dir.items():
+        for summary in MetricsIndex(directory).summaries(dir_files, columns, workers):
+            found[summary.path] = summary
+    return [found[f] for f in files]
@@ -0,0 +1,161 @@
+"""Métricas de episodio en formato binario columnar (``.npz`` comprimido).
+
+sumo-rl escribe un CSV ancho de texto por episodio (``save_csv``). Con
+``build_vec_env(metrics_format="npz")`` ese método se reemplaza en cada
+``SumoEnvironment`` por uno que guarda cada columna como un arreglo NumPy
+comprimido, con el mismo nombre de archivo pero extensión ``.npz``. Junto a
+los episodios se escribe ``<out_csv_name>_manifest.json`` con la versión del
+modelo, la configuración de recompensa y las semillas de la corrida.
+
+Lectura (sirve para ``.npz`` y ``.csv``)::
+
+    from metrics_store import read_metrics, find_episodes
+    df = read_metrics("metrics/resultados_train_conn1_ep3.npz", ["step", "system_mean_speed"])
+
+Conversión opcional a CSV::
+
+    python metrics_store.py export metrics/resultados_train_conn1_ep*.npz
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import tempfile
+import time
+import types
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+import reward
+
+FORMATS = ("csv", "npz")
+EPISODE_EXTENSIONS = (".npz", ".csv")
+MANIFEST_SUFFIX = "_manifest.json"
+_STEP_COLUMN = "step"
+
+
+def reward_config() -> Dict[str, float]:
+    """Constants of the custom reward, recorded so runs stay comparable."""
+    return {
+        "function": f"{reward.reward_function.__module__}.{reward.reward_function.__name__}",
+        "max_wait_threshold": reward.MAX_WAIT_THRESHOLD,
+        "max_wait_penalty": reward.MAX_WAIT_PENALTY,
+        "reward_scale": reward.REWARD_SCALE,
+    }
+
+
+def _atomic_write(path: str, write) -> None:
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def write_manifest(out_csv_name: str, manifest: Dict) -> str:
+    path = out_csv_name + MANIFEST_SUFFIX
+    body = {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "reward": reward_config(), **manifest}
+    _atomic_write(path, lambda f: f.write(json.dumps(body, indent=2, default=str).encode("utf-8")))
+    return path
+
+
+def load_manifest(path: str) -> Optional[Dict]:
+    """Manifest for an episode file or run prefix (``None`` if the run has none)."""
+    candidates = [path + MANIFEST_SUFFIX] if not path.endswith(EPISODE_EXTENSIONS) else []
+    stem = os.path.splitext(path)[0]
+    if "_conn" in stem:
+        prefix = stem.rsplit("_conn", 1)[0]
+        candidates.append(prefix + MANIFEST_SUFFIX)
+        # Con varias instancias el prefijo lleva _envN (ver env_factory._instance_csv).
+        candidates.append(re.sub(r"_env\d+$", "", prefix) + MANIFEST_SUFFIX)
+    for candidate in candidates:
+        if os.path.exists(candidate):
+            with open(candidate, "r", encoding="utf-8") as f:
+                return json.load(f)
+    return None
+
+
+def write_episode(path: str, rows: Sequence[Dict[str, float]]) -> None:
+    """Store the per-step metric dicts of one episode as compressed columns."""
+    columns = dict.fromkeys(key for row in rows for key in row)
+    arrays = {
+        key: np.asarray([row.get(key, np.nan) for row in rows], dtype=np.float64) for key in columns
+    }
+    _atomic_write(path, lambda f: np.savez_compressed(f, **arrays))
+
+
+def _save_npz(self, out_csv_name, episode):
+    """Drop-in for ``SumoEnvironment.save_csv`` that writes ``.npz`` instead."""
+    if out_csv_name is not None:
+        write_episode(f"{out_csv_name}_conn{self.label}_ep{episode}.npz", self.metrics)
+
+
+def install_npz_sink(sumo_env) -> None:
+    """Make one ``SumoEnvironment`` save its episode metrics as ``.npz``."""
+    sumo_env.save_csv = types.MethodType(_save_npz, sumo_env)
+
+
+def read_metrics(path: str, columns: Optional[Iterable[str]] = None) -> pd.DataFrame:
+    """Episode metrics from ``.npz`` or ``.csv``; only ``columns`` are read when given."""
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Metrics file not found: {path}")
+    wanted = list(columns) if columns is not None else None
+    if path.endswith(".npz"):
+        with np.load(path, allow_pickle=False) as z:
+            names = z.files if wanted is None else [c for c in wanted if c in z.files]
+            return pd.DataFrame({name: z[name] for name in names})
+    keep = set(wanted) if wanted is not None else None
+    df = pd.read_csv(path, usecols=(lambda col: col.strip() in keep) if keep is not None else None)
+    df.rename(columns=lambda col: col.strip(), inplace=True)
+    return df
+
+
+def find_episodes(directory: str, pattern: str = "*conn*") -> List[str]:
+    """Episode files in ``directory``; when both formats exist for an episode the ``.npz`` wins."""
+    found: Dict[str, str] = {}
+    for ext in reversed(EPISODE_EXTENSIONS):
+        for path in glob.glob(os.path.join(directory, pattern + ext)):
+            found[os.path.splitext(path)[0]] = path
+    return list(found.values())
+
+
+def export_csv(path: str, csv_path: Optional[str] = None) -> str:
+    """Convert an ``.npz`` episode to the CSV layout sumo-rl would have written."""
+    csv_path = csv_path or os.path.splitext(path)[0] + ".csv"
+    df = read_metrics(path)
+    if _STEP_COLUMN in df.columns:
+        df = df[[_STEP_COLUMN] + [c for c in df.columns if c != _STEP_COLUMN]]
+    df.to_csv(csv_path, index=False)
+    return csv_path
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Utilities for binary episode metrics.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export = sub.add_parser("export", help="Convert .npz episodes to CSV.")
+    export.add_argument("files", nargs="+")
+    show = sub.add_parser("manifest", help="Print the run manifest of an episode or run prefix.")
+    show.add_argument("path")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    if args.command == "export":
+        for path in args.files:
+            print(export_csv(path))
+    else:
+        print(json.dumps(load_manifest(args.path), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,16 @@
-import pandas as pd
 import matplotlib.pyplot as plt
-import glob
-import os
 import re
 
+from metrics_loader import summarize_episodes
+from metrics_store import find_episodes
+
 def natural_sort_key(s):
     """Ordena archivos numéricamente (ep1, ep2, ep10...) en lugar de texto (ep1, ep10, ep2)"""
     return [int(text) if text.isdigit() else text.lower() for text in re.split('([0-9]+)', s)]
 
-def plot_learning_curve(results_dir="resultados_sumo_rl"):
-    pattern = os.path.join(results_dir, "*conn*.csv")
-    files = glob.glob(pattern)
+def plot_learning_curve(results_dir="resultados_sumo_rl", workers=None):
+    # CSV o .npz (metrics_format="npz"); si existen ambos se usa el .npz.
+    files = find_episodes(results_dir)
     
     if not files:
         print("No encontré archivos CSV. Revisa la ruta.")
@@ -24,11 +24,11 @@ def plot_learning_curve(results_dir="resultados_sumo_rl"):
     
     print(f"Procesando {len(files)} episodios...")
 
-    for f in files:
-        df = pd.read_csv(f)
-        rewards.append(df['system_total_waiting_time'].sum() * -1) 
-        waiting_times.append(df['system_total_waiting_time'].mean())
-        speeds.append(df['system_mean_speed'].mean())
+    # Solo se leen los episodios nuevos o modificados; el resto sale del índice.
+    for summary in summarize_episodes(files, ['system_total_waiting_time', 'system_mean_speed'], workers):
+        rewards.append(summary.sum('system_total_waiting_time') * -1)
+        waiting_times.append(summary.mean('system_total_waiting_time'))
+        speeds.append(summary.mean('system_mean_speed'))
 
     fig, axs = plt.subplots(3, 1, figsize=(10, 12))
     
@@ -1,10 +1,13 @@
 import argparse
 import os
-from typing import Dict, List, Optional
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
 
 import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
 
+from metrics_loader import load_columns
+
 
 METRICS = [
     ("system_mean_speed", "System Mean Speed (m/s)"),
@@ -13,56 +16,55 @@ METRICS = [
 ]
 
 
-def load_csv(path: str) -> pd.DataFrame:
-    if not os.path.exists(path):
-        raise FileNotFoundError(f"CSV file not found: {path}")
-    df = pd.read_csv(path)
-    df.rename(columns=lambda col: col.strip(), inplace=True)
+def load_csv(path: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """Load ``step`` plus ``columns`` (default: the plotted METRICS) from a metrics CSV."""
+    if columns is None:
+        columns = [metric for metric, _title in METRICS]
+    df = load_columns(path, ["step", *columns])
     if "step" in df.columns:
         df["step"] = pd.to_numeric(df["step"], errors="coerce")
     return df
 
 
+def _finish(fig, output_path: Optional[str], what: str) -> None:
+    if output_path:
+        output_dir = os.path.dirname(output_path) or "."
+        os.makedirs(output_dir, exist_ok=True)
+        fig.savefig(output_path, dpi=150)
+        print(f"{what} saved to: {output_path}")
+        plt.close(fig)
+    else:
+        plt.show()
+
+
 def plot_comparison(
-    baseline_df: pd.DataFrame,
-    orchestrator_df: pd.DataFrame,
-    evaluation_df: Optional[pd.DataFrame],
-    labels: Dict[str, str],
+    runs: Mapping[str, pd.DataFrame],
     output_path: Optional[str] = None,
 ) -> None:
+    """One panel per metric with a line per run (label -> DataFrame with ``step``).
+
+    When a DataFrame also has ``<metric>_lo``/``<metric>_hi`` columns (the
+    confidence band produced by ``run_compare``), the band is shaded.
+    """
     fig, axes = plt.subplots(len(METRICS), 1, figsize=(10, 12), sharex=True)
     step_col = "step"
+    colors = plt.get_cmap("tab10" if len(runs) <= 10 else "tab20")
 
     for ax, (metric, title) in zip(axes, METRICS):
         has_data = False
 
-        if metric in baseline_df.columns:
-            ax.plot(
-                baseline_df[step_col],
-                baseline_df[metric],
-                label=labels["baseline"],
-                color="#1f77b4",
-            )
-            has_data = True
-        if metric in orchestrator_df.columns:
-            ax.plot(
-                orchestrator_df[step_col],
-                orchestrator_df[metric],
-                label=labels["orchestrator"],
-                color="#d62728",
-            )
-            has_data = True
-        if evaluation_df is not None and metric in evaluation_df.columns:
-            ax.plot(
-                evaluation_df[step_col],
-                evaluation_df[metric],
-                label=labels["evaluation"],
-                color="#2ca02c",
-            )
+        for i, (label, df) in enumerate(runs.items()):
+            if metric not in df.columns:
+                continue
+            color = colors(i % colors.N)
+            ax.plot(df[step_col], df[metric], label=label, color=color)
+            lo, hi = f"{metric}_lo", f"{metric}_hi"
+            if lo in df.columns and hi in df.columns and df[lo].notna().any():
+                ax.fill_between(df[step_col], df[lo], df[hi], color=color, alpha=0.2, linewidth=0)
             has_data = True
 
         if not has_data:
-            ax.set_title(f"{title} (missing in both CSVs)")
+            ax.set_title(f"{title} (missing in every run)")
             continue
 
         ax.set_ylabel(title)
@@ -71,14 +73,32 @@ def plot_comparison(
 
     axes[-1].set_xlabel("Simulation Step (s)")
     fig.tight_layout()
+    _finish(fig, output_path, "Comparison plot")
 
-    if output_path:
-        output_dir = os.path.dirname(output_path) or "."
-        os.makedirs(output_dir, exist_ok=True)
-        fig.savefig(output_path, dpi=150)
-        print(f"Comparison plot saved to: {output_path}")
-    else:
-        plt.show()
+
+def plot_summary(
+    summary: pd.DataFrame,
+    metrics: Sequence[Tuple[str, str]],
+    output_path: Optional[str] = None,
+) -> None:
+    """Bar chart per summary metric (rows = runs) with ``<metric>_ci95`` error bars."""
+    fig, axes = plt.subplots(len(metrics), 1, figsize=(max(8, 0.6 * len(summary) + 4), 3.2 * len(metrics)))
+    axes = np.atleast_1d(axes)
+    positions = np.arange(len(summary))
+    for ax, (metric, title) in zip(axes, metrics):
+        if metric not in summary.columns or summary[metric].isna().all():
+            ax.set_title(f"{title} (no data)")
+            ax.set_xticks([])
+            continue
+        errors = summary.get(f"{metric}_ci95")
+        ax.bar(positions, summary[metric], yerr=None if errors is None else errors.fillna(0), capsize=3,
+               color="#1f77b4")
+        ax.set_title(title)
+        ax.set_xticks(positions)
+        ax.set_xticklabels(summary.index, rotation=45, ha="right")
+        ax.grid(True, axis="y", linestyle="--", linewidth=0.5, alpha=0.7)
+    fig.tight_layout()
+    _finish(fig, output_path, "Summary plot")
 
 
 def parse_args() -> argparse.Namespace:
@@ -125,12 +145,12 @@ def main() -> None:
     if args.evaluation:
         evaluation_df = load_csv(args.evaluation)
 
-    labels = {"baseline": "Baseline", "orchestrator": "Orchestrator"}
+    runs: Dict[str, pd.DataFrame] = {"Baseline": baseline_df, "Orchestrator": orchestrator_df}
     if evaluation_df is not None:
-        labels["evaluation"] = "Evaluation"
+        runs["Evaluation"] = evaluation_df
     output_path = None if args.show else args.output
 
-    plot_comparison(baseline_df, orchestrator_df, evaluation_df, labels, output_path)
+    plot_comparison(runs, output_path)
 
 
 if __name__ == "__main__":
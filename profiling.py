@@ -0,0 +1,242 @@
+"""Temporizadores por fase, baratos como para dejarlos activos en producción.
+
+Cada fase acumula conteo, tiempo total, máximo y un histograma logarítmico fijo
+(``BINS_PER_DECADE`` bins por década entre 1 µs y 100 s), así que registrar una
+medición cuesta un ``perf_counter`` y unas pocas operaciones aritméticas, sin
+guardar muestras. Cada ``every`` pasos el intervalo se vuelca como una línea
+JSON y los contadores vuelven a cero.
+
+Lado entorno (``instrument_env``, activado con ``build_vec_env(profile_every=N)``):
+
+* ``env.step``: paso completo del entorno vectorizado de un SUMO.
+* ``env.wrappers``: lo que agregan supersuit/PettingZoo (padding) sobre sumo-rl,
+  es decir ``env.step`` menos las fases ``sumo.*`` ocurridas dentro de ese paso.
+* ``sumo.actions``, ``sumo.simulation``, ``sumo.observations``,
+  ``sumo.rewards`` (incluye las consultas TraCI de ``reward_function``),
+  ``sumo.info``, ``sumo.reset`` y ``sumo.metrics_io``.
+
+Cada proceso worker escribe su propio ``<profile_log>_envN.jsonl``. Lado
+aprendiz ver ``profiling_callback.ProfilingCallback``.
+"""
+import json
+import math
+import os
+import time
+from typing import Callable, Dict, List, Optional
+
+BINS_PER_DECADE = 16
+MIN_EXPONENT = -6  # 1 µs
+MAX_EXPONENT = 2  # 100 s
+NUM_BINS = (MAX_EXPONENT - MIN_EXPONENT) * BINS_PER_DECADE
+
+_SUMO_PHASES = (
+    ("_apply_actions", "sumo.actions"),
+    ("_sumo_step", "sumo.simulation"),
+    ("_compute_observations", "sumo.observations"),
+    ("_compute_rewards", "sumo.rewards"),
+    ("_compute_info", "sumo.info"),
+    ("reset", "sumo.reset"),
+    ("save_csv", "sumo.metrics_io"),
+)
+
+
+def bin_index(seconds: float) -> int:
+    if seconds <= 0:
+        return 0
+    index = int((math.log10(seconds) - MIN_EXPONENT) * BINS_PER_DECADE)
+    return min(max(index, 0), NUM_BINS - 1)
+
+
+def bin_upper_edge(index: int) -> float:
+    """Upper bound (seconds) of histogram bin ``index``."""
+    return 10.0 ** (MIN_EXPONENT + (index + 1) / BINS_PER_DECADE)
+
+
+class PhaseStats:
+    __slots__ = ("count", "total", "max", "hist")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.hist = [0] * NUM_BINS
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.hist[bin_index(seconds)] += 1
+
+    def percentile(self, q: float) -> float:
+        """Approximate ``q``-th percentile (seconds), read off the histogram."""
+        if not self.count:
+            return 0.0
+        target = q / 100.0 * self.count
+        seen = 0
+        for index, n in enumerate(self.hist):
+            seen += n
+            if n and seen >= target:
+                return min(bin_upper_edge(index), self.max)
+        return self.max
+
+    def summary(self) -> Dict:
+        return {
+            "count": self.count,
+            "total_s": self.total,
+            "mean_ms": self.total / self.count * 1e3 if self.count else 0.0,
+            "p50_ms": self.percentile(50) * 1e3,
+            "p95_ms": self.percentile(95) * 1e3,
+            "max_ms": self.max * 1e3,
+            # Histograma disperso {bin: conteo}; el borde superior es bin_upper_edge(bin).
+            "hist": {str(i): n for i, n in enumerate(self.hist) if n},
+        }
+
+
+class PhaseTimer:
+    """Per-phase wall-time histograms for one process/component, reset at every emit."""
+
+    def __init__(self, source: str) -> None:
+        self.source = source
+        self.phases: Dict[str, PhaseStats] = {}
+        self.steps = 0
+        self._interval_start = time.perf_counter()
+
+    def add(self, phase: str, seconds: float) -> None:
+        stats = self.phases.get(phase)
+        if stats is None:
+            stats = self.phases[phase] = PhaseStats()
+        stats.add(seconds)
+
+    def wrap(self, phase: str, fn: Callable) -> Callable:
+        """``fn`` with every call timed under ``phase``."""
+        perf_counter = time.perf_counter
+
+        def timed(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.add(phase, perf_counter() - start)
+
+        timed.__wrapped__ = fn
+        return timed
+
+    def snapshot(self, reset: bool = True) -> Dict:
+        """Interval record: wall time, steps/sec and the summary of every phase."""
+        now = time.perf_counter()
+        wall = now - self._interval_start
+        record = {
+            "source": self.source,
+            "pid": os.getpid(),
+            "time": time.time(),
+            "wall_s": wall,
+            "steps": self.steps,
+            "steps_per_sec": self.steps / wall if wall > 0 else 0.0,
+            "phases": {},
+        }
+        for phase, stats in self.phases.items():
+            summary = stats.summary()
+            summary["share"] = stats.total / wall if wall > 0 else 0.0
+            record["phases"][phase] = summary
+        if reset:
+            self.phases = {}
+            self.steps = 0
+            self._interval_start = now
+        return record
+
+
+class JsonlWriter:
+    """Append one JSON object per line; the file is opened lazily in the writing process."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._file = None
+
+    def write(self, record: Dict) -> None:
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+# Temporizadores de entorno creados en este proceso (con num_cpus=0 el
+# ProfilingCallback los incluye en sus escalares).
+_LOCAL_TIMERS: List[PhaseTimer] = []
+
+
+def local_env_timers() -> List[PhaseTimer]:
+    return list(_LOCAL_TIMERS)
+
+
+def instrument_env(sumo_env, vec_env, every: int, log_path: Optional[str] = None, source: str = "env") -> PhaseTimer:
+    """Time the phases of one SUMO instance and of the wrappers around it.
+
+    ``sumo_env`` is sumo-rl's ``SumoEnvironment`` and ``vec_env`` the padded
+    markov vector env (or ``GroupedEnv``) built on top of it. Methods are
+    replaced per instance, so nothing changes for uninstrumented envs. Every
+    ``every`` env steps the interval is written to ``log_path`` (JSONL) when
+    given. Closing ``vec_env`` unregisters the timer.
+    """
+    timer = PhaseTimer(source)
+    _LOCAL_TIMERS.append(timer)
+    writer = JsonlWriter(log_path) if log_path else None
+    perf_counter = time.perf_counter
+    # El PettingZoo de sumo-rl no pasa por SumoEnvironment.step: llama a las
+    # fases directamente. Se suma el tiempo de las fases de primer nivel (reset
+    # anida save_csv y _sumo_step) para restarlo del paso completo.
+    inner = {"elapsed": 0.0, "depth": 0}
+
+    def wrap_phase(phase: str, fn: Callable) -> Callable:
+        def timed(*args, **kwargs):
+            start = perf_counter()
+            inner["depth"] += 1
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                elapsed = perf_counter() - start
+                inner["depth"] -= 1
+                if inner["depth"] == 0:
+                    inner["elapsed"] += elapsed
+                timer.add(phase, elapsed)
+
+        timed.__wrapped__ = fn
+        return timed
+
+    for method, phase in _SUMO_PHASES:
+        fn = getattr(sumo_env, method, None)
+        if fn is not None:
+            setattr(sumo_env, method, wrap_phase(phase, fn))
+
+    vec_step = vec_env.step
+
+    def timed_vec_step(*args, **kwargs):
+        inner["elapsed"] = 0.0
+        start = perf_counter()
+        result = vec_step(*args, **kwargs)
+        elapsed = perf_counter() - start
+        timer.add("env.step", elapsed)
+        timer.add("env.wrappers", max(elapsed - inner["elapsed"], 0.0))
+        timer.steps += 1
+        if writer is not None and timer.steps >= every:
+            writer.write(timer.snapshot())
+        return result
+
+    vec_close = vec_env.close
+
+    def close(*args, **kwargs):
+        if timer in _LOCAL_TIMERS:
+            _LOCAL_TIMERS.remove(timer)
+        if writer is not None:
+            writer.close()
+        return vec_close(*args, **kwargs)
+
+    vec_env.step = timed_vec_step
+    vec_env.close = close
+    return timer
@@ -0,0 +1,124 @@
+"""Callback de SB3 que mide dónde se va el tiempo del entrenamiento.
+
+Fases del aprendiz (proceso principal):
+
+* ``learner.vec_env_step``: ``step_wait`` del VecEnv (incluye esperar a los workers).
+* ``learner.rollout_overhead``: resto de la recolección (predict, replay buffer).
+* ``learner.train``: pasos de gradiente entre dos recolecciones.
+* ``callback.<Clase>``: cada callback envuelto (p. ej. el I/O de ``CheckpointCallback``).
+
+Cada ``every`` timesteps se registran escalares ``timing/*`` en el logger de SB3
+(TensorBoard/CSV si están configurados) y, con ``log_path``, una línea JSON por
+intervalo. Con ``num_cpus=0`` se incluyen también las fases del entorno.
+
+En modo actor–aprendiz y agrupado (``distributed.ExternalTrainer``) no hay
+``step_wait`` que medir: ``learner.rollout_overhead`` incluye entonces la
+espera de transiciones o la simulación.
+"""
+import time
+from typing import Dict, Optional, Sequence
+
+from stable_baselines3.common.callbacks import BaseCallback, CallbackList
+
+from profiling import JsonlWriter, PhaseTimer, local_env_timers
+
+
+class ProfilingCallback(CallbackList):
+    """Time the learner loop and the wrapped ``callbacks``; emit every ``every`` timesteps."""
+
+    def __init__(
+        self,
+        callbacks: Sequence[BaseCallback] = (),
+        every: int = 1000,
+        log_path: Optional[str] = None,
+        verbose: int = 0,
+    ):
+        super().__init__(list(callbacks))
+        self.verbose = verbose
+        self.every = every
+        self.timer = PhaseTimer("learner")
+        self.writer = JsonlWriter(log_path) if log_path else None
+        self._last_emit = 0
+        self._mark: Optional[float] = None
+        self._rollout_start: Optional[float] = None
+        self._env_time = 0.0
+        self._original_step_wait = None
+
+    def _on_training_start(self) -> None:
+        super()._on_training_start()
+        self._last_emit = self.num_timesteps
+        self.timer.snapshot()  # descarta lo medido antes de empezar
+        env = self.training_env
+        step_wait = env.step_wait
+        perf_counter = time.perf_counter
+
+        def timed_step_wait():
+            start = perf_counter()
+            try:
+                return step_wait()
+            finally:
+                elapsed = perf_counter() - start
+                self._env_time += elapsed
+                self.timer.add("learner.vec_env_step", elapsed)
+
+        self._original_step_wait = step_wait
+        env.step_wait = timed_step_wait
+
+    def _on_rollout_start(self) -> None:
+        now = time.perf_counter()
+        if self._mark is not None:
+            self.timer.add("learner.train", now - self._mark)
+        self._rollout_start = now
+        self._env_time = 0.0
+        super()._on_rollout_start()
+
+    def _on_step(self) -> bool:
+        continue_training = True
+        for callback in self.callbacks:
+            start = time.perf_counter()
+            continue_training = callback.on_step() and continue_training
+            self.timer.add(f"callback.{type(callback).__name__}", time.perf_counter() - start)
+        self.timer.steps = self.num_timesteps - self._last_emit
+        if self.num_timesteps - self._last_emit >= self.every:
+            self._emit()
+        return continue_training
+
+    def _on_rollout_end(self) -> None:
+        super()._on_rollout_end()
+        now = time.perf_counter()
+        if self._rollout_start is not None:
+            self.timer.add("learner.rollout_overhead", max(now - self._rollout_start - self._env_time, 0.0))
+        self._mark = now
+
+    def _on_training_end(self) -> None:
+        super()._on_training_end()
+        if self.num_timesteps > self._last_emit:
+            self._emit()
+        if self._original_step_wait is not None:
+            self.training_env.step_wait = self._original_step_wait
+        if self.writer is not None:
+            self.writer.close()
+
+    def _emit(self) -> None:
+        records = [self.timer.snapshot()] + [timer.snapshot() for timer in local_env_timers()]
+        self._last_emit = self.num_timesteps
+        learner = records[0]
+        self.logger.record("timing/steps_per_sec", learner["steps_per_sec"])
+        for record in records:
+            for phase, summary in record["phases"].items():
+                self._record_phase(phase, summary)
+        if self.writer is not None:
+            for record in records:
+                record["num_timesteps"] = self.num_timesteps
+                self.writer.write(record)
+        if self.verbose:
+            top = sorted(learner["phases"].items(), key=lambda kv: -kv[1]["share"])[:3]
+            shares = ", ".join(f"{phase} {summary['share']:.0%}" for phase, summary in top)
+            print(f"[timing] {learner['steps_per_sec']:.1f} steps/s | {shares}")
+
+    def _record_phase(self, phase: str, summary: Dict) -> None:
+        key = f"timing/{phase}"
+        self.logger.record(f"{key}_share", summary["share"])
+        # Los percentiles solo van a TensorBoard/CSV/JSON para no inflar la tabla de stdout.
+        for stat in ("mean_ms", "p50_ms", "p95_ms", "max_ms"):
+            self.logger.record(f"{key}_{stat}", summary[stat], exclude="stdout")
@@ -0,0 +1,180 @@
+"""Replay buffer compacto para las observaciones con padding de supersuit.
+
+``pad_observations_v0`` rellena con ceros la observación de cada semáforo hasta
+la del más grande, y ``ReplayBuffer`` guarda ``obs`` y ``next_obs`` completos en
+float32. ``CompactReplayBuffer`` guarda lo mismo en mucho menos espacio:
+
+* Sin padding: cada posición del VecEnv (un semáforo de un SUMO) guarda solo
+  su largo real (``obs_sizes``, ver ``build_vec_env(return_layout=True)``).
+* Sin duplicar ``next_obs``: la siguiente observación de la transición ``i``
+  es la observación de la fila ``i + 1``. Solo cuando el episodio termina
+  (``next_obs`` es la observación terminal, distinta del reset) se guarda
+  aparte en una tabla pequeña. Si las filas siguientes vienen de otra fuente
+  (lotes de varios actores intercalados), quien llena el buffer debe llamar a
+  ``break_stream`` al final de cada tramo continuo.
+* Cuantizado: las observaciones de sumo-rl (fase one-hot, min_green, densidad
+  y cola por carril) están en [0, 1] y se guardan en uint8 (error <= 1/510);
+  con otros rangos se usa float16.
+
+Al muestrear se reconstruye el lote con padding con un solo indexado vectorizado
+por ``obs`` y otro por ``next_obs``.
+"""
+from typing import Dict, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import torch as th
+from gymnasium import spaces
+from stable_baselines3.common.buffers import BaseBuffer, ReplayBuffer
+from stable_baselines3.common.type_aliases import ReplayBufferSamples
+from stable_baselines3.common.vec_env import VecNormalize
+
+OBS_DTYPES = ("auto", "uint8", "float16", "float32")
+_UINT8_SCALE = 255.0
+
+
+class CompactReplayBuffer(ReplayBuffer):
+    """``ReplayBuffer`` storing unpadded, quantized observations once per step.
+
+    ``obs_sizes`` gives the unpadded observation length of every VecEnv slot
+    (defaults to the full padded size). Like ``optimize_memory_usage`` the
+    slot about to be overwritten is never sampled, but episode ends and
+    timeouts are handled.
+    """
+
+    def __init__(
+        self,
+        buffer_size: int,
+        observation_space: spaces.Space,
+        action_space: spaces.Space,
+        device: Union[th.device, str] = "auto",
+        n_envs: int = 1,
+        optimize_memory_usage: bool = False,
+        handle_timeout_termination: bool = True,
+        obs_sizes: Optional[Sequence[int]] = None,
+        obs_dtype: str = "auto",
+    ):
+        if not isinstance(observation_space, spaces.Box) or len(observation_space.shape) != 1:
+            raise ValueError("CompactReplayBuffer needs a flat Box observation space")
+        if obs_dtype not in OBS_DTYPES:
+            raise ValueError(f"obs_dtype must be one of {OBS_DTYPES}, got {obs_dtype!r}")
+        # No se llama a ReplayBuffer.__init__: reservaría obs y next_obs completos en float32.
+        BaseBuffer.__init__(self, buffer_size, observation_space, action_space, device, n_envs=n_envs)
+        self.buffer_size = max(buffer_size // n_envs, 2)
+        self.optimize_memory_usage = False
+        self.handle_timeout_termination = handle_timeout_termination
+
+        obs_dim = observation_space.shape[0]
+        sizes = np.full(n_envs, obs_dim, dtype=np.int64) if obs_sizes is None else np.asarray(obs_sizes, dtype=np.int64)
+        if sizes.shape != (n_envs,) or (sizes < 0).any() or (sizes > obs_dim).any():
+            raise ValueError(f"obs_sizes must have {n_envs} entries between 0 and {obs_dim}")
+        self.obs_sizes = sizes
+        self.offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(np.int64)
+        total = int(sizes.sum())
+        # Columnas a copiar de la observación con padding aplanada (n_envs * obs_dim).
+        self._pack = np.concatenate([e * obs_dim + np.arange(size) for e, size in enumerate(sizes)]).astype(np.intp)
+        # Por posición: columna de la fila compacta para cada columna con padding; la
+        # columna ``total`` siempre vale 0 y rellena el padding.
+        cols = np.arange(obs_dim)
+        self._unpack = np.where(cols[None, :] < sizes[:, None], self.offsets[:, None] + cols[None, :], total)
+        self._unpack = self._unpack.astype(np.intp)
+
+        if obs_dtype == "auto":
+            in_unit = np.all(observation_space.low >= 0) and np.all(observation_space.high <= 1)
+            obs_dtype = "uint8" if in_unit else "float16"
+        self.obs_dtype = np.dtype(obs_dtype)
+        self._scale = 1.0 / _UINT8_SCALE if self.obs_dtype == np.uint8 else 1.0
+
+        self.observations = np.zeros((self.buffer_size, total + 1), dtype=self.obs_dtype)
+        self._terminal = np.zeros((self.buffer_size, self.n_envs), dtype=bool)
+        self._terminal_obs: Dict[Tuple[int, int], np.ndarray] = {}
+        action_dtype = action_space.dtype
+        if isinstance(action_space, spaces.Discrete):
+            action_dtype = np.min_scalar_type(int(action_space.n) - 1)
+        self.actions = np.zeros((self.buffer_size, self.n_envs, self.action_dim), dtype=action_dtype)
+        self.rewards = np.zeros((self.buffer_size, self.n_envs), dtype=np.float32)
+        self.dones = np.zeros((self.buffer_size, self.n_envs), dtype=np.float32)
+        self.timeouts = np.zeros((self.buffer_size, self.n_envs), dtype=np.float32)
+
+    def _encode(self, obs: np.ndarray) -> np.ndarray:
+        flat = np.asarray(obs, dtype=np.float32).reshape(-1)[self._pack]
+        if self.obs_dtype == np.uint8:
+            return np.rint(np.clip(flat, 0.0, 1.0) * _UINT8_SCALE).astype(np.uint8)
+        return flat.astype(self.obs_dtype)
+
+    def _decode(self, stored: np.ndarray) -> np.ndarray:
+        return np.multiply(stored, self._scale, dtype=np.float32)
+
+    def add(self, obs, next_obs, action, reward, done, infos) -> None:
+        pos = self.pos
+        following = (pos + 1) % self.buffer_size
+        for env_idx in np.flatnonzero(self._terminal[pos]):
+            self._terminal_obs.pop((pos, int(env_idx)), None)
+
+        self.observations[pos, :-1] = self._encode(obs)
+        # La fila siguiente queda con next_obs hasta que la siguiente llamada escriba
+        # su obs (iguales salvo al terminar un episodio, que va a la tabla aparte).
+        encoded_next = self._encode(next_obs)
+        self.observations[following, :-1] = encoded_next
+        done = np.asarray(done, dtype=bool).reshape(self.n_envs)
+        self._terminal[pos] = done
+        for env_idx in np.flatnonzero(done):
+            start = self.offsets[env_idx]
+            self._terminal_obs[(pos, int(env_idx))] = encoded_next[start:start + self.obs_sizes[env_idx]].copy()
+
+        self.actions[pos] = np.asarray(action).reshape((self.n_envs, self.action_dim))
+        self.rewards[pos] = np.asarray(reward)
+        self.dones[pos] = done
+        if self.handle_timeout_termination:
+            self.timeouts[pos] = np.array([info.get("TimeLimit.truncated", False) for info in infos])
+
+        self.pos += 1
+        if self.pos == self.buffer_size:
+            self.full = True
+            self.pos = 0
+
+    def break_stream(self) -> None:
+        """Mark the end of a contiguous stream of transitions.
+
+        The next ``add`` may come from another source (e.g. another actor), so
+        the last row's ``next_obs``, held in the following row, is moved to the
+        terminal-observation table; ``dones`` is left untouched.
+        """
+        if self.pos == 0 and not self.full:
+            return
+        last = (self.pos - 1) % self.buffer_size
+        for env_idx in np.flatnonzero(~self._terminal[last]):
+            start = self.offsets[env_idx]
+            self._terminal_obs[(last, int(env_idx))] = self.observations[self.pos, start:start + self.obs_sizes[env_idx]].copy()
+        self._terminal[last] = True
+
+    def sample(self, batch_size: int, env: Optional[VecNormalize] = None) -> ReplayBufferSamples:
+        # La fila self.pos ya contiene la obs siguiente de la última transición: no se muestrea.
+        if self.full:
+            batch_inds = (np.random.randint(1, self.buffer_size, size=batch_size) + self.pos) % self.buffer_size
+        else:
+            batch_inds = np.random.randint(0, self.pos, size=batch_size)
+        return self._get_samples(batch_inds, env=env)
+
+    def _get_samples(self, batch_inds: np.ndarray, env: Optional[VecNormalize] = None) -> ReplayBufferSamples:
+        env_indices = np.random.randint(0, high=self.n_envs, size=(len(batch_inds),))
+        columns = self._unpack[env_indices]
+        obs = self._decode(self.observations[batch_inds[:, None], columns])
+        next_obs = self._decode(self.observations[((batch_inds + 1) % self.buffer_size)[:, None], columns])
+        for k in np.flatnonzero(self._terminal[batch_inds, env_indices]):
+            stored = self._terminal_obs[(int(batch_inds[k]), int(env_indices[k]))]
+            next_obs[k, :] = 0.0
+            next_obs[k, :stored.size] = self._decode(stored)
+
+        data = (
+            self._normalize_obs(obs, env),
+            self.actions[batch_inds, env_indices, :].astype(np.int64 if self.actions.dtype.kind in "iu" else np.float32),
+            self._normalize_obs(next_obs, env),
+            (self.dones[batch_inds, env_indices] * (1 - self.timeouts[batch_inds, env_indices])).reshape(-1, 1),
+            self._normalize_reward(self.rewards[batch_inds, env_indices].reshape(-1, 1), env),
+        )
+        return ReplayBufferSamples(*tuple(map(self.to_torch, data)))
+
+    def nbytes(self) -> int:
+        """Bytes held by the buffer arrays and the terminal-observation table."""
+        arrays = (self.observations, self._terminal, self.actions, self.rewards, self.dones, self.timeouts)
+        return sum(a.nbytes for a in arrays) + sum(v.nbytes for v in self._terminal_obs.values())
@@ -1,19 +1,91 @@
+import weakref
+
+import numpy as np
+
+MAX_WAIT_THRESHOLD = 40
+MAX_WAIT_PENALTY = 1.5
+REWARD_SCALE = 100.0
+
+# traci.constants.VAR_WAITING_TIME; no se importa traci aquí porque el backend
+# (libsumo/traci) se decide después de importar este módulo.
+_VAR_WAITING_TIME = 0x7A
+
+
+class LaneWaitBatch:
+    """Per-step max-wait penalties for every traffic signal of one SUMO env.
+
+    Subscribes once to the waiting time of all controlled lanes, reads them
+    with a single ``getAllSubscriptionResults`` call per simulation step and
+    reduces them per signal with NumPy.
+    """
+
+    def __init__(self, env) -> None:
+        self.env = env
+        ts_ids = list(env.ts_ids)
+        lanes_per_ts = [list(env.traffic_signals[ts].lanes) for ts in ts_ids]
+
+        self.lanes = list(dict.fromkeys(lane for lanes in lanes_per_ts for lane in lanes))
+        lane_pos = {lane: i for i, lane in enumerate(self.lanes)}
+        self._gather = np.array([lane_pos[lane] for lanes in lanes_per_ts for lane in lanes], dtype=np.intp)
+        self._offsets = np.cumsum([0] + [len(lanes) for lanes in lanes_per_ts[:-1]], dtype=np.intp)
+        self._ts_pos = {ts: i for i, ts in enumerate(ts_ids)}
+
+        self._session = None
+        self._time = None
+        self._penalties = np.zeros(len(ts_ids))
+
+    def _refresh(self) -> None:
+        sumo = self.env.sumo
+        session = (id(sumo), getattr(self.env, "episode", None))
+        now = sumo.simulation.getTime()
+
+        if session != self._session or self._time is None or now < self._time:
+            # SUMO se reinicia en cada reset y las suscripciones se pierden.
+            for lane in self.lanes:
+                sumo.lane.subscribe(lane, [_VAR_WAITING_TIME])
+            self._session = session
+        elif now == self._time:
+            return
+
+        results = sumo.lane.getAllSubscriptionResults()
+        waits = np.fromiter(
+            (
+                results[lane][_VAR_WAITING_TIME] if lane in results else sumo.lane.getWaitingTime(lane)
+                for lane in self.lanes
+            ),
+            dtype=np.float64,
+            count=len(self.lanes),
+        )
+        max_wait = np.maximum(np.maximum.reduceat(waits[self._gather], self._offsets), 0.0)
+        self._penalties = np.where(
+            max_wait > MAX_WAIT_THRESHOLD, (max_wait - MAX_WAIT_THRESHOLD) * MAX_WAIT_PENALTY, 0.0
+        )
+        self._time = now
+
+    def penalty(self, ts_id: str) -> float:
+        self._refresh()
+        return float(self._penalties[self._ts_pos[ts_id]])
+
+
+_BATCHES: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+def _lane_wait_batch(env) -> LaneWaitBatch:
+    batch = _BATCHES.get(env)
+    if batch is None:
+        batch = LaneWaitBatch(env)
+        _BATCHES[env] = batch
+    return batch
+
+
 def reward_function(traffic_signal):
     """
     Mix 'Diff Waiting Time' (Queue Theory) with penalty for hight waiting time
     """
     diff_wait = traffic_signal._diff_waiting_time_reward()
-    
-    max_wait = 0
-    for lane in traffic_signal.lanes:
-        wait = traffic_signal.env.sumo.lane.getWaitingTime(lane)
-        if wait > max_wait:
-            max_wait = wait
-    
-    penalty = 0
-    if max_wait > 40:
-        penalty = (max_wait - 40) * 1.5 
-        
-    reward = (diff_wait - penalty) / 100.0
-    
-    return reward
\ No newline at end of file
+
+    penalty = _lane_wait_batch(traffic_signal.env).penalty(traffic_signal.id)
+
+    reward = (diff_wait - penalty) / REWARD_SCALE
+
+    return reward
@@ -1,9 +1,9 @@
 import os
-import traci
-import pandas as pd
-import numpy as np
 
-def run_baseline(sim_dir):
+import sumo_backend
+from metrics_collector import VehicleMetricsCollector
+
+def run_baseline(sim_dir, backend="auto"):
     print("--- BASELINE (SIN IA) ---")
     net_file = os.path.join(sim_dir, "TestLightsSogamosoNet.net.xml")
     route_file = os.path.join(sim_dir, "osm.passenger.trips.xml") 
@@ -12,33 +12,18 @@ def run_baseline(sim_dir):
                 "--no-step-log", "true", "--waiting-time-memory", "1000",
                 "--time-to-teleport", "300"]
     
-    traci.start(sumo_cmd)
+    traci = sumo_backend.start(sumo_cmd, backend)
     
-    metrics = []
+    num_steps = 3600
+    collector = VehicleMetricsCollector(traci, num_steps)
     step = 0
-    while step < 3600:
+    while step < num_steps:
         traci.simulationStep()
-        
-        vehs = traci.vehicle.getIDList()
-        if vehs:
-            speeds = [traci.vehicle.getSpeed(v) for v in vehs]
-            waitings = [traci.vehicle.getWaitingTime(v) for v in vehs]
-            stopped = [1 for v in vehs if traci.vehicle.getSpeed(v) < 0.1]
-            
-            metrics.append({
-                "step": step,
-                "system_mean_speed": np.mean(speeds),
-                "system_total_waiting_time": sum(waitings),
-                "system_total_stopped": sum(stopped)
-            })
-        else:
-            metrics.append({"step": step, "system_mean_speed": 0, "system_total_waiting_time": 0, "system_total_stopped": 0})
-            
+        collector.collect(step)
         step += 1
     
     traci.close()
-    df = pd.DataFrame(metrics)
-    df.to_csv("datos_baseline.csv", index=False)
+    collector.to_csv("datos_baseline.csv")
     print("Baseline guardado en 'datos_baseline.csv'")
 
 if __name__ == "__main__":
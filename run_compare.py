@@ -0,0 +1,363 @@
+"""Motor de comparación de corridas (baseline, checkpoints, orquestador...).
+
+Una corrida es una etiqueta más uno o varios episodios (uno por semilla, CSV o
+``.npz``). Cada episodio se lee una sola vez, solo con las columnas necesarias,
+y se reduce de inmediato a:
+
+* una curva por métrica remuestreada sobre una rejilla común de ``step``
+  (las corridas con otro ``delta_time`` quedan alineadas), y
+* un resumen escalar por semilla (espera media y percentiles, throughput,
+  vehículos detenidos, velocidad).
+
+Ambos se acumulan entre semillas con Welford (media y varianza en una pasada),
+de modo que la memoria no depende del número de episodios. Las gráficas y la
+tabla salen de esos agregados, que pueden guardarse en JSON y volver a
+graficarse sin releer los episodios. La CLI vive en ``compare_model.py``.
+"""
+import glob
+import json
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from metrics_loader import load_columns
+from metrics_store import _atomic_write, find_episodes, load_manifest
+
+STEP_COLUMN = "step"
+CURVE_METRICS = ("system_mean_speed", "system_total_waiting_time", "system_total_stopped")
+WAIT_COLUMN = "system_mean_waiting_time"
+ARRIVED_COLUMN = "system_total_arrived"  # acumulado; solo en versiones recientes de sumo-rl
+DEFAULT_GRID_STEP = 5.0
+PERCENTILES = (50, 95)
+AGGREGATES_VERSION = 1
+
+# Valor crítico t de Student (95 %, dos colas) por grados de libertad.
+_T95 = (
+    12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+    2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+    2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042,
+)
+
+
+def t_critical(dof: int) -> float:
+    if dof < 1:
+        return float("nan")
+    return _T95[dof - 1] if dof <= len(_T95) else 1.96
+
+
+def summary_metrics() -> List[str]:
+    names = ["mean_waiting_time"]
+    names += [f"p{q}_waiting_time" for q in PERCENTILES]
+    names += ["mean_total_waiting_time", "mean_stopped", "max_stopped", "mean_speed", "throughput_veh_h"]
+    return names
+
+
+@dataclass
+class RunSpec:
+    label: str
+    files: List[str]
+
+
+@dataclass
+class EpisodeReduction:
+    """What is kept of one episode: the grid offset, resampled curves and scalars."""
+
+    path: str
+    start: int
+    curves: Dict[str, np.ndarray]
+    scalars: Dict[str, float]
+
+
+def _column(df: pd.DataFrame, name: str) -> Optional[np.ndarray]:
+    if name not in df.columns:
+        return None
+    return pd.to_numeric(df[name], errors="coerce").to_numpy(dtype=np.float64)
+
+
+def reduce_episode(path: str, grid_step: float = DEFAULT_GRID_STEP) -> EpisodeReduction:
+    """Read one episode and reduce it to grid-aligned curves plus per-episode scalars."""
+    columns = [STEP_COLUMN, *CURVE_METRICS, WAIT_COLUMN, ARRIVED_COLUMN]
+    df = load_columns(path, columns)
+    steps = _column(df, STEP_COLUMN)
+    if steps is None or not np.isfinite(steps).any():
+        raise ValueError(f"{path} has no '{STEP_COLUMN}' column")
+    order = np.argsort(steps, kind="stable")
+    steps = steps[order]
+
+    # Puntos de la rejilla dentro del rango del episodio; fuera de él no se extrapola.
+    first = math.ceil(steps[0] / grid_step)
+    last = math.floor(steps[-1] / grid_step)
+    grid = np.arange(first, last + 1, dtype=np.float64) * grid_step
+    curves = {}
+    for metric in CURVE_METRICS:
+        values = _column(df, metric)
+        if values is not None:
+            curves[metric] = np.interp(grid, steps, values[order])
+
+    nan = float("nan")
+    scalars: Dict[str, float] = dict.fromkeys(summary_metrics(), nan)
+    # Sin la columna de espera media los campos quedan en NaN: la espera total
+    # es otra métrica y va aparte en ``mean_total_waiting_time``.
+    wait = _column(df, WAIT_COLUMN)
+    if wait is not None and np.isfinite(wait).any():
+        scalars["mean_waiting_time"] = float(np.nanmean(wait))
+        for q in PERCENTILES:
+            scalars[f"p{q}_waiting_time"] = float(np.nanpercentile(wait, q))
+    total_wait = _column(df, "system_total_waiting_time")
+    if total_wait is not None:
+        scalars["mean_total_waiting_time"] = float(np.nanmean(total_wait))
+    stopped = _column(df, "system_total_stopped")
+    if stopped is not None:
+        scalars["mean_stopped"] = float(np.nanmean(stopped))
+        scalars["max_stopped"] = float(np.nanmax(stopped))
+    speed = _column(df, "system_mean_speed")
+    if speed is not None:
+        scalars["mean_speed"] = float(np.nanmean(speed))
+    arrived = _column(df, ARRIVED_COLUMN)
+    duration = steps[-1] - steps[0]
+    if arrived is not None and duration > 0:
+        arrived = arrived[order]
+        scalars["throughput_veh_h"] = float((arrived[-1] - arrived[0]) / duration * 3600.0)
+    return EpisodeReduction(path, first, curves, scalars)
+
+
+def _reduce_job(args: Tuple[str, float]) -> EpisodeReduction:
+    return reduce_episode(*args)
+
+
+class _Welford:
+    """Running mean/variance per grid point; the grid can grow at either end."""
+
+    def __init__(self):
+        self.count = np.zeros(0, dtype=np.int64)
+        self.mean = np.zeros(0, dtype=np.float64)
+        self.m2 = np.zeros(0, dtype=np.float64)
+
+    def _grow(self, size: int) -> None:
+        extra = size - self.count.size
+        if extra > 0:
+            self.count = np.concatenate([self.count, np.zeros(extra, dtype=np.int64)])
+            self.mean = np.concatenate([self.mean, np.zeros(extra)])
+            self.m2 = np.concatenate([self.m2, np.zeros(extra)])
+
+    def prepend(self, size: int) -> None:
+        self.count = np.concatenate([np.zeros(size, dtype=np.int64), self.count])
+        self.mean = np.concatenate([np.zeros(size), self.mean])
+        self.m2 = np.concatenate([np.zeros(size), self.m2])
+
+    def add(self, offset: int, values: np.ndarray) -> None:
+        self._grow(offset + values.size)
+        sl = slice(offset, offset + values.size)
+        valid = np.isfinite(values)
+        count = self.count[sl] + valid
+        delta = np.where(valid, values - self.mean[sl], 0.0)
+        self.mean[sl] += np.divide(delta, count, out=np.zeros_like(delta), where=count > 0)
+        self.m2[sl] += delta * np.where(valid, values - self.mean[sl], 0.0)
+        self.count[sl] = count
+
+    def ci_half_width(self) -> np.ndarray:
+        """95 % confidence half-width of the mean (NaN with fewer than two samples)."""
+        half = np.full(self.count.size, np.nan)
+        idx = np.flatnonzero(self.count > 1)
+        n = self.count[idx].astype(np.float64)
+        t = np.array([t_critical(int(k) - 1) for k in n])
+        half[idx] = t * np.sqrt(self.m2[idx] / (n - 1) / n)
+        return half
+
+
+@dataclass
+class RunAggregate:
+    """Cross-seed aggregates of one run; everything the plots and the table need."""
+
+    label: str
+    grid_step: float
+    files: List[str] = field(default_factory=list)
+    manifest: Optional[Dict] = None
+    _origin: Optional[int] = None
+    _curves: Dict[str, _Welford] = field(default_factory=dict)
+    _scalars: Dict[str, List[float]] = field(default_factory=dict)
+
+    def add(self, episode: EpisodeReduction) -> None:
+        self.files.append(episode.path)
+        if self.manifest is None:
+            self.manifest = load_manifest(episode.path)
+        if self._origin is None:
+            self._origin = episode.start
+        if episode.start < self._origin:
+            for acc in self._curves.values():
+                acc.prepend(self._origin - episode.start)
+            self._origin = episode.start
+        for metric, values in episode.curves.items():
+            self._curves.setdefault(metric, _Welford()).add(episode.start - self._origin, values)
+        for name, value in episode.scalars.items():
+            self._scalars.setdefault(name, []).append(value)
+
+    @property
+    def seeds(self) -> int:
+        return len(self.files)
+
+    def curve(self, metric: str) -> pd.DataFrame:
+        """``step``, mean and 95 % CI bounds of ``metric`` over the seeds."""
+        acc = self._curves.get(metric)
+        if acc is None:
+            return pd.DataFrame(columns=[STEP_COLUMN, metric, f"{metric}_lo", f"{metric}_hi"])
+        valid = acc.count > 0
+        steps = (np.arange(acc.count.size) + (self._origin or 0)) * self.grid_step
+        half = acc.ci_half_width()
+        return pd.DataFrame({
+            STEP_COLUMN: steps[valid],
+            metric: acc.mean[valid],
+            f"{metric}_lo": (acc.mean - half)[valid],
+            f"{metric}_hi": (acc.mean + half)[valid],
+        })
+
+    def curves(self) -> pd.DataFrame:
+        """All curve metrics joined on ``step`` (mean plus ``_lo``/``_hi`` bands)."""
+        frame = None
+        for metric in CURVE_METRICS:
+            df = self.curve(metric)
+            if df.empty:
+                continue
+            frame = df if frame is None else frame.merge(df, on=STEP_COLUMN, how="outer")
+        return frame if frame is not None else pd.DataFrame(columns=[STEP_COLUMN])
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Per metric: mean over seeds, 95 % CI half-width and the number of seeds with data."""
+        out = {}
+        for name, values in self._scalars.items():
+            arr = np.asarray(values, dtype=np.float64)
+            arr = arr[np.isfinite(arr)]
+            n = int(arr.size)
+            mean = float(arr.mean()) if n else float("nan")
+            ci = float(t_critical(n - 1) * arr.std(ddof=1) / math.sqrt(n)) if n > 1 else float("nan")
+            out[name] = {"mean": mean, "ci95": ci, "n": n}
+        return out
+
+    def to_dict(self) -> Dict:
+        return {
+            "label": self.label,
+            "grid_step": self.grid_step,
+            "files": self.files,
+            "manifest": self.manifest,
+            "origin": self._origin,
+            "curves": {
+                metric: {"count": acc.count.tolist(), "mean": acc.mean.tolist(), "m2": acc.m2.tolist()}
+                for metric, acc in self._curves.items()
+            },
+            "scalars": self._scalars,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "RunAggregate":
+        run = cls(data["label"], data["grid_step"], list(data["files"]), data.get("manifest"))
+        run._origin = data.get("origin")
+        for metric, acc_data in data["curves"].items():
+            acc = _Welford()
+            acc.count = np.asarray(acc_data["count"], dtype=np.int64)
+            acc.mean = np.asarray(acc_data["mean"], dtype=np.float64)
+            acc.m2 = np.asarray(acc_data["m2"], dtype=np.float64)
+            run._curves[metric] = acc
+        run._scalars = {name: [float(v) for v in values] for name, values in data["scalars"].items()}
+        return run
+
+
+def resolve_run(spec: str) -> RunSpec:
+    """``[label=]path`` where path is a file, a glob or a directory of episodes.
+
+    Without a label the run is named after the manifest's ``model_version`` or
+    the file/directory name.
+    """
+    label, sep, target = spec.partition("=")
+    if not sep:
+        label, target = "", spec
+    if os.path.isdir(target):
+        files = find_episodes(target)
+    else:
+        files = sorted(glob.glob(target)) or ([target] if os.path.exists(target) else [])
+    if not files:
+        raise FileNotFoundError(f"No episode files for run '{spec}'")
+    if not label:
+        manifest = load_manifest(files[0])
+        if manifest and manifest.get("model_version"):
+            label = str(manifest["model_version"])
+        else:
+            label = os.path.basename(os.path.normpath(target)) if os.path.isdir(target) else \
+                os.path.splitext(os.path.basename(files[0]))[0]
+    return RunSpec(label, sorted(files))
+
+
+def unique_labels(labels: Sequence[str]) -> List[str]:
+    """Suffix repeated labels with ``#2``, ``#3``...; plots and tables are keyed by label."""
+    used = set()
+    out = []
+    for label in labels:
+        candidate, n = label, 1
+        while candidate in used:
+            n += 1
+            candidate = f"{label} #{n}"
+        used.add(candidate)
+        out.append(candidate)
+    return out
+
+
+def compare_runs(
+    runs: Sequence[RunSpec],
+    grid_step: float = DEFAULT_GRID_STEP,
+    workers: Optional[int] = None,
+) -> List[RunAggregate]:
+    """Aggregate every run; episodes are reduced in parallel and folded in as they arrive.
+
+    Runs sharing a label (e.g. every training run named after ``MODEL_NAME``)
+    get ``#2``, ``#3``... appended so none is merged into another.
+    """
+    labels = unique_labels([run.label for run in runs])
+    aggregates = [RunAggregate(label, grid_step) for label in labels]
+    jobs = [(path, grid_step) for run in runs for path in run.files]
+    owners = [i for i, run in enumerate(runs) for _path in run.files]
+    workers = workers if workers is not None else min(len(jobs), os.cpu_count() or 1)
+    if workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for owner, episode in zip(owners, pool.map(_reduce_job, jobs)):
+                aggregates[owner].add(episode)
+    else:
+        for owner, job in zip(owners, jobs):
+            aggregates[owner].add(_reduce_job(job))
+    return aggregates
+
+
+def save_aggregates(path: str, aggregates: Sequence[RunAggregate]) -> None:
+    body = {"version": AGGREGATES_VERSION, "runs": [run.to_dict() for run in aggregates]}
+    _atomic_write(path, lambda f: f.write(json.dumps(body).encode("utf-8")))
+
+
+def load_aggregates(path: str) -> List[RunAggregate]:
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if data.get("version") != AGGREGATES_VERSION:
+        raise ValueError(f"Unsupported aggregates file version in {path}")
+    aggregates = [RunAggregate.from_dict(run) for run in data["runs"]]
+    for run, label in zip(aggregates, unique_labels([run.label for run in aggregates])):
+        run.label = label
+    return aggregates
+
+
+def missing_metrics(table: pd.DataFrame) -> List[str]:
+    """Summary metrics with no value in any run (e.g. throughput without ``system_total_arrived``)."""
+    return [name for name in summary_metrics() if name not in table.columns or table[name].isna().all()]
+
+
+def summary_table(aggregates: Sequence[RunAggregate]) -> pd.DataFrame:
+    """One row per run, ``<metric>`` and ``<metric>_ci95`` columns."""
+    rows = []
+    for run in aggregates:
+        row = {"run": run.label, "seeds": run.seeds}
+        for name, stats in run.summary().items():
+            row[name] = stats["mean"]
+            row[f"{name}_ci95"] = stats["ci95"]
+        rows.append(row)
+    return pd.DataFrame(rows).set_index("run")
@@ -1,37 +1,36 @@
 import os
 import numpy as np
-import gymnasium as gym
 from stable_baselines3 import DQN
-from sumo_rl import parallel_env
-import supersuit as ss
 
-from reward import reward_function
+from env_factory import build_vec_env
 
-def run_eval(sim_dir, model_path):
+def run_eval(sim_dir, model_path, use_gui=True, backend="auto", warmup_seconds=0, metrics_format="csv",
+             live_edge_data=False):
     print(f"--- LOADING MODEL: {model_path} ---")
     
-    net_file = os.path.join(sim_dir, "TestLightsSogamosoNet.net.xml")
     route_file = os.path.join(sim_dir, "osm.passenger.trips.xml")
     
     out_csv = "datos_IA_evaluacion"
-    env = parallel_env(
-        net_file=net_file,
-        route_file=route_file,
-        out_csv_name=out_csv,
-        use_gui=True,          
+    env = build_vec_env(
+        sim_dir=sim_dir,
+        output_csv=out_csv,
+        use_gui=use_gui,
         num_seconds=3600, 
         min_green=10,
         max_green=60,
         delta_time=10,         
-        reward_fn=reward_function,
         sumo_warnings=False,
-        fixed_ts=True
+        fixed_ts=True,
+        # valores por defecto de sumo-rl, que es lo que usaba esta evaluación
+        time_to_teleport=-1,
+        additional_sumo_cmd=None,
+        route_file=route_file,
+        backend=backend,
+        warmup_seconds=warmup_seconds,
+        metrics_format=metrics_format,
+        live_edge_data=live_edge_data,
+        run_manifest={"model_version": os.path.basename(model_path).removesuffix(".zip"), "phase": "eval"},
     )
-    
-    env = ss.pad_observations_v0(env)
-    env = ss.pad_action_space_v0(env)
-    env = ss.pettingzoo_env_to_vec_env_v1(env)
-    env = ss.concat_vec_envs_v1(env, 1, num_cpus=1, base_class="stable_baselines3")
 
     if not model_path.endswith(".zip"):
         model_path += ".zip"
@@ -0,0 +1,160 @@
+"""Caché en disco de estados SUMO (saveState/loadState) tras el warm-up.
+
+Cada snapshot se identifica por un hash del contenido de la red y del archivo
+de rutas más los parámetros que afectan la simulación, de modo que cambiar
+cualquiera de ellos genera un snapshot nuevo. Los resets arrancan SUMO con
+``--load-state`` en lugar de repetir el warm-up desde t=0.
+
+Sin semilla (``--random``) el warm-up no es reproducible y un snapshot no
+tendría clave con la cual reutilizarse, así que se exige una semilla;
+``build_vec_env`` la deriva (``WARMUP_SEED + i``) cuando la corrida no trae.
+"""
+import hashlib
+import json
+import os
+import tempfile
+from typing import List, Optional, Union
+
+import sumo_backend
+
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+WARMUP_SEED = 0  # semilla base de las corridas con warm-up que no fijan una
+_SUFFIX = ".state.xml.gz"
+
+
+def file_digest(path: str) -> str:
+    """SHA-256 hex digest of a file's contents."""
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class SnapshotCache:
+    """Warm-up snapshots stored in ``cache_dir`` with LRU eviction by total size."""
+
+    def __init__(self, cache_dir: str, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.max_bytes = max_bytes
+        if any(ch.isspace() for ch in self.cache_dir):
+            # sumo-rl parte additional_sumo_cmd por espacios.
+            raise ValueError(f"Snapshot directory must not contain whitespace: {self.cache_dir}")
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def key(
+        self,
+        net_file: str,
+        route_file: str,
+        warmup_seconds: int,
+        seed: Union[int, str, None],
+        time_to_teleport: int,
+        additional_sumo_cmd: Optional[str],
+    ) -> str:
+        params = {
+            "net": file_digest(net_file),
+            "route": file_digest(route_file),
+            "warmup": warmup_seconds,
+            "seed": seed,
+            "time_to_teleport": time_to_teleport,
+            "additional": additional_sumo_cmd or "",
+        }
+        return hashlib.sha256(json.dumps(params, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + _SUFFIX)
+
+    def get_or_create(
+        self,
+        net_file: str,
+        route_file: str,
+        warmup_seconds: int,
+        seed: Union[int, str, None] = None,
+        time_to_teleport: int = 300,
+        additional_sumo_cmd: Optional[str] = None,
+        backend: str = "auto",
+    ) -> str:
+        """Return the snapshot path for these inputs, simulating the warm-up on a miss.
+
+        ``seed`` is required: an unseeded warm-up cannot be looked up again.
+        """
+
+        if seed is None or seed == "random":
+            raise ValueError("Warm-up snapshots need a SUMO seed (see WARMUP_SEED)")
+        cmd = self._warmup_cmd(net_file, route_file, seed, time_to_teleport, additional_sumo_cmd)
+        key = self.key(net_file, route_file, warmup_seconds, seed, time_to_teleport, additional_sumo_cmd)
+        path = self.path_for(key)
+        if os.path.exists(path):
+            os.utime(path)  # marca de uso para la evicción LRU
+            return path
+
+        self._simulate(cmd, warmup_seconds, path, backend, label=f"snapshot-{key[:12]}")
+        self.evict(keep=path)
+        return path
+
+    def _simulate(self, cmd: List[str], warmup_seconds: int, path: str, backend: str, label: str) -> None:
+        # SUMO comprime según la extensión, así que el temporal conserva el sufijo.
+        fd, tmp_path = tempfile.mkstemp(prefix=".", suffix=_SUFFIX, dir=self.cache_dir)
+        os.close(fd)
+        try:
+            sumo = sumo_backend.start(cmd, backend, label=label)
+            try:
+                sumo.simulationStep(warmup_seconds)
+                sumo.simulation.saveState(tmp_path)
+            finally:
+                sumo.close()
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    @staticmethod
+    def _warmup_cmd(
+        net_file: str,
+        route_file: str,
+        seed: Union[int, str],
+        time_to_teleport: int,
+        additional_sumo_cmd: Optional[str],
+    ) -> List[str]:
+        # Mismas opciones que usa sumo-rl al arrancar SUMO, con los programas
+        # semafóricos estáticos de la red durante el warm-up.
+        cmd = [
+            "sumo",
+            "-n", net_file,
+            "-r", route_file,
+            "--max-depart-delay", "-1",
+            "--waiting-time-memory", "1000",
+            "--time-to-teleport", str(time_to_teleport),
+            "--no-step-log", "true",
+            "--seed", str(seed),
+        ]
+        if additional_sumo_cmd:
+            cmd.extend(additional_sumo_cmd.split())
+        return cmd
+
+    def evict(self, keep: Optional[str] = None) -> None:
+        """Delete least recently used snapshots until the cache fits in ``max_bytes``."""
+
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.startswith(".") or not name.endswith(_SUFFIX):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
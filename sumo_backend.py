@@ -0,0 +1,80 @@
+"""Selección del backend de SUMO: libsumo (en proceso) o TraCI (socket).
+
+sumo-rl y el paquete ``traci`` deciden en tiempo de importación si usan libsumo
+mirando la variable ``LIBSUMO_AS_TRACI``, así que ``configure_backend`` debe
+llamarse antes de importar ``sumo_rl`` o ``traci`` en el proceso.
+"""
+import importlib.util
+import os
+import sys
+from typing import List, Optional
+
+BACKENDS = ("auto", "libsumo", "traci")
+
+_LIBSUMO_ENV = "LIBSUMO_AS_TRACI"
+
+
+def libsumo_available() -> bool:
+    return importlib.util.find_spec("libsumo") is not None
+
+
+def resolve_backend(backend: str = "auto", use_gui: bool = False) -> str:
+    """Return the concrete backend ('libsumo' or 'traci') for the given request."""
+
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown SUMO backend '{backend}', expected one of {BACKENDS}")
+
+    if use_gui:
+        # libsumo no puede abrir sumo-gui; con GUI siempre se usa TraCI.
+        if backend == "libsumo":
+            raise ValueError("libsumo does not support sumo-gui; use backend='traci' or disable the GUI")
+        return "traci"
+
+    if backend == "auto":
+        return "libsumo" if libsumo_available() else "traci"
+    return backend
+
+
+def _sumo_rl_backend() -> Optional[str]:
+    env_module = sys.modules.get("sumo_rl.environment.env")
+    if env_module is None:
+        return None
+    return "libsumo" if getattr(env_module, "LIBSUMO", False) else "traci"
+
+
+def configure_backend(backend: str = "auto", use_gui: bool = False) -> str:
+    """Resolve the backend and export it for sumo-rl/traci (and worker processes)."""
+
+    resolved = resolve_backend(backend, use_gui)
+
+    loaded = _sumo_rl_backend()
+    if loaded is not None and loaded != resolved:
+        raise RuntimeError(
+            f"sumo_rl was already imported with the '{loaded}' backend; "
+            f"configure '{resolved}' before importing sumo_rl"
+        )
+
+    if resolved == "libsumo":
+        os.environ[_LIBSUMO_ENV] = "1"
+    else:
+        os.environ.pop(_LIBSUMO_ENV, None)
+    return resolved
+
+
+def start(sumo_cmd: List[str], backend: str = "auto", label: Optional[str] = None):
+    """Start SUMO and return a handle exposing the TraCI API (module or connection)."""
+
+    resolved = configure_backend(backend, use_gui=os.path.basename(sumo_cmd[0]).startswith("sumo-gui"))
+    if resolved == "libsumo":
+        import libsumo
+
+        libsumo.start(sumo_cmd)
+        return libsumo
+
+    import traci
+
+    if label is None:
+        traci.start(sumo_cmd)
+        return traci
+    traci.start(sumo_cmd, label=label)
+    return traci.getConnection(label)
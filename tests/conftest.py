@@ -0,0 +1,13 @@
+import os
+import sys
+import types
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+# LLMReporter se despliega como el paquete ``reporter``.
+if "reporter" not in sys.modules:
+    reporter = types.ModuleType("reporter")
+    reporter.__path__ = [os.path.join(ROOT, "LLMReporter")]
+    sys.modules["reporter"] = reporter
@@ -0,0 +1,27 @@
+from reporter.core.indexes import Indexes
+from reporter.core.models import SimulationRecord
+from reporter.services.analyzer import TrafficAnalyzer
+
+
+def _analyzer():
+    records = [SimulationRecord(f"a{i}", [], "highway.primary", "Carrera 14", 10.0, 50.0 + i) for i in range(20)]
+    records += [SimulationRecord(f"b{i}", [], "highway.primary", "Carrera 17", 20.0, 10.0 + i) for i in range(20)]
+    return TrafficAnalyzer(Indexes(records), records)
+
+
+def test_comparative_prompt_includes_every_street():
+    prompt = _analyzer().prompt_for("compara carrera 14 y carrera 17")
+    rows = [line for line in prompt.splitlines() if line.startswith("via=")]
+    assert any("Carrera 14" in row and "tramos=" not in row for row in rows)
+    assert any("Carrera 17" in row and "tramos=" not in row for row in rows)
+    assert any(row.startswith("via=Carrera 14 tramos=20") for row in rows)
+    assert any(row.startswith("via=Carrera 17 tramos=20") for row in rows)
+
+
+def test_intent_key_keeps_direction_words():
+    analyzer = _analyzer()
+    most = analyzer.intent_key("¿Cuál es la calle más congestionada?")
+    assert most != analyzer.intent_key("¿Cuál es la calle menos congestionada?")
+    assert most != analyzer.intent_key("¿Cuántas calles tienen congestión mayor al 50%?")
+    assert most == analyzer.intent_key("¿Qué calles están más congestionadas?")
+    assert analyzer.intent_key("¿Cómo está la carrera 14?") == analyzer.intent_key("estado de la kra 14")
@@ -0,0 +1,29 @@
+from reporter.core.indexes import Indexes
+from reporter.core.models import SimulationRecord
+
+
+def _indexes():
+    names = ["calles de bosques de venecia", "calles de quintas de venecia", "carrera 14", "carrera 17",
+             "calle 11", "calle 13", "avenida el sol"]
+    records = [SimulationRecord(f"e{i}", [], "highway.residential", name, 10.0, float(i)) for i, name in enumerate(names)]
+    return Indexes(records)
+
+
+def test_general_question_matches_no_street():
+    indexes = _indexes()
+    assert indexes.search("¿cuáles son las calles más congestionadas?") == []
+    assert indexes.search("tráfico en la avenida oriente") == []
+
+
+def test_named_streets_still_match():
+    indexes = _indexes()
+    assert indexes.search("bosques de venecia")[0][1] == "calles de bosques de venecia"
+    assert [name for _score, name in indexes.search("estado de la kra 14")] == ["carrera 14"]
+    assert [name for _score, name in indexes.search("calle 11")] == ["calle 11"]
+    assert indexes.search("avenida el sol")[0][1] == "avenida el sol"
+
+
+def test_unmatched_tokens_lower_the_score():
+    indexes = _indexes()
+    assert indexes.search("venecia")[0][0] == 1.0
+    assert indexes.search("venecia lentas") == []
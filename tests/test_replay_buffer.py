@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("stable_baselines3")
+from gymnasium import spaces
+from stable_baselines3.common.buffers import ReplayBuffer
+
+from replay_buffer import CompactReplayBuffer
+
+OBS_SIZES = [3, 5]
+OBS_DIM = max(OBS_SIZES)
+N_ENVS = len(OBS_SIZES)
+
+
+class _Stream:
+    """One actor: padded observations, episodes of ``episode_len`` steps."""
+
+    def __init__(self, seed, episode_len):
+        self.rng = np.random.default_rng(seed)
+        self.episode_len = episode_len
+        self.t = 0
+        self.obs = self._observe()
+
+    def _observe(self):
+        obs = self.rng.random((N_ENVS, OBS_DIM)).astype(np.float32)
+        for env_idx, size in enumerate(OBS_SIZES):
+            obs[env_idx, size:] = 0.0
+        return obs
+
+    def step(self):
+        self.t += 1
+        done = np.full(N_ENVS, self.t % self.episode_len == 0)
+        next_obs = self._observe()
+        transition = (self.obs, next_obs, self.rng.integers(0, 4, size=N_ENVS), self.rng.random(N_ENVS).astype(np.float32),
+                      done, [{"TimeLimit.truncated": bool(d)} for d in done])
+        # Tras terminar, la siguiente obs es la del reset (distinta de la terminal).
+        self.obs = self._observe() if done[0] else next_obs
+        return transition
+
+
+def test_interleaved_streams_match_reference_buffer():
+    observation_space = spaces.Box(low=0.0, high=1.0, shape=(OBS_DIM,), dtype=np.float32)
+    action_space = spaces.Discrete(4)
+    compact = CompactReplayBuffer(1000, observation_space, action_space, device="cpu", n_envs=N_ENVS,
+                                  obs_sizes=OBS_SIZES, obs_dtype="float32")
+    reference = ReplayBuffer(1000, observation_space, action_space, device="cpu", n_envs=N_ENVS)
+
+    streams = [_Stream(0, episode_len=7), _Stream(1, episode_len=11)]
+    for batch in range(12):
+        stream = streams[batch % 2]
+        for _ in range(5):
+            transition = stream.step()
+            compact.add(*transition)
+            reference.add(*transition)
+        compact.break_stream()
+
+    # La fila ``pos`` nunca se muestrea en el buffer compacto.
+    batch_inds = np.arange(compact.pos)
+    np.random.seed(0)
+    got = compact._get_samples(batch_inds)
+    np.random.seed(0)
+    expected = reference._get_samples(batch_inds)
+    for name in ("observations", "actions", "next_observations", "dones", "rewards"):
+        np.testing.assert_allclose(np.asarray(getattr(got, name)), np.asarray(getattr(expected, name)), err_msg=name)
@@ -1,19 +1,39 @@
 import os
 import argparse
+import functools
 import numpy as np
 import gymnasium as gym
 from stable_baselines3 import DQN
 from stable_baselines3.common.callbacks import CheckpointCallback
-from stable_baselines3.common.vec_env import VecMonitor
 
-from sumo_rl import parallel_env
-import supersuit as ss
-from reward import reward_function
+from distributed import DEFAULT_SYNC_EVERY, train_distributed
+from env_factory import build_vec_env
+from grouped import train_grouped
+from metrics_store import FORMATS as METRICS_FORMATS
+from profiling_callback import ProfilingCallback
+from replay_buffer import CompactReplayBuffer
+from snapshot_cache import WARMUP_SEED
+from sumo_backend import BACKENDS
 
+MODEL_NAME = "sumo_rl_final_model_v6"
 
-def make_env(sim_dir, output_dir, use_gui=False):
-    net_file = os.path.join(sim_dir, "TestLightsSogamosoNet.net.xml")
-    
+DQN_KWARGS = dict(
+    learning_rate=0.001,
+    buffer_size=100000,
+    learning_starts=2000,
+    batch_size=256,
+    gamma=0.99,
+    train_freq=4,
+    target_update_interval=1000,
+    exploration_fraction=0.5,
+    exploration_final_eps=0.05,
+)
+
+
+def make_env(sim_dir, output_dir, use_gui=False, num_envs=1, num_cpus=None, seeds=None, backend="auto",
+             warmup_seconds=0, snapshot_dir=None, metrics_format="csv", run_manifest=None,
+             profile_every=0, profile_log=None, csv_name="resultados_train", return_layout=False,
+             grouped=False, live_edge_data=False):
     route_file_lite = os.path.join(sim_dir, "osm.passenger.trips_lite.xml")
     if os.path.exists(route_file_lite):
         route_file = route_file_lite
@@ -21,34 +41,39 @@ def make_env(sim_dir, output_dir, use_gui=False):
     else:
         route_file = os.path.join(sim_dir, "osm.passenger.trips.xml")
 
-    out_csv = os.path.join(output_dir, "resultados_train")
+    out_csv = os.path.join(output_dir, csv_name)
 
-    env = parallel_env(
-        net_file=net_file,
-        route_file=route_file,
-        out_csv_name=out_csv,
+    return build_vec_env(
+        sim_dir=sim_dir,
+        output_csv=out_csv,
         use_gui=use_gui,
-        num_seconds=50000, 
-        
-        delta_time=10,     
+        num_seconds=50000,
+
+        delta_time=10,
         min_green=10,
         max_green=60,
-        
-        fixed_ts=False,    
-        reward_fn=reward_function, 
-        
+
+        fixed_ts=False,
+
         sumo_warnings=False,
         time_to_teleport=300,
-        additional_sumo_cmd="--duration-log.disable true"
+        additional_sumo_cmd="--duration-log.disable true",
+        route_file=route_file,
+
+        num_envs=num_envs,
+        num_cpus=num_cpus,
+        seeds=seeds,
+        backend=backend,
+        warmup_seconds=warmup_seconds,
+        snapshot_dir=snapshot_dir,
+        metrics_format=metrics_format,
+        run_manifest=run_manifest,
+        profile_every=profile_every,
+        profile_log=profile_log,
+        return_layout=return_layout,
+        grouped=grouped,
+        live_edge_data=live_edge_data,
     )
-    
-    env = ss.pad_observations_v0(env)
-    env = ss.pad_action_space_v0(env)
-    env = ss.pettingzoo_env_to_vec_env_v1(env)
-    env = ss.concat_vec_envs_v1(env, 1, num_cpus=1, base_class="stable_baselines3")
-    
-    env = VecMonitor(env)
-    return env
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
@@ -57,6 +82,29 @@ if __name__ == "__main__":
     parser.add_argument("--output_model_dir", type=str, default="./models")
     parser.add_argument("--steps", type=int, default=100000) 
     parser.add_argument("--gui", action="store_true")
+    parser.add_argument("--num_envs", type=int, default=1, help="Instancias SUMO en paralelo")
+    parser.add_argument("--num_cpus", type=int, default=None, help="Procesos worker (default: uno por instancia; en proceso si hay una sola)")
+    parser.add_argument("--seed", type=int, default=None, help="Semilla base; cada instancia usa seed + i")
+    parser.add_argument("--backend", choices=BACKENDS, default="auto", help="auto = libsumo sin GUI, traci con GUI")
+    parser.add_argument("--warmup", type=int, default=0, help="Segundos de warm-up cacheados como snapshot (0 = sin snapshot)")
+    parser.add_argument("--snapshot_dir", type=str, default=None)
+    parser.add_argument("--metrics_format", choices=METRICS_FORMATS, default="csv",
+                        help="csv (sumo-rl) o npz columnar comprimido (ver metrics_store.py)")
+    parser.add_argument("--profile_every", type=int, default=0,
+                        help="Tiempos por fase cada N pasos (0 = desactivado, ver profiling.py)")
+    parser.add_argument("--actors", type=int, default=0,
+                        help="Procesos actor con su propio SUMO (0 = entrenamiento en un solo proceso)")
+    parser.add_argument("--listen", type=str, default=None,
+                        help="host:port para actores remotos (python distributed.py --connect ...)")
+    parser.add_argument("--sync_every", type=int, default=DEFAULT_SYNC_EVERY,
+                        help="Pasos de gradiente entre envíos de pesos a los actores")
+    parser.add_argument("--buffer_size", type=int, default=DQN_KWARGS["buffer_size"])
+    parser.add_argument("--compact_buffer", action="store_true",
+                        help="Replay buffer sin padding, sin next_obs duplicado y cuantizado (ver replay_buffer.py)")
+    parser.add_argument("--grouped", action="store_true",
+                        help="Una DQN por forma de semáforo (obs, fases) sin padding, en un solo SUMO (ver grouped.py)")
+    parser.add_argument("--live_edge_data", action="store_true",
+                        help="Escribe sumoData/edgeData_live.xml cada 60 s simulados para el LLMReporter")
     args = parser.parse_args()
 
     print(f"--- TRAINING PHASE ---")
@@ -64,22 +112,12 @@ if __name__ == "__main__":
     if not os.path.exists(args.output_dir):
         os.makedirs(args.output_dir)
     
-    env = make_env(args.sim_dir, args.output_dir, args.gui)
-    
-    model = DQN(
-        "MlpPolicy", 
-        env, 
-        verbose=1, 
-        learning_rate=0.001, 
-        buffer_size=100000,   
-        learning_starts=2000, 
-        batch_size=256, 
-        gamma=0.99,           
-        train_freq=4,
-        target_update_interval=1000,
-        exploration_fraction=0.5, 
-        exploration_final_eps=0.05 
-    )
+    if args.seed is None and args.warmup > 0:
+        # El snapshot del warm-up se indexa por semilla (ver snapshot_cache.py).
+        args.seed = WARMUP_SEED
+    seeds = None if args.seed is None else [args.seed + i for i in range(args.num_envs)]
+    run_manifest = {"model_version": MODEL_NAME, "seed": args.seed, "total_timesteps": args.steps, "phase": "train"}
+    profile_log = os.path.join(args.output_dir, "logs", "profile")
 
     checkpoint_callback = CheckpointCallback(
         save_freq=20000, 
@@ -87,10 +125,64 @@ if __name__ == "__main__":
         name_prefix='sumo_dqn_v2'
     )
 
-    print(f"Entrenando {args.steps} pasos... (Paciencia, esto toma tiempo)")
-    model.learn(total_timesteps=args.steps, callback=checkpoint_callback)
+    callback = checkpoint_callback
+    if args.profile_every > 0:
+        callback = ProfilingCallback([checkpoint_callback], every=args.profile_every,
+                                     log_path=f"{profile_log}_learner.jsonl", verbose=1)
+
+    model_kwargs = dict(DQN_KWARGS, buffer_size=args.buffer_size)
+    if args.compact_buffer:
+        model_kwargs.update(replay_buffer_class=CompactReplayBuffer, replay_buffer_kwargs={})
+
+    env = None
+    if args.grouped:
+        if args.actors > 0 or args.listen or args.num_envs != 1:
+            parser.error("--grouped usa un solo SUMO en proceso; no combina con --actors/--listen/--num_envs")
+        env = make_env(args.sim_dir, args.output_dir, args.gui, 1, 0, seeds, args.backend, args.warmup,
+                       args.snapshot_dir, args.metrics_format, run_manifest, args.profile_every, profile_log,
+                       grouped=True, live_edge_data=args.live_edge_data)
+
+        def group_callback(group):
+            checkpoint = CheckpointCallback(
+                save_freq=20000,
+                save_path=os.path.join(args.output_dir, 'logs/'),
+                name_prefix=f'sumo_dqn_v2_{group.name}'
+            )
+            if args.profile_every > 0:
+                return ProfilingCallback([checkpoint], every=args.profile_every,
+                                         log_path=f"{profile_log}_learner_{group.name}.jsonl")
+            return checkpoint
+
+        print(f"Entrenando {args.steps} pasos por grupos de semáforos...")
+        model = train_grouped(env, model_kwargs, args.steps, group_callback)
+    elif args.actors > 0 or args.listen:
+        if args.live_edge_data:
+            parser.error("--live_edge_data sigue una sola simulación; no combina con --actors/--listen")
+        # Modo actor–aprendiz: cada actor construye su propio SUMO en su proceso.
+        env_fn = functools.partial(make_env, args.sim_dir, args.output_dir, num_cpus=0, backend=args.backend,
+                                   warmup_seconds=args.warmup, snapshot_dir=args.snapshot_dir,
+                                   metrics_format=args.metrics_format, run_manifest=run_manifest)
+        actor_seeds = None if args.seed is None else [args.seed + i for i in range(args.actors)]
+        print(f"Entrenando {args.steps} pasos con {args.actors} actores locales"
+              + (f" y actores remotos en {args.listen}" if args.listen else "") + "...")
+        model = train_distributed(env_fn, model_kwargs, args.steps, args.actors, actor_seeds, args.sync_every,
+                                  callback=callback, listen=args.listen)
+    else:
+        env, layout = make_env(args.sim_dir, args.output_dir, args.gui, args.num_envs, args.num_cpus, seeds,
+                               args.backend, args.warmup, args.snapshot_dir, args.metrics_format, run_manifest,
+                               args.profile_every, profile_log, return_layout=True,
+                               live_edge_data=args.live_edge_data)
+        if args.compact_buffer:
+            model_kwargs["replay_buffer_kwargs"]["obs_sizes"] = layout.slot_obs_sizes
+
+        model = DQN("MlpPolicy", env, verbose=1, **model_kwargs)
+
+        print(f"Entrenando {args.steps} pasos... (Paciencia, esto toma tiempo)")
+        model.learn(total_timesteps=args.steps, callback=callback)
     
-    save_path = os.path.join(args.output_model_dir, "sumo_rl_final_model_v6")
+    # En modo agrupado se guarda un directorio con un modelo por grupo.
+    save_path = os.path.join(args.output_model_dir, MODEL_NAME + ("_grouped" if args.grouped else ""))
     model.save(save_path)
     print("Modelo guardado exitosamente.")
-    env.close()
\ No newline at end of file
+    if env is not None:
+        env.close()